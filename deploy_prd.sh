@@ -132,6 +132,12 @@ deploy_up() {
     else
         print_warning "mem0 API not responding yet (may need more time)"
     fi
+
+    if curl -fsS "http://localhost:${MEM0_PORT}/ready" > /dev/null 2>&1; then
+        print_success "mem0 API is ready"
+    else
+        print_warning "mem0 API still initializing/warming up (check /ready)"
+    fi
 }
 
 # Function: Stop services
@@ -0,0 +1,177 @@
+"""
+Cache Bus - Cross-process search cache invalidation over Postgres LISTEN/NOTIFY
+Location: /Volumes/Data/ai_projects/mem0-system/lib/cache_bus.py
+Purpose: Keep per-worker search result caches coherent when running several uvicorn workers
+Scope: Publishes user_id invalidations after writes; applies invalidations from other processes
+
+Each worker process owns its own SearchResultCache. A write handled by one
+worker has to drop the matching entries in every other worker, otherwise
+they keep serving results from before the write until the TTL expires.
+Postgres is already shared by all workers, so NOTIFY on a channel is the
+transport - no extra service to run.
+
+Publishing never blocks the caller: invalidations go onto an in-process
+queue and a publisher thread sends them. If the listener connection drops,
+notifications may have been missed, so the local cache is cleared on every
+(re)connect.
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+import psycopg
+from psycopg import sql
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = "mem0_cache_invalidate"
+
+# Marks "clear everything" in the queue and on the wire (user_id may legitimately be "")
+_ALL = "*"
+
+
+class CacheInvalidationBus:
+    """
+    Usage:
+        bus = CacheInvalidationBus(conninfo, on_invalidate=SEARCH_CACHE.invalidate)
+        bus.start()
+
+        SEARCH_CACHE.invalidate(user_id)
+        bus.publish(user_id)    # other workers drop their entries for user_id
+    """
+
+    def __init__(
+        self,
+        conninfo: str,
+        on_invalidate: Callable[[Optional[str]], Any],
+        channel: str = DEFAULT_CHANNEL,
+        reconnect_interval: float = 5.0,
+    ):
+        self.conninfo = conninfo
+        self.on_invalidate = on_invalidate
+        self.channel = channel
+        self.reconnect_interval = reconnect_interval
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._outbox: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._stopping = threading.Event()
+        self._threads = []
+        self.connected = False
+        self.published = 0
+        self.received = 0
+        self.applied = 0
+        self.reconnects = 0
+        self.publish_errors = 0
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopping.clear()
+        for target, name in ((self._listen_loop, "mem0-cachebus-listen"), (self._publish_loop, "mem0-cachebus-publish")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"CacheInvalidationBus started - channel: {self.channel}, origin: {self.origin}")
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stopping.set()
+        self._outbox.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def publish(self, user_id: Optional[str]) -> None:
+        """Tell other processes to invalidate user_id (None/"" clears everything)"""
+        self._outbox.put(user_id or _ALL)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channel": self.channel,
+            "origin": self.origin,
+            "connected": self.connected,
+            "published": self.published,
+            "received": self.received,
+            "applied": self.applied,
+            "reconnects": self.reconnects,
+            "publish_errors": self.publish_errors,
+        }
+
+    # ------------------------------------------------------------------
+    # Publisher
+    # ------------------------------------------------------------------
+    def _publish_loop(self) -> None:
+        conn = None
+        while not self._stopping.is_set():
+            user_id = self._outbox.get()
+            if user_id is None:
+                break
+            # Coalesce a burst of writes (batch endpoints) into one NOTIFY per user_id
+            pending = {user_id}
+            while True:
+                try:
+                    more = self._outbox.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self._stopping.set()
+                    break
+                pending.add(more)
+            if _ALL in pending:
+                pending = {_ALL}
+            try:
+                if conn is None or conn.closed:
+                    conn = psycopg.connect(self.conninfo, autocommit=True)
+                for target in pending:
+                    payload = json.dumps({"origin": self.origin, "user_id": target})
+                    conn.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                    self.published += 1
+            except Exception as e:
+                self.publish_errors += 1
+                logger.warning(f"Cache invalidation publish failed: {e}")
+                if conn is not None:
+                    conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Listener
+    # ------------------------------------------------------------------
+    def _listen_loop(self) -> None:
+        first = True
+        while not self._stopping.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as conn:
+                    conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    self.connected = True
+                    if not first:
+                        self.reconnects += 1
+                        # Anything published while we were disconnected is lost
+                        self.on_invalidate(None)
+                    first = False
+                    while not self._stopping.is_set():
+                        for notify in conn.notifies(timeout=1.0):
+                            self._handle(notify.payload)
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener disconnected: {e}")
+            finally:
+                self.connected = False
+            first = False
+            self._stopping.wait(self.reconnect_interval)
+
+    def _handle(self, payload: str) -> None:
+        self.received += 1
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return
+        user_id = message.get("user_id")
+        self.on_invalidate(None if user_id == _ALL else user_id)
+        self.applied += 1
@@ -0,0 +1,220 @@
+"""
+Embedder Proxy - Batch-aware, caching wrapper around mem0's embedding model
+Location: /Volumes/Data/ai_projects/mem0-system/lib/embedder_proxy.py
+Purpose: Avoid repeat embedding round trips to Ollama for batches and recurring queries
+Scope: Wraps Memory.embedding_model; mem0 keeps calling embed(text, memory_action) unchanged
+
+mem0 embeds one text at a time from deep inside Memory.add/search. Batch
+endpoints call embed_many() first, prime() the results, and mem0's own
+embed() calls are then answered from memory instead of going to Ollama.
+Recurring texts (the bot and agents repeat the same queries) are served
+from an in-process LRU+TTL cache keyed by (model, normalized text).
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Cache key normalization - collapse whitespace, keep case"""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache of embedding vectors with per-entry TTL.
+
+    Keys are (model, normalized text). Switching the embedder model clears
+    the cache, since vectors from different models are not comparable.
+    """
+
+    def __init__(self, model: str, max_entries: int = 2048, ttl_seconds: float = 3600.0):
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def set_model(self, model: str) -> None:
+        """Point the cache at a new embedder model, dropping vectors from the old one"""
+        with self._lock:
+            if model != self.model:
+                logger.info(f"Embedder model changed ({self.model} -> {model}), clearing embedding cache")
+                self.model = model
+                self._entries.clear()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        if not self.enabled:
+            return None
+        key = (self.model, normalize_text(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, vector = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text: str, vector: List[float]) -> None:
+        if not self.enabled:
+            return
+        key = (self.model, normalize_text(text))
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            dims = len(next(iter(self._entries.values()))[1]) if self._entries else 0
+            return {
+                "model": self.model,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                # float32-equivalent payload; Python lists use more
+                "approx_vector_bytes": len(self._entries) * dims * 4,
+            }
+
+
+class EmbedderProxy:
+    """
+    Drop-in replacement for a mem0 embedder.
+
+    Usage:
+        proxy = EmbedderProxy(memory.embedding_model)
+        memory.embedding_model = proxy
+
+        vectors = proxy.embed_many(texts, "add")
+        proxy.prime(texts, vectors)
+        try:
+            ...  # memory.add(...) calls reuse the primed vectors
+        finally:
+            proxy.release(texts)
+    """
+
+    def __init__(self, embedder: Any, cache: Optional[EmbeddingCache] = None):
+        self._embedder = embedder
+        self.cache = cache
+        self._primed: Dict[str, List[float]] = {}
+        self._refs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.primed_hits = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Anything we don't override (config, client, ...) comes from the real embedder
+        return getattr(self._embedder, name)
+
+    @property
+    def wrapped(self) -> Any:
+        return self._embedder
+
+    def _active_cache(self) -> Optional[EmbeddingCache]:
+        """Cache to use, re-keyed if the wrapped embedder's model has changed"""
+        if self.cache is None:
+            return None
+        model = getattr(getattr(self._embedder, "config", None), "model", None)
+        if model and model != self.cache.model:
+            self.cache.set_model(model)
+        return self.cache
+
+    def embed(self, text: str, memory_action: Optional[str] = None) -> List[float]:
+        """mem0 entry point - serve primed or cached vectors, otherwise embed normally"""
+        with self._lock:
+            vector = self._primed.get(text)
+            if vector is not None:
+                self.primed_hits += 1
+                return vector
+        cache = self._active_cache()
+        if cache is not None:
+            vector = cache.get(text)
+            if vector is not None:
+                return vector
+        vector = self._embedder.embed(text, memory_action)
+        if cache is not None:
+            cache.put(text, vector)
+        return vector
+
+    def embed_many(self, texts: Sequence[str], memory_action: Optional[str] = None) -> List[List[float]]:
+        """Embed several texts, embedding each distinct text only once"""
+        unique = list(dict.fromkeys(texts))
+        if not unique:
+            return []
+        by_text: Dict[str, List[float]] = {}
+        cache = self._active_cache()
+        if cache is not None:
+            for text in unique:
+                vector = cache.get(text)
+                if vector is not None:
+                    by_text[text] = vector
+        missing = [text for text in unique if text not in by_text]
+        if missing:
+            vectors = self._embed_uncached(missing, memory_action)
+            for text, vector in zip(missing, vectors):
+                by_text[text] = vector
+                if cache is not None:
+                    cache.put(text, vector)
+        return [by_text[text] for text in texts]
+
+    def _embed_uncached(self, texts: List[str], memory_action: Optional[str]) -> List[List[float]]:
+        """Embed with the fewest round trips the wrapped embedder supports"""
+        batch_fn = getattr(self._embedder, "embed_batch", None)
+        if callable(batch_fn):
+            return batch_fn(texts, memory_action)
+        # mem0's Ollama embedder: its client (ollama package or the HTTP shim) takes a
+        # list of inputs and answers with one /api/embed request per batch
+        client = getattr(self._embedder, "client", None)
+        model = getattr(getattr(self._embedder, "config", None), "model", None)
+        if model and callable(getattr(client, "embed", None)):
+            return list(client.embed(model=model, input=texts)["embeddings"])
+        return [self._embedder.embed(text, memory_action) for text in texts]
+
+    def prime(self, texts: Sequence[str], vectors: Sequence[List[float]]) -> None:
+        """Make vectors available to embed() until release() is called"""
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._primed[text] = vector
+                self._refs[text] = self._refs.get(text, 0) + 1
+
+    def release(self, texts: Sequence[str]) -> None:
+        """Drop vectors primed for a finished batch (reference counted across batches)"""
+        with self._lock:
+            for text in texts:
+                remaining = self._refs.get(text, 0) - 1
+                if remaining > 0:
+                    self._refs[text] = remaining
+                else:
+                    self._refs.pop(text, None)
+                    self._primed.pop(text, None)
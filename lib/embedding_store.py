@@ -0,0 +1,201 @@
+"""
+Embedding Store - Persistent content-addressed cache of embedding vectors
+Location: /Volumes/Data/ai_projects/mem0-system/lib/embedding_store.py
+Purpose: Never pay Ollama twice for the same (model, text) - across restarts and re-embeds
+Scope: SQLite table of float32 vectors keyed by sha256(model, text), LRU-ish eviction, hit-rate stats
+
+The in-process EmbeddingCache (embedder_proxy.py) forgets everything on
+restart and holds only recent query texts. This store sits underneath it, in
+the Ollama client, so re-ingestion, entity names repeated across graph
+updates and full re-embeds (scripts/direct_reembed.py) are answered from
+disk. Vectors are stored as float32, the precision pgvector keeps anyway.
+
+Keys name the model tag, not its weights: after `ollama pull` brings new
+weights under the same tag, stored vectors are stale. A store opened with
+refresh=True misses on every lookup and overwrites what it stores, so a
+re-embed replaces them instead of copying them back.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key BLOB PRIMARY KEY,
+    model TEXT NOT NULL,
+    dims INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used);
+"""
+
+# SQLite caps host parameters per statement; stay well below it
+_LOOKUP_CHUNK = 500
+# Only rewrite last_used when it is older than this, so hits stay read-only
+_TOUCH_INTERVAL = 3600.0
+
+
+def content_key(model: str, text: str) -> bytes:
+    """sha256 over model and text (NUL-separated so the boundary is unambiguous)"""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+
+def _pack(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingStore:
+    """
+    Usage:
+        store = EmbeddingStore("/app/data/embeddings.db", max_entries=100_000)
+        found = store.get_many("nomic-embed-text:latest", texts)   # {text: vector}
+        store.put_many("nomic-embed-text:latest", zip(missing, vectors))
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, refresh: bool = False):
+        self.path = path
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        self._approx_entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread: lookups sit on the embedding hot path,
+        # so connections are kept open rather than reopened per call
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text]).get(text)
+
+    def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Stored vectors for the texts that have one"""
+        by_key = {content_key(model, text): text for text in dict.fromkeys(texts)}
+        if not by_key:
+            return {}
+        if self.refresh:
+            with self._lock:
+                self.misses += len(by_key)
+            return {}
+        found: Dict[str, List[float]] = {}
+        stale: List[bytes] = []
+        now = time.time()
+        conn = self._conn()
+        keys = list(by_key)
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[start:start + _LOOKUP_CHUNK]
+            rows = conn.execute(
+                f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for key, blob, last_used in rows:
+                found[by_key[key]] = _unpack(blob)
+                if now - last_used > _TOUCH_INTERVAL:
+                    stale.append(key)
+        if stale:
+            conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in stale])
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(by_key) - len(found)
+        return found
+
+    def put(self, model: str, text: str, vector: Sequence[float]) -> None:
+        self.put_many(model, [(text, vector)])
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, Sequence[float]]]) -> None:
+        now = time.time()
+        rows = [
+            (content_key(model, text), model, len(vector), _pack(vector), now, now)
+            for text, vector in items
+        ]
+        if not rows:
+            return
+        conn = self._conn()
+        before = conn.total_changes
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                f"INSERT OR {'REPLACE' if self.refresh else 'IGNORE'} INTO embeddings "
+                "(key, model, dims, vector, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        inserted = conn.total_changes - before
+        with self._lock:
+            self.writes += inserted
+            self._approx_entries += inserted
+            over = self.max_entries > 0 and self._approx_entries > self.max_entries
+        if over:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used rows down to 90% of max_entries"""
+        conn = self._conn()
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        target = int(self.max_entries * 0.9)
+        removed = 0
+        if count > self.max_entries:
+            removed = count - target
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (removed,),
+            )
+            logger.info(f"EmbeddingStore evicted {removed} vectors ({self.path})")
+        with self._lock:
+            self.evictions += removed
+            self._approx_entries = count - removed
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        entries, stored_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "vector_bytes": stored_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
@@ -16,6 +16,8 @@ import httpx
 from typing import Dict, Optional
 from urllib.parse import urlparse
 
+from ollama_balancer import configured_urls
+
 
 class OllamaOnlyEnforcer:
     """
@@ -27,7 +29,9 @@ class OllamaOnlyEnforcer:
     """
     
     def __init__(self):
-        self.ollama_url = os.getenv('OLLAMA_URL', 'http://host.docker.internal:11434')
+        # OLLAMA_URLS lists several hosts for the balancer; mem0's config names the first
+        self.ollama_urls = configured_urls()
+        self.ollama_url = self.ollama_urls[0]
         self.llm_model = os.getenv('MEM0_LLM_MODEL', 'mistral:7b-instruct-q5_K_M')
         self.embedder_model = os.getenv('MEM0_EMBEDDER_MODEL', 'nomic-embed-text:latest')
         self.openai_blocked = True  # Always block OpenAI
@@ -35,7 +39,7 @@ class OllamaOnlyEnforcer:
         print("=" * 70)
         print("🔒 OLLAMA-ONLY ENFORCEMENT INITIALIZED")
         print("=" * 70)
-        print(f"Ollama URL: {self.ollama_url}")
+        print(f"Ollama URL: {', '.join(self.ollama_urls)}")
         print(f"LLM Model: {self.llm_model}")
         print(f"Embedder Model: {self.embedder_model}")
         print(f"OpenAI: BLOCKED (no fallback allowed)")
@@ -45,59 +49,65 @@ class OllamaOnlyEnforcer:
         """
         Validate Ollama is accessible and models are available
         ABORTS if Ollama is not available (no fallback)
+
+        With several OLLAMA_URLS, an unreachable host is only a warning (the
+        balancer ejects it); every model must be on at least one reachable host.
         """
         print("\n🔍 Validating Ollama connection...")
         
-        try:
-            # Test basic connectivity
-            response = httpx.get(
-                f"{self.ollama_url}/api/tags",
-                timeout=timeout
-            )
-            response.raise_for_status()
-            
-            models = response.json().get('models', [])
-            model_names = [m.get('name', '') for m in models]
-            
-            # Check required models are available
-            llm_available = any(self.llm_model in name for name in model_names)
-            embedder_available = any(self.embedder_model in name for name in model_names)
-            
-            if not llm_available:
-                print(f"❌ CRITICAL: LLM model '{self.llm_model}' not found in Ollama")
-                print(f"   Available models: {', '.join(model_names[:5])}")
-                print("\n🚨 ABORTING: Ollama model unavailable - no fallback allowed")
-                sys.exit(1)
-            
-            if not embedder_available:
-                print(f"❌ CRITICAL: Embedder model '{self.embedder_model}' not found in Ollama")
-                print(f"   Available models: {', '.join(model_names[:5])}")
-                print("\n🚨 ABORTING: Ollama embedder unavailable - no fallback allowed")
-                sys.exit(1)
-            
-            print(f"✅ Ollama connection validated")
-            print(f"   LLM model '{self.llm_model}': Available")
-            print(f"   Embedder model '{self.embedder_model}': Available")
-            return True
-            
-        except httpx.TimeoutException:
-            print(f"❌ CRITICAL: Ollama timeout ({timeout}s)")
-            print(f"   URL: {self.ollama_url}")
+        model_names = set()
+        reachable = []
+        for url in self.ollama_urls:
+            try:
+                # Test basic connectivity
+                response = httpx.get(
+                    f"{url}/api/tags",
+                    timeout=timeout
+                )
+                response.raise_for_status()
+                models = response.json().get('models', [])
+                model_names.update(m.get('name', '') for m in models)
+                reachable.append(url)
+                print(f"   {url}: {len(models)} models")
+                
+            except httpx.TimeoutException:
+                print(f"{'⚠️  WARNING' if len(self.ollama_urls) > 1 else '❌ CRITICAL'}: Ollama timeout ({timeout}s)")
+                print(f"   URL: {url}")
+                
+            except httpx.ConnectError as e:
+                print(f"{'⚠️  WARNING' if len(self.ollama_urls) > 1 else '❌ CRITICAL'}: Cannot connect to Ollama")
+                print(f"   URL: {url}")
+                print(f"   Error: {str(e)}")
+                
+            except Exception as e:
+                print(f"❌ CRITICAL: Ollama validation failed")
+                print(f"   URL: {url}")
+                print(f"   Error: {str(e)}")
+        
+        if not reachable:
             print("\n🚨 ABORTING: Ollama unreachable - no fallback allowed")
             sys.exit(1)
-            
-        except httpx.ConnectError as e:
-            print(f"❌ CRITICAL: Cannot connect to Ollama")
-            print(f"   URL: {self.ollama_url}")
-            print(f"   Error: {str(e)}")
-            print("\n🚨 ABORTING: Ollama connection failed - no fallback allowed")
+        
+        # Check required models are available
+        llm_available = any(self.llm_model in name for name in model_names)
+        embedder_available = any(self.embedder_model in name for name in model_names)
+        
+        if not llm_available:
+            print(f"❌ CRITICAL: LLM model '{self.llm_model}' not found in Ollama")
+            print(f"   Available models: {', '.join(sorted(model_names)[:5])}")
+            print("\n🚨 ABORTING: Ollama model unavailable - no fallback allowed")
             sys.exit(1)
-            
-        except Exception as e:
-            print(f"❌ CRITICAL: Ollama validation failed")
-            print(f"   Error: {str(e)}")
-            print("\n🚨 ABORTING: Ollama validation failed - no fallback allowed")
+        
+        if not embedder_available:
+            print(f"❌ CRITICAL: Embedder model '{self.embedder_model}' not found in Ollama")
+            print(f"   Available models: {', '.join(sorted(model_names)[:5])}")
+            print("\n🚨 ABORTING: Ollama embedder unavailable - no fallback allowed")
             sys.exit(1)
+        
+        print(f"✅ Ollama connection validated ({len(reachable)}/{len(self.ollama_urls)} hosts reachable)")
+        print(f"   LLM model '{self.llm_model}': Available")
+        print(f"   Embedder model '{self.embedder_model}': Available")
+        return True
     
     def build_ollama_only_config(self) -> Dict:
         """
@@ -0,0 +1,331 @@
+"""
+Ingest Queue - Durable write-behind queue for memory ingestion
+Location: /Volumes/Data/ai_projects/mem0-system/lib/ingest_queue.py
+Purpose: Acknowledge POST /memories/async immediately and run LLM extraction in the background
+Scope: SQLite-backed job table, lease-based worker pool, job status lookups
+
+Jobs survive restarts: a job is only marked done after Memory.add returns,
+and a job whose worker died is picked up again once its lease expires.
+Leases (instead of "reset running jobs on startup") keep this safe when
+several server processes share the same queue file. A worker renews the
+lease of its running jobs every lease_seconds / 3, so a slow extraction is
+never claimed twice; only a job whose process stopped renewing expires.
+
+A failed attempt goes back to the queue with not_before set to now plus an
+exponential backoff (retry_backoff x 2^(attempt-1), capped at
+max_retry_backoff), so an Ollama outage doesn't burn every attempt in
+milliseconds and newer jobs are claimed meanwhile. An expired lease counts
+as an attempt too: once attempts reach max_attempts the job is failed at
+claim time instead of being run again.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    user_id TEXT,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_until REAL,
+    not_before REAL
+);
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs (status, created_at);
+"""
+
+
+class IngestQueue:
+    """
+    Usage:
+        queue = IngestQueue("/app/data/ingest_queue.db", handler=process_payload, workers=2)
+        queue.start()
+        job_id = queue.enqueue({"messages": [...], "user_id": "mark_carey/sap"})
+        queue.get(job_id)  # {"status": "running", ...}
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        handler: Callable[[Dict[str, Any]], Any],
+        workers: int = 2,
+        max_attempts: int = 3,
+        lease_seconds: float = 900.0,
+        retention_hours: float = 72.0,
+        poll_interval: float = 1.0,
+        retry_backoff: float = 5.0,
+        max_retry_backoff: float = 300.0,
+    ):
+        self.db_path = db_path
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retention_hours = retention_hours
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._last_purge = 0.0
+        self._running: Set[str] = set()  # job ids this process holds a lease on
+        self._running_lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation; sqlite3 connections are not thread-safe
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        """Persist a job and wake a worker. Returns the job id."""
+        job_id = str(uuid.uuid4())
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO ingest_jobs (id, status, user_id, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, payload.get("user_id"), json.dumps(payload), time.time()),
+            )
+        finally:
+            conn.close()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status, attempts, timings, queue position and result/error"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = {
+                "job_id": row["id"],
+                "status": row["status"],
+                "user_id": row["user_id"],
+                "attempts": row["attempts"],
+                "created_at": row["created_at"],
+                "started_at": row["started_at"],
+                "finished_at": row["finished_at"],
+                "next_attempt_at": row["not_before"] if row["status"] == STATUS_QUEUED else None,
+                "error": row["error"],
+                "result": json.loads(row["result"]) if row["result"] else None,
+            }
+            if row["status"] == STATUS_QUEUED:
+                ahead = conn.execute(
+                    "SELECT COUNT(*) FROM ingest_jobs WHERE status = ? AND created_at < ?",
+                    (STATUS_QUEUED, row["created_at"]),
+                ).fetchone()[0]
+                job["queue_position"] = ahead + 1
+            return job
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            counts = {
+                status: count
+                for status, count in conn.execute(
+                    "SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status"
+                ).fetchall()
+            }
+            oldest = conn.execute(
+                "SELECT MIN(created_at) FROM ingest_jobs WHERE status = ?", (STATUS_QUEUED,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        return {
+            "workers": self.workers,
+            "queued": counts.get(STATUS_QUEUED, 0),
+            "running": counts.get(STATUS_RUNNING, 0),
+            "done": counts.get(STATUS_DONE, 0),
+            "failed": counts.get(STATUS_FAILED, 0),
+            "oldest_queued_age_s": round(time.time() - oldest, 1) if oldest else 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"mem0-ingest-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._lease_loop, name="mem0-ingest-lease", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        logger.info(f"IngestQueue started - {self.workers} workers, db: {self.db_path}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM ingest_jobs "
+                    "WHERE (status = ? AND (not_before IS NULL OR not_before <= ?)) "
+                    "OR (status = ? AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (STATUS_QUEUED, now, STATUS_RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row["status"] == STATUS_RUNNING and row["attempts"] >= self.max_attempts:
+                    # Its worker died (or stopped renewing) on the last attempt: don't run it again
+                    logger.error(
+                        f"Ingest job {row['id']} lease expired on attempt {row['attempts']}/{self.max_attempts}"
+                    )
+                    conn.execute(
+                        "UPDATE ingest_jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL "
+                        "WHERE id = ?",
+                        (STATUS_FAILED, "lease expired: worker stopped during the last attempt", now, row["id"]),
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE ingest_jobs SET status = ?, attempts = attempts + 1, "
+                    "started_at = ?, lease_until = ?, not_before = NULL WHERE id = ?",
+                    (STATUS_RUNNING, now, now + self.lease_seconds, row["id"]),
+                )
+                conn.execute("COMMIT")
+                return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None,
+                not_before: Optional[float] = None) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE ingest_jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+                "lease_until = NULL, not_before = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, default=str) if result is not None else None,
+                    error,
+                    time.time() if status in (STATUS_DONE, STATUS_FAILED) else None,
+                    not_before,
+                    job_id,
+                ),
+            )
+        finally:
+            conn.close()
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.retry_backoff * 2 ** (attempts - 1), self.max_retry_backoff)
+
+    def _lease_loop(self) -> None:
+        """Extend the leases of jobs this process is running, so they never expire under a live worker"""
+        interval = max(self.lease_seconds / 3, 1.0)
+        while not self._stopping.wait(interval):
+            with self._running_lock:
+                job_ids = list(self._running)
+            if not job_ids:
+                continue
+            conn = self._connect()
+            try:
+                conn.executemany(
+                    "UPDATE ingest_jobs SET lease_until = ? WHERE id = ? AND status = ?",
+                    [(time.time() + self.lease_seconds, job_id, STATUS_RUNNING) for job_id in job_ids],
+                )
+            except Exception as e:
+                logger.error(f"IngestQueue lease renewal failed: {e}")
+            finally:
+                conn.close()
+
+    def _purge(self) -> None:
+        if self.retention_hours <= 0 or time.time() - self._last_purge < 3600:
+            return
+        self._last_purge = time.time()
+        cutoff = time.time() - self.retention_hours * 3600
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM ingest_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (STATUS_DONE, STATUS_FAILED, cutoff),
+            )
+        finally:
+            conn.close()
+
+    def _worker_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                row = self._claim()
+            except Exception as e:
+                logger.error(f"IngestQueue claim failed: {e}")
+                row = None
+            if row is None:
+                self._purge()
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            job_id = row["id"]
+            attempts = row["attempts"] + 1
+            with self._running_lock:
+                self._running.add(job_id)
+            try:
+                result = self.handler(json.loads(row["payload"]))
+                self._finish(job_id, STATUS_DONE, result=result)
+            except Exception as e:
+                if attempts < self.max_attempts:
+                    delay = self._backoff(attempts)
+                    logger.error(
+                        f"Ingest job {job_id} failed (attempt {attempts}/{self.max_attempts}), "
+                        f"retrying in {delay:.0f}s: {e}"
+                    )
+                    self._finish(job_id, STATUS_QUEUED, error=str(e), not_before=time.time() + delay)
+                else:
+                    logger.error(f"Ingest job {job_id} failed (attempt {attempts}/{self.max_attempts}): {e}")
+                    self._finish(job_id, STATUS_FAILED, error=str(e))
+            finally:
+                with self._running_lock:
+                    self._running.discard(job_id)
@@ -15,11 +15,17 @@ Architecture:
 import os
 import time
 import logging
-from typing import Dict, List, Optional, Tuple
+import threading
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from enum import Enum
-import httpx
 from dataclasses import dataclass
 
+from model_queue import Priority, get_model_queue, model_queue_stats
+from ollama_balancer import configured_urls, get_balancer
+from response_cache import ResponseCache
+from token_counter import ApproximateCounter, get_token_counter, token_counter_stats
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -40,6 +46,66 @@ class ModelProvider(str, Enum):
     OPENAI = "openai"                  # OpenAI API (fallback, has cost)
 
 
+# Classification keywords, matched as case-insensitive substrings. Groups are
+# checked in classify_text's precedence order; "compare" is kept apart because
+# it marks reasoning but does not disqualify a short query from SIMPLE.
+# CPython's substring search skips ahead by the keyword length and beats a
+# single compiled alternation on these prompts (see scripts/bench_classify_query.py),
+# so each group is a short-circuiting `in` scan.
+KEYWORD_GROUPS = {
+    "embedding": ("embedding", "encode"),
+    "code": ("code", "function", "class", "python", "javascript", "debug", "error"),
+    "complex": ("analyze", "complex", "reasoning", "explain why"),
+    "summarization": ("summarize", "summary", "tldr", "brief"),
+    "extraction": ("extract", "find", "list", "identify"),
+    "compare": ("compare",),
+}
+
+
+def _mentions(text_lower: str, group: str) -> bool:
+    return any(keyword in text_lower for keyword in KEYWORD_GROUPS[group])
+
+
+_approximate_counter = ApproximateCounter()
+
+
+def classify_text(
+    text: str, context_length: int = 0, count_tokens: Optional[Callable[[str], int]] = None
+) -> Tuple["QueryType", int, int]:
+    """
+    (query type, complexity 1-10, context length used), without memoization.
+    context_length 0 means "count the tokens" with count_tokens (default: the
+    byte-based approximation from token_counter).
+    """
+    if context_length == 0:
+        context_length = (count_tokens or _approximate_counter.count)(text)
+    text_lower = text.lower()
+
+    # Embedding queries (ALWAYS local)
+    if _mentions(text_lower, "embedding"):
+        return QueryType.EMBEDDING, 1, context_length
+    # Code queries (use specialized model)
+    if _mentions(text_lower, "code"):
+        return QueryType.CODE, 3, context_length
+    # Simple queries (short, straightforward)
+    complex_terms = None
+    if context_length < 500:
+        complex_terms = _mentions(text_lower, "complex")
+        if not complex_terms:
+            return QueryType.SIMPLE, 1, context_length
+    if _mentions(text_lower, "summarization"):
+        return QueryType.SUMMARIZATION, 2, context_length
+    if _mentions(text_lower, "extraction"):
+        return QueryType.EXTRACTION, 2, context_length
+    # Complex reasoning (may need external); short texts were already scanned above
+    if complex_terms or (complex_terms is None and _mentions(text_lower, "complex")) or _mentions(text_lower, "compare"):
+        return QueryType.REASONING, 7 if context_length > 2000 else 5, context_length
+    # Default: simple if short, medium if longer
+    if context_length < 1000:
+        return QueryType.SIMPLE, 2, context_length
+    return QueryType.SUMMARIZATION, 4, context_length
+
+
 @dataclass
 class RoutingDecision:
     """Routing decision with reasoning"""
@@ -49,6 +115,8 @@ class RoutingDecision:
     estimated_cost: float  # In dollars
     max_tokens: int
     temperature: float
+    prompt_tokens: int = 0  # Prompt length the decision was sized for
+    predicted_latency: Optional[float] = None  # Seconds (p95 of recent calls, or the model's prior)
 
 
 @dataclass
@@ -62,6 +130,80 @@ class QueryMetrics:
     avg_external_latency: float = 0.0
 
 
+# Completed calls needed before a model's observed latency replaces its prior
+MIN_LATENCY_SAMPLES = 10
+
+# Longer prompts skip the semantic cache: the embedder truncates them, and
+# prompts sharing a long prefix would look identical
+SEMANTIC_CACHE_MAX_PROMPT_TOKENS = 2048
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ModelLatency:
+    """
+    Rolling window of one model's completed calls: wall time, prompt size and
+    Ollama's own prompt/generation throughput.
+
+    Usage:
+        latency = ModelLatency(prior=3.0)
+        latency.record(2.7, ollama_response)     # /api/generate body or final stream chunk
+        latency.predict(prompt_tokens=6000)       # p95, plus extra prompt processing
+    """
+
+    def __init__(self, prior: float, window: int = 200):
+        self.prior = prior
+        self.samples: "deque[Tuple[float, int]]" = deque(maxlen=window)  # (seconds, prompt tokens)
+        self.prompt_rates: "deque[float]" = deque(maxlen=window)         # prompt tokens/second
+        self.generate_rates: "deque[float]" = deque(maxlen=window)       # generated tokens/second
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, result: Dict[str, Any]) -> None:
+        # Ollama durations are in nanoseconds; a cached prompt prefix is not
+        # counted in prompt_eval_count, so rates stay per evaluated token
+        prompt_tokens = result.get("prompt_eval_count") or 0
+        with self._lock:
+            self.samples.append((seconds, prompt_tokens))
+            if prompt_tokens and result.get("prompt_eval_duration"):
+                self.prompt_rates.append(prompt_tokens / (result["prompt_eval_duration"] / 1e9))
+            if result.get("eval_count") and result.get("eval_duration"):
+                self.generate_rates.append(result["eval_count"] / (result["eval_duration"] / 1e9))
+
+    def _median(self, values) -> Optional[float]:
+        return _percentile(sorted(values), 0.5) if values else None
+
+    def predict(self, prompt_tokens: int = 0) -> float:
+        """
+        p95 of recent calls, plus the time to read however many prompt tokens
+        exceed the usual prompt. The prior until MIN_LATENCY_SAMPLES calls.
+        """
+        with self._lock:
+            if len(self.samples) < MIN_LATENCY_SAMPLES:
+                return self.prior
+            p95 = _percentile(sorted(seconds for seconds, _ in self.samples), 0.95)
+            usual_prompt = self._median([tokens for _, tokens in self.samples])
+            prompt_rate = self._median(self.prompt_rates)
+        if prompt_rate and prompt_tokens > usual_prompt:
+            p95 += (prompt_tokens - usual_prompt) / prompt_rate
+        return p95
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ordered = sorted(seconds for seconds, _ in self.samples)
+            prompt_rate = self._median(self.prompt_rates)
+            generate_rate = self._median(self.generate_rates)
+        return {
+            "samples": len(ordered),
+            "prior_s": self.prior,
+            "p50_s": round(_percentile(ordered, 0.5), 3) if ordered else None,
+            "p95_s": round(_percentile(ordered, 0.95), 3) if ordered else None,
+            "prompt_tokens_per_second": round(prompt_rate, 1) if prompt_rate else None,
+            "tokens_per_second": round(generate_rate, 1) if generate_rate else None,
+        }
+
+
 class Mem0LLMRouter:
     """
     Intelligent LLM router for mem0 with local-first strategy.
@@ -72,6 +214,8 @@ class Mem0LLMRouter:
     3. Simple queries (<2k tokens): Use mistral:7b (fast, local)
     4. Medium queries (2k-4k tokens): Use codellama:13b (balanced, local)
     5. Complex reasoning (>4k tokens OR high complexity): OpenAI fallback
+    6. With a deadline: a local model whose observed p95 would miss it is
+       swapped for a faster one
 
     Cost Analysis:
     - Local: $0.00 per query (unlimited)
@@ -83,7 +227,8 @@ class Mem0LLMRouter:
         # Ollama connection (local on host machine)
         # Use localhost when running locally, host.docker.internal from Docker
         default_url = "http://localhost:11434" if not os.path.exists("/.dockerenv") else "http://host.docker.internal:11434"
-        self.ollama_url = os.getenv("OLLAMA_URL", default_url)
+        self.ollama_urls = configured_urls(default_url)
+        self.ollama_url = self.ollama_urls[0]
 
         # OpenAI fallback
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -99,7 +244,7 @@ class Mem0LLMRouter:
                 "type": "general",
                 "max_context": 8192,
                 "cost": 0.0,
-                "latency": 1.5,  # seconds
+                "latency": 1.5,  # seconds, until enough calls are observed (see ModelLatency)
                 "best_for": ["simple", "summarization", "extraction"]
             },
             "deepseek-coder:6.7b": {
@@ -128,10 +273,42 @@ class Mem0LLMRouter:
         # Metrics tracking
         self.metrics = QueryMetrics()
 
-        # HTTP client for async requests
-        self.http_client = httpx.AsyncClient(timeout=120.0)
+        # Observed latency per local model; the "latency" above is only the prior
+        latency_window = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+        self.latency = {
+            name: ModelLatency(spec["latency"], latency_window) for name, spec in self.models.items()
+        }
+
+        # Prompt lengths in tokens of the general local model's vocabulary
+        # (token_counter.py: tokenizer.json if configured, else an estimate)
+        self.token_counter = get_token_counter(os.getenv("LLM_TOKENIZER_MODEL", "mistral:7b"))
+
+        # Classification memo (prompt hash -> result): retried and repeated
+        # extraction prompts skip the keyword scan and token count
+        self.classify_cache_size = int(os.getenv("LLM_CLASSIFY_CACHE_SIZE", "1024"))
+        self._classify_cache: "OrderedDict[Tuple[int, int, int], Tuple[QueryType, int, int]]" = OrderedDict()
+        self._classify_lock = threading.Lock()
+        self.classify_hits = 0
+        self.classify_misses = 0
+
+        # Completed responses (response_cache.py): exact repeats, plus near-duplicate
+        # temperature-0 prompts when LLM_SEMANTIC_CACHE_THRESHOLD is set
+        self.response_cache = ResponseCache(
+            max_entries=int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.getenv("LLM_RESPONSE_CACHE_TTL", "3600")),
+            semantic_threshold=float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0")),
+            semantic_entries=int(os.getenv("LLM_SEMANTIC_CACHE_SIZE", "256")),
+        )
+        self.cache_embed_model = os.getenv("LLM_CACHE_EMBED_MODEL", "nomic-embed-text:latest")
+
+        # Keep models loaded between queries (see ollama_residency.py)
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 
-        logger.info(f"Mem0LLMRouter initialized - Ollama: {self.ollama_url}")
+        # Shared Ollama gateway (pooled connections, per-endpoint concurrency limits),
+        # balanced over every host in OLLAMA_URLS
+        self.gateway = get_balancer(self.ollama_url)
+
+        logger.info(f"Mem0LLMRouter initialized - Ollama: {', '.join(self.ollama_urls)}")
         logger.info(f"Target: {self.local_threshold}% local routing")
 
     def classify_query(self, text: str, context_length: int = 0) -> Tuple[QueryType, int]:
@@ -142,49 +319,36 @@ class Mem0LLMRouter:
             Tuple[QueryType, complexity_score]
             complexity_score: 1-10 (1=simple, 10=very complex)
         """
-        text_lower = text.lower()
-
-        # Estimate context length if not provided
-        if context_length == 0:
-            context_length = len(text.split())
-
-        # Embedding queries (ALWAYS local)
-        if "embedding" in text_lower or "encode" in text_lower:
-            return QueryType.EMBEDDING, 1
-
-        # Code queries (use specialized model)
-        if any(kw in text_lower for kw in ["code", "function", "class", "python", "javascript", "debug", "error"]):
-            return QueryType.CODE, 3
-
-        # Simple queries (short, straightforward)
-        if context_length < 500 and not any(kw in text_lower for kw in ["analyze", "complex", "reasoning", "explain why"]):
-            return QueryType.SIMPLE, 1
-
-        # Summarization
-        if any(kw in text_lower for kw in ["summarize", "summary", "tldr", "brief"]):
-            return QueryType.SUMMARIZATION, 2
-
-        # Extraction
-        if any(kw in text_lower for kw in ["extract", "find", "list", "identify"]):
-            return QueryType.EXTRACTION, 2
-
-        # Complex reasoning (may need external)
-        if any(kw in text_lower for kw in ["analyze", "reasoning", "complex", "explain why", "compare"]):
-            complexity = 7 if context_length > 2000 else 5
-            return QueryType.REASONING, complexity
-
-        # Default: simple if short, medium if longer
-        if context_length < 1000:
-            return QueryType.SIMPLE, 2
-        else:
-            return QueryType.SUMMARIZATION, 4
+        query_type, complexity, _ = self._classified(text, context_length)
+        return query_type, complexity
+
+    def _classified(self, text: str, context_length: int = 0) -> Tuple[QueryType, int, int]:
+        """classify_text() through the LRU memo"""
+        if self.classify_cache_size <= 0:
+            return classify_text(text, context_length, self.token_counter.count)
+        # str hashes are computed in C (and cached on the object); the length guards against collisions
+        key = (hash(text), len(text), context_length)
+        with self._classify_lock:
+            result = self._classify_cache.get(key)
+            if result is not None:
+                self._classify_cache.move_to_end(key)
+                self.classify_hits += 1
+                return result
+        result = classify_text(text, context_length, self.token_counter.count)
+        with self._classify_lock:
+            self.classify_misses += 1
+            self._classify_cache[key] = result
+            if len(self._classify_cache) > self.classify_cache_size:
+                self._classify_cache.popitem(last=False)
+        return result
 
     def route_query(
         self,
         query_text: str,
         query_type: Optional[QueryType] = None,
         context_length: Optional[int] = None,
-        force_local: bool = False
+        force_local: bool = False,
+        deadline: Optional[float] = None
     ) -> RoutingDecision:
         """
         Route query to appropriate model based on type and complexity.
@@ -194,21 +358,27 @@ class Mem0LLMRouter:
             query_type: Optional pre-classified query type
             context_length: Optional context length in tokens
             force_local: Force local routing even for complex queries
+            deadline: Optional latency budget in seconds; a local model whose
+                predicted latency exceeds it is swapped for a faster one
 
         Returns:
             RoutingDecision with provider, model, and reasoning
         """
-        # Classify query if not provided
-        if query_type is None or context_length is None:
-            query_type, complexity = self.classify_query(
-                query_text,
-                context_length or len(query_text.split())
-            )
+        # Classify query if not provided (one memoized pass also yields the token count);
+        # a caller-supplied type is kept and only the prompt is measured
+        if query_type is None:
+            query_type, complexity, ctx_len = self._classified(query_text, context_length or 0)
         else:
             complexity = 5  # Default medium complexity
+            ctx_len = context_length or self.token_counter.count(query_text)
 
-        ctx_len = context_length or len(query_text.split())
+        decision = self._route(query_type, complexity, ctx_len, force_local)
+        # A caller-supplied length may cover more than query_text, so only our own count is redone
+        decision = self._fit_context(decision, query_text, ctx_len, force_local, recount=not context_length)
+        return self._meet_deadline(decision, deadline)
 
+    def _route(self, query_type: QueryType, complexity: int, ctx_len: int, force_local: bool) -> RoutingDecision:
+        """Model choice by query type, complexity and prompt tokens"""
         # ALWAYS use local for embeddings
         if query_type == QueryType.EMBEDDING:
             return RoutingDecision(
@@ -289,15 +459,135 @@ class Mem0LLMRouter:
             temperature=0.3
         )
 
+    def _fit_context(self, decision: RoutingDecision, query_text: str, ctx_len: int,
+                     force_local: bool, recount: bool = True) -> RoutingDecision:
+        """
+        Make sure prompt + answer fit the chosen model's context window.
+
+        Near the limit the prompt is recounted with the model's own tokenizer.
+        A local prompt that does not fit moves to the smallest local model
+        whose window does, then to OpenAI; failing both, max_tokens shrinks
+        to what is left of the window.
+        """
+        decision.prompt_tokens = ctx_len
+        spec = self.models.get(decision.model)
+        if decision.provider != ModelProvider.OLLAMA_LOCAL or spec is None or spec["type"] == "embedding":
+            return decision
+        window = spec["max_context"]
+        counter = get_token_counter(decision.model)
+        if recount and ctx_len + decision.max_tokens > window * 0.8 and counter is not self.token_counter:
+            ctx_len = decision.prompt_tokens = counter.count(query_text)
+        if ctx_len + decision.max_tokens <= window:
+            return decision
+
+        larger = sorted(
+            (spec["max_context"], name) for name, spec in self.models.items()
+            if spec["type"] != "embedding" and spec["max_context"] > window
+        )
+        for max_context, name in larger:
+            if ctx_len + decision.max_tokens <= max_context:
+                logger.info(f"Prompt of {ctx_len} tokens exceeds {decision.model} context ({window}) - using {name}")
+                decision.reason = f"{decision.reason}; {ctx_len}-token prompt needs {name}'s {max_context}-token context"
+                decision.model = name
+                return decision
+
+        if not force_local and self.openai_api_key:
+            logger.info(f"Prompt of {ctx_len} tokens exceeds every local context window - using OpenAI")
+            return RoutingDecision(
+                provider=ModelProvider.OPENAI,
+                model="gpt-4o-mini",
+                reason=f"{ctx_len}-token prompt exceeds every local context window",
+                estimated_cost=0.015,
+                max_tokens=decision.max_tokens,
+                temperature=decision.temperature,
+                prompt_tokens=ctx_len
+            )
+
+        if larger:
+            window, decision.model = larger[-1]
+        decision.max_tokens = max(window - ctx_len, 256)
+        if ctx_len + decision.max_tokens > window:
+            logger.warning(
+                f"Prompt of {ctx_len} tokens does not fit {decision.model}'s {window}-token context - "
+                f"Ollama will truncate it"
+            )
+        else:
+            logger.info(f"Prompt of {ctx_len} tokens - answer capped at {decision.max_tokens} tokens for {decision.model}")
+        return decision
+
+    def _latency_for(self, model: str) -> ModelLatency:
+        latency = self.latency.get(model)
+        if latency is None:
+            latency = self.latency.setdefault(model, ModelLatency(self.metrics.avg_local_latency or 3.0))
+        return latency
+
+    def predict_latency(self, decision: RoutingDecision) -> Optional[float]:
+        """Expected seconds for a decision: p95 of the model's recent calls (local) or the external average"""
+        if decision.provider == ModelProvider.OLLAMA_LOCAL:
+            return self._latency_for(decision.model).predict(decision.prompt_tokens)
+        return self.metrics.avg_external_latency or None
+
+    def _meet_deadline(self, decision: RoutingDecision, deadline: Optional[float]) -> RoutingDecision:
+        """
+        Swap a local model predicted to miss the deadline for a faster one
+        whose context window still holds the prompt, preferring a model of
+        the same type. Keeps the decision if no candidate is faster.
+        """
+        decision.predicted_latency = self.predict_latency(decision)
+        spec = self.models.get(decision.model)
+        if (deadline is None or decision.provider != ModelProvider.OLLAMA_LOCAL or spec is None
+                or spec["type"] == "embedding" or decision.predicted_latency <= deadline):
+            return decision
+
+        needed = decision.prompt_tokens + decision.max_tokens
+        candidates = [
+            (self._latency_for(name).predict(decision.prompt_tokens), name)
+            for name, other in self.models.items()
+            if name != decision.model and other["type"] != "embedding" and other["max_context"] >= needed
+        ]
+        in_time = [c for c in candidates if c[0] <= deadline]
+        same_type = [c for c in in_time if self.models[c[1]]["type"] == spec["type"]]
+        pool = same_type or in_time or candidates
+        if not pool or min(pool)[0] >= decision.predicted_latency:
+            return decision
+
+        predicted, name = min(pool)
+        logger.info(
+            f"{decision.model} predicted {decision.predicted_latency:.1f}s > {deadline:.1f}s deadline - "
+            f"using {name} ({predicted:.1f}s)"
+        )
+        decision.reason = (
+            f"{decision.reason}; {decision.model} predicted {decision.predicted_latency:.1f}s "
+            f"exceeds the {deadline:.1f}s deadline"
+        )
+        decision.model = name
+        decision.predicted_latency = predicted
+        return decision
+
+    def _record_local(self, model: str, latency: float, result: Dict[str, Any], queue_wait: float = 0.0) -> None:
+        """Count a completed local query, add it to the model's window and fold it into the moving average"""
+        self.metrics.local_queries += 1
+        self.metrics.total_queries += 1
+        # The model's window predicts service time; queueing is the router's own
+        self._latency_for(model).record(latency - queue_wait, result)
+
+        if self.metrics.avg_local_latency == 0:
+            self.metrics.avg_local_latency = latency
+        else:
+            self.metrics.avg_local_latency = (
+                self.metrics.avg_local_latency * 0.9 + latency * 0.1
+            )
+
     async def call_local_llm(
         self,
         model: str,
         prompt: str,
         max_tokens: int = 2000,
         temperature: float = 0.3,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        priority: Priority = Priority.NORMAL
     ) -> Dict:
-        """Call local Ollama model"""
+        """Call local Ollama model (admitted through the model's priority queue)"""
         start_time = time.time()
 
         try:
@@ -316,26 +606,14 @@ class Mem0LLMRouter:
                 }
             }
 
-            response = await self.http_client.post(
-                f"{self.ollama_url}/api/generate",
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
-
-            latency = time.time() - start_time
+            if self.keep_alive:
+                payload["keep_alive"] = self.keep_alive
 
-            # Update metrics
-            self.metrics.local_queries += 1
-            self.metrics.total_queries += 1
+            async with get_model_queue(model).slot(priority) as queue_wait:
+                result = await self.gateway.apost("/api/generate", payload, timeout=120.0)
 
-            # Update average latency
-            if self.metrics.avg_local_latency == 0:
-                self.metrics.avg_local_latency = latency
-            else:
-                self.metrics.avg_local_latency = (
-                    self.metrics.avg_local_latency * 0.9 + latency * 0.1
-                )
+            latency = time.time() - start_time
+            self._record_local(model, latency, result, queue_wait)
 
             logger.info(f"Local LLM ({model}) - {latency:.2f}s - Cost: $0.00")
 
@@ -345,13 +623,81 @@ class Mem0LLMRouter:
                 "provider": "ollama_local",
                 "tokens": result.get("eval_count", 0),
                 "cost": 0.0,
-                "latency": latency
+                "latency": latency,
+                "queue_wait": queue_wait
             }
 
         except Exception as e:
             logger.error(f"Local LLM error ({model}): {str(e)}")
             raise
 
+    async def stream_local_llm(
+        self,
+        model: str,
+        prompt: str,
+        max_tokens: int = 2000,
+        temperature: float = 0.3,
+        system_prompt: Optional[str] = None,
+        priority: Priority = Priority.NORMAL
+    ) -> AsyncIterator[Dict]:
+        """
+        Stream a local Ollama completion, holding a slot in the model's
+        priority queue until the stream ends.
+
+        Yields {"type": "token", "text": ...} per chunk, then one
+        {"type": "done", ...} with the same fields call_local_llm returns.
+        """
+        start_time = time.time()
+        full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+        payload = {
+            "model": model,
+            "prompt": full_prompt,
+            "stream": True,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+
+        parts: List[str] = []
+        final: Dict[str, Any] = {}
+        first_token_latency = None
+        queue = get_model_queue(model)
+        queue_wait = await queue.acquire(priority)
+        try:
+            async for chunk in self.gateway.astream("/api/generate", payload, timeout=120.0):
+                text = chunk.get("response", "")
+                if text:
+                    if first_token_latency is None:
+                        first_token_latency = time.time() - start_time
+                    parts.append(text)
+                    yield {"type": "token", "text": text}
+                if chunk.get("done"):
+                    final = chunk
+        except Exception as e:
+            logger.error(f"Local LLM stream error ({model}): {str(e)}")
+            raise
+        finally:
+            queue.release()
+
+        latency = time.time() - start_time
+        self._record_local(model, latency, final, queue_wait)
+        logger.info(f"Local LLM stream ({model}) - {latency:.2f}s - Cost: $0.00")
+
+        yield {
+            "type": "done",
+            "response": "".join(parts),
+            "model": model,
+            "provider": "ollama_local",
+            "tokens": final.get("eval_count", 0),
+            "cost": 0.0,
+            "latency": latency,
+            "first_token_latency": first_token_latency,
+            "queue_wait": queue_wait
+        }
+
     async def call_external_api(
         self,
         model: str,
@@ -414,13 +760,50 @@ class Mem0LLMRouter:
             logger.error(f"External API error ({model}): {str(e)}")
             raise
 
+    async def _embed_for_cache(self, prompt: str) -> Optional[List[float]]:
+        try:
+            data = await self.gateway.apost(
+                "/api/embed", {"model": self.cache_embed_model, "input": [prompt]}, timeout=30.0
+            )
+            return data["embeddings"][0]
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed ({self.cache_embed_model}): {str(e)}")
+            return None
+
+    async def _cache_lookup(
+        self, decision: RoutingDecision, prompt: str, system_prompt: Optional[str]
+    ) -> Tuple[Optional[Dict], Optional[List[float]]]:
+        """
+        (cached result or None, prompt embedding to store with the fresh result).
+
+        The exact level is tried first; the semantic level only for
+        temperature-0 decisions with prompts the embedder reads in full.
+        """
+        cache = self.response_cache
+        if not cache.enabled:
+            return None, None
+        start_time = time.time()
+        hit, kind, vector = cache.get(decision.model, system_prompt, prompt, decision.temperature), "exact", None
+        if (hit is None and cache.wants_vector(decision.temperature)
+                and decision.prompt_tokens <= SEMANTIC_CACHE_MAX_PROMPT_TOKENS):
+            vector = await self._embed_for_cache(prompt)
+            if vector is not None:
+                hit, kind = cache.get_similar(decision.model, system_prompt, vector), "semantic"
+        if hit is None:
+            cache.miss()
+            return None, vector
+        logger.info(f"Response cache {kind} hit ({decision.model}) - Cost: $0.00")
+        return {**hit, "cached": kind, "cost": 0.0, "latency": time.time() - start_time}, vector
+
     async def execute_query(
         self,
         query_text: str,
         query_type: Optional[QueryType] = None,
         context_length: Optional[int] = None,
         system_prompt: Optional[str] = None,
-        force_local: bool = False
+        force_local: bool = False,
+        deadline: Optional[float] = None,
+        priority: Priority = Priority.NORMAL
     ) -> Dict:
         """
         Execute a query with automatic routing.
@@ -431,33 +814,106 @@ class Mem0LLMRouter:
             context_length: Optional context length
             system_prompt: Optional system message
             force_local: Force local execution
+            deadline: Optional latency budget in seconds (see route_query)
+            priority: Queue priority for local models (interactive calls go first)
 
         Returns:
             Dict with response, model, cost, latency, etc.
         """
         # Get routing decision
-        decision = self.route_query(query_text, query_type, context_length, force_local)
+        decision = self.route_query(query_text, query_type, context_length, force_local, deadline)
 
         logger.info(f"Routing: {decision.provider.value} / {decision.model}")
         logger.info(f"Reason: {decision.reason}")
 
+        cached, vector = await self._cache_lookup(decision, query_text, system_prompt)
+        if cached is not None:
+            return cached
+
         # Execute based on provider
         if decision.provider == ModelProvider.OLLAMA_LOCAL:
-            return await self.call_local_llm(
+            result = await self.call_local_llm(
+                model=decision.model,
+                prompt=query_text,
+                max_tokens=decision.max_tokens,
+                temperature=decision.temperature,
+                system_prompt=system_prompt,
+                priority=priority
+            )
+        else:
+            result = await self.call_external_api(
                 model=decision.model,
                 prompt=query_text,
                 max_tokens=decision.max_tokens,
                 temperature=decision.temperature,
                 system_prompt=system_prompt
             )
+        self.response_cache.put(decision.model, system_prompt, query_text, decision.temperature, result, vector)
+        return result
+
+    async def stream_query(
+        self,
+        query_text: str,
+        query_type: Optional[QueryType] = None,
+        context_length: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+        force_local: bool = False,
+        deadline: Optional[float] = None,
+        priority: Priority = Priority.NORMAL
+    ) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of execute_query.
+
+        Yields {"type": "routing", ...} with the decision first, then token
+        events and a final "done" event. External API responses and cached
+        responses are not streamed and arrive as one token event.
+        """
+        decision = self.route_query(query_text, query_type, context_length, force_local, deadline)
+
+        logger.info(f"Routing (stream): {decision.provider.value} / {decision.model}")
+
+        yield {
+            "type": "routing",
+            "provider": decision.provider.value,
+            "model": decision.model,
+            "reason": decision.reason,
+            "estimated_cost": decision.estimated_cost,
+            "prompt_tokens": decision.prompt_tokens,
+            "predicted_latency": decision.predicted_latency
+        }
+
+        cached, vector = await self._cache_lookup(decision, query_text, system_prompt)
+        if cached is not None:
+            yield {"type": "token", "text": cached["response"]}
+            yield {"type": "done", **cached}
+            return
+
+        if decision.provider == ModelProvider.OLLAMA_LOCAL:
+            async for event in self.stream_local_llm(
+                model=decision.model,
+                prompt=query_text,
+                max_tokens=decision.max_tokens,
+                temperature=decision.temperature,
+                system_prompt=system_prompt,
+                priority=priority
+            ):
+                if event["type"] == "done":
+                    result = {k: v for k, v in event.items() if k != "type"}
+                    self.response_cache.put(
+                        decision.model, system_prompt, query_text, decision.temperature, result, vector
+                    )
+                yield event
         else:
-            return await self.call_external_api(
+            result = await self.call_external_api(
                 model=decision.model,
                 prompt=query_text,
                 max_tokens=decision.max_tokens,
                 temperature=decision.temperature,
                 system_prompt=system_prompt
             )
+            self.response_cache.put(decision.model, system_prompt, query_text, decision.temperature, result, vector)
+            yield {"type": "token", "text": result["response"]}
+            yield {"type": "done", **result}
 
     def get_metrics(self) -> Dict:
         """Get current routing metrics"""
@@ -476,7 +932,17 @@ class Mem0LLMRouter:
             "avg_local_latency": round(self.metrics.avg_local_latency, 2),
             "avg_external_latency": round(self.metrics.avg_external_latency, 2),
             "target_local_pct": self.local_threshold,
-            "on_target": local_pct >= self.local_threshold
+            "on_target": local_pct >= self.local_threshold,
+            "classification_cache": {
+                "size": len(self._classify_cache),
+                "max_size": self.classify_cache_size,
+                "hits": self.classify_hits,
+                "misses": self.classify_misses,
+            },
+            "token_counters": token_counter_stats(),
+            "response_cache": self.response_cache.stats(),
+            "queues": model_queue_stats(),
+            "model_latency": {model: latency.stats() for model, latency in list(self.latency.items())},
         }
 
     async def health_check(self) -> Dict:
@@ -489,11 +955,9 @@ class Mem0LLMRouter:
 
         # Check Ollama
         try:
-            response = await self.http_client.get(f"{self.ollama_url}/api/tags")
-            if response.status_code == 200:
-                data = response.json()
-                health["ollama"] = True
-                health["ollama_models"] = [m["name"] for m in data.get("models", [])]
+            data = await self.gateway.aget("/api/tags", timeout=10.0)
+            health["ollama"] = True
+            health["ollama_models"] = [m["name"] for m in data.get("models", [])]
         except:
             pass
 
@@ -8,19 +8,55 @@ Created: 2026-01-07
 Purpose: Strategic permanent fix for Ollama-only operation
 Approved: User explicit approval via Wingman oversight
 """
+import asyncio
 import logging
+import math
 import os
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+# mem0 imports `ollama.Client` lazily; the HTTP shim has to be in sys.modules first.
+# It batches embeddings through /api/embed (see mock_ollama_module.py).
+if os.environ.get("MEM0_OLLAMA_HTTP_CLIENT", "true").lower() in ("1", "true", "yes"):
+    from mock_ollama_module import install_mock_ollama_module
+
+    install_mock_ollama_module()
+
 from mem0 import Memory
 
+from cache_bus import CacheInvalidationBus
+from embedder_proxy import EmbedderProxy, EmbeddingCache
+from ingest_queue import IngestQueue
+from llm_router import QueryType, get_router
+from model_queue import ModelQueueTimeout, Priority
+from memory_bootstrap import MemoryBootstrap, MemoryNotReadyError, prewarm_pgvector
+from memory_executor import ExecutorSaturatedError, MemoryExecutor
+from memory_pages import MemoryPager, decode_cursor
+from ollama_balancer import balancer_stats, close_balancer, configured_urls, get_balancer
+from ollama_client import CircuitOpenError, circuit_states, close_gateways, gateway_stats
+from ollama_residency import EMBEDDER, LLM, ModelResidencyManager
+from progress_events import ProgressChannel, close_channel, format_sse, open_channel
+from quantized_search import install_quantized_search, quantized_index_present
+from search_cache import SearchResultCache
+from stage_timing import REQUEST_DURATION, bind_context, end_request, instrument, render_metrics, start_request
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# uvicorn worker processes (MEM0_WORKERS > 1) import this module fresh and miss the
+# Neo4j GDS patch applied by the start script, so apply it here as well (idempotent)
+try:
+    from mem0_gds_patch_v2 import patch_neo4j_graph
+except ImportError:
+    patch_neo4j_graph = None
+if patch_neo4j_graph is not None:
+    patch_neo4j_graph()
+
 # Load environment variables
 load_dotenv()
 
@@ -48,7 +84,10 @@ LLM_PROVIDER = os.environ.get("MEM0_LLM_PROVIDER", "ollama")
 EMBEDDER_PROVIDER = os.environ.get("MEM0_EMBEDDER_PROVIDER", "ollama")
 
 # Ollama configuration
-OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://host.docker.internal:11434")
+# OLLAMA_URLS=http://gpu1:11434,http://gpu2:11434 balances over several hosts
+# (see ollama_balancer.py); the first one is what mem0's config names
+OLLAMA_URLS = configured_urls()
+OLLAMA_URL = OLLAMA_URLS[0]
 LLM_MODEL = os.environ.get("MEM0_LLM_MODEL", "mistral:7b-instruct-q5_K_M")
 EMBEDDER_MODEL = os.environ.get("MEM0_EMBEDDER_MODEL", "nomic-embed-text:latest")
 
@@ -57,6 +96,99 @@ OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 OPENAI_LLM_MODEL = os.environ.get("OPENAI_LLM_MODEL", "gpt-4o")
 OPENAI_EMBEDDER_MODEL = os.environ.get("OPENAI_EMBEDDER_MODEL", "text-embedding-3-small")
 
+# =============================================================================
+# CONCURRENCY CONFIGURATION
+# =============================================================================
+# mem0 calls are blocking; they run on bounded pools so the event loop stays free.
+# Writes (LLM fact extraction) are kept small so they cannot starve searches.
+READ_WORKERS = int(os.environ.get("MEM0_READ_WORKERS", "8"))
+WRITE_WORKERS = int(os.environ.get("MEM0_WRITE_WORKERS", "2"))
+EXECUTOR_MAX_QUEUE = int(os.environ.get("MEM0_EXECUTOR_MAX_QUEUE", "256"))
+
+# Batch ingestion: items per request and how many are in flight at once
+BATCH_MAX_ITEMS = int(os.environ.get("MEM0_BATCH_MAX_ITEMS", "1000"))
+BATCH_CONCURRENCY = int(os.environ.get("MEM0_BATCH_CONCURRENCY", str(WRITE_WORKERS)))
+SEARCH_BATCH_MAX_QUERIES = int(os.environ.get("MEM0_SEARCH_BATCH_MAX_QUERIES", "50"))
+# Results per search; 100 x the binary oversample (10) is pgvector's ef_search ceiling
+SEARCH_MAX_LIMIT = int(os.environ.get("MEM0_SEARCH_MAX_LIMIT", "100"))
+
+# Query embedding cache (0 entries disables it)
+EMBED_CACHE_SIZE = int(os.environ.get("MEM0_EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_TTL = float(os.environ.get("MEM0_EMBED_CACHE_TTL", "3600"))
+
+# /search result cache, invalidated per user_id on writes (0 entries disables it)
+SEARCH_CACHE_SIZE = int(os.environ.get("MEM0_SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.environ.get("MEM0_SEARCH_CACHE_TTL", "300"))
+
+# Write-behind ingestion queue for POST /memories/async
+INGEST_QUEUE_PATH = os.environ.get(
+    "MEM0_INGEST_QUEUE_PATH", os.path.join(os.path.dirname(HISTORY_DB_PATH), "ingest_queue.db")
+)
+INGEST_WORKERS = int(os.environ.get("MEM0_INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS = int(os.environ.get("MEM0_INGEST_MAX_ATTEMPTS", "3"))
+# Delay before a failed job is retried, doubled per attempt up to the maximum
+INGEST_RETRY_BACKOFF = float(os.environ.get("MEM0_INGEST_RETRY_BACKOFF", "5"))
+INGEST_MAX_RETRY_BACKOFF = float(os.environ.get("MEM0_INGEST_MAX_RETRY_BACKOFF", "300"))
+
+# GET /memories pagination
+MEMORIES_DEFAULT_PAGE_SIZE = int(os.environ.get("MEM0_MEMORIES_DEFAULT_PAGE_SIZE", "50"))
+MEMORIES_MAX_PAGE_SIZE = int(os.environ.get("MEM0_MEMORIES_MAX_PAGE_SIZE", "500"))
+MEMORIES_EXPORT_BATCH = int(os.environ.get("MEM0_MEMORIES_EXPORT_BATCH", "500"))
+
+# uvicorn worker processes; each owns its Memory instance, pools and caches.
+# Search cache invalidations are broadcast between them over Postgres LISTEN/NOTIFY.
+SERVER_WORKERS = int(os.environ.get("MEM0_WORKERS", "1"))
+CACHE_BUS_ENABLED = os.environ.get(
+    "MEM0_CACHE_BUS", "true" if SERVER_WORKERS > 1 else "false"
+).lower() in ("1", "true", "yes")
+CACHE_BUS_CHANNEL = os.environ.get("MEM0_CACHE_BUS_CHANNEL", "mem0_cache_invalidate")
+
+# Per-stage timings (Server-Timing header + /metrics histograms)
+STAGE_TIMING_ENABLED = os.environ.get("MEM0_STAGE_TIMING", "true").lower() in ("1", "true", "yes")
+
+# Server-Sent Events: comment line sent while nothing else happens, so proxies keep the stream open
+SSE_KEEPALIVE_SECONDS = float(os.environ.get("MEM0_SSE_KEEPALIVE_SECONDS", "15"))
+
+# Reduced-precision ANN index with exact rescoring: off, halfvec or binary. The index is
+# built by scripts/quantize_vectors.py; until it exists, search (and mem0's own HNSW
+# index) stays full-precision.
+VECTOR_QUANTIZATION = os.environ.get("MEM0_VECTOR_QUANTIZATION", "off").strip().lower()
+QUANTIZED_OVERSAMPLE = int(os.environ.get("MEM0_QUANTIZED_OVERSAMPLE", "0")) or None
+
+# pgvector connection pool (per worker process) - sized so every read/write worker can hold a connection
+PG_MINCONN = int(os.environ.get("MEM0_PG_MINCONN", "1"))
+PG_MAXCONN = int(os.environ.get("MEM0_PG_MAXCONN", str(READ_WORKERS + WRITE_WORKERS)))
+
+# =============================================================================
+# STARTUP CONFIGURATION
+# =============================================================================
+# Memory is initialized in the background; these control retries and the warmup
+# run before /ready turns green. MEM0_WARMUP is a comma list of ollama,pgvector,search
+# (empty or "none" disables warmup).
+INIT_RETRY_INTERVAL = float(os.environ.get("MEM0_INIT_RETRY_INTERVAL", "5"))
+INIT_MAX_RETRY_INTERVAL = float(os.environ.get("MEM0_INIT_MAX_RETRY_INTERVAL", "60"))
+WARMUP_STEPS = [
+    step.strip()
+    for step in os.environ.get("MEM0_WARMUP", "ollama,pgvector,search").split(",")
+    if step.strip() and step.strip() != "none"
+]
+
+# =============================================================================
+# MODEL RESIDENCY
+# =============================================================================
+# keep_alive is sent on every Ollama request and on the startup preload. The monitor
+# polls /api/ps; within OLLAMA_PING_HOURS on OLLAMA_PING_DAYS it re-loads configured
+# models that were unloaded or are about to expire.
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+RESIDENCY_CHECK_INTERVAL = float(os.environ.get("OLLAMA_RESIDENCY_CHECK_INTERVAL", "60"))
+PING_HOURS = os.environ.get("OLLAMA_PING_HOURS", "")
+PING_DAYS = os.environ.get("OLLAMA_PING_DAYS", "mon-fri")
+
+
+def active_embedder_model() -> str:
+    """Embedder model in use for the configured provider"""
+    return EMBEDDER_MODEL if EMBEDDER_PROVIDER.lower() == "ollama" else OPENAI_EMBEDDER_MODEL
+
 
 def build_config() -> Dict:
     """
@@ -121,6 +253,10 @@ def build_config() -> Dict:
                 "user": POSTGRES_USER,
                 "password": POSTGRES_PASSWORD,
                 "collection_name": POSTGRES_COLLECTION_NAME,
+                "minconn": PG_MINCONN,
+                "maxconn": PG_MAXCONN,
+                # Turned off in create_memory() once the quantized index exists
+                "hnsw": True,
             },
         },
         "graph_store": {
@@ -146,16 +282,150 @@ logging.info("=" * 60)
 logging.info(f"LLM Provider: {LLM_PROVIDER}")
 logging.info(f"Embedder Provider: {EMBEDDER_PROVIDER}")
 if LLM_PROVIDER.lower() == "ollama":
-    logging.info(f"Ollama URL: {OLLAMA_URL}")
+    logging.info(f"Ollama URLs: {', '.join(OLLAMA_URLS)}")
     logging.info(f"LLM Model: {LLM_MODEL}")
     logging.info(f"Embedder Model: {EMBEDDER_MODEL}")
 logging.info("=" * 60)
 
-# Build config and initialize memory
 DEFAULT_CONFIG = build_config()
-MEMORY_INSTANCE = Memory.from_config(DEFAULT_CONFIG)
+PG_CONNINFO = (
+    f"host={POSTGRES_HOST} port={POSTGRES_PORT} dbname={POSTGRES_DB} "
+    f"user={POSTGRES_USER} password={POSTGRES_PASSWORD}"
+)
+
+# Batch endpoints pre-compute embeddings and hand them to mem0 through an
+# EmbedderProxy; repeated texts are answered from this cache without calling the embedder
+EMBEDDING_CACHE = EmbeddingCache(
+    model=active_embedder_model(),
+    max_entries=EMBED_CACHE_SIZE,
+    ttl_seconds=EMBED_CACHE_TTL,
+)
+
+
+def instrument_memory(memory: Memory) -> None:
+    """Time the embedder, pgvector, graph, LLM and history DB calls mem0 makes"""
+    instrument(memory.embedding_model, "embed", ["embed", "embed_many"])
+    instrument(memory.vector_store, "pgvector", ["search", "insert", "update", "delete", "get", "list"])
+    instrument(memory.llm, "llm", ["generate_response"])
+    instrument(memory.db, "history", ["add_history", "batch_add_history", "get_history"])
+    graph = getattr(memory, "graph", None) if getattr(memory, "enable_graph", False) else None
+    if graph is not None:
+        instrument(graph, "graph", ["add", "search", "get_all", "delete_all"])
+        instrument(getattr(graph, "embedding_model", None), "embed", ["embed"])
+        instrument(getattr(graph, "llm", None), "llm", ["generate_response"])
+
+
+def create_memory() -> Memory:
+    """Memory.from_config with the caching embedder proxy installed"""
+    config = DEFAULT_CONFIG
+    if quantized_index_present(PG_CONNINFO, POSTGRES_COLLECTION_NAME, VECTOR_QUANTIZATION):
+        # Search goes through the quantized index: don't let mem0 re-create the full-precision one
+        store = config["vector_store"]
+        config = {**config, "vector_store": {**store, "config": {**store["config"], "hnsw": False}}}
+    memory = Memory.from_config(config)
+    memory.embedding_model = EmbedderProxy(memory.embedding_model, cache=EMBEDDING_CACHE)
+    install_quantized_search(memory.vector_store, VECTOR_QUANTIZATION, QUANTIZED_OVERSAMPLE)
+    if STAGE_TIMING_ENABLED:
+        instrument_memory(memory)
+    # Entry points mem0 submits to its own thread pool: carry the request context
+    # (stage recorder, progress channel of /memories/stream) into those threads
+    bind_context(memory, ["_add_to_vector_store", "_add_to_graph", "_search_vector_store", "_get_all_from_vector_store"])
+    logging.info("mem0 Memory instance initialized successfully")
+    return memory
+
+
+def build_model_residency() -> Optional[ModelResidencyManager]:
+    """Residency manager for the Ollama-served models (None when neither model is on Ollama)"""
+    models = []
+    if LLM_PROVIDER.lower() == "ollama":
+        models.append((LLM_MODEL, LLM))
+    if EMBEDDER_PROVIDER.lower() == "ollama":
+        models.append((EMBEDDER_MODEL, EMBEDDER))
+    if not models:
+        return None
+    return ModelResidencyManager(
+        get_balancer(OLLAMA_URL),
+        models,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        check_interval=RESIDENCY_CHECK_INTERVAL,
+        ping_hours=PING_HOURS,
+        ping_days=PING_DAYS,
+    )
+
+
+MODEL_RESIDENCY = build_model_residency()
+
+
+def build_warmup_steps() -> List:
+    """Warmup steps selected by MEM0_WARMUP, in the order they should run"""
+    steps = []
+    if "ollama" in WARMUP_STEPS and MODEL_RESIDENCY is not None:
+        steps.append(("ollama", lambda memory: MODEL_RESIDENCY.preload()))
+    if "pgvector" in WARMUP_STEPS:
+        steps.append(("pgvector", lambda memory: prewarm_pgvector(PG_CONNINFO, POSTGRES_COLLECTION_NAME)))
+    if "search" in WARMUP_STEPS:
+        # One end-to-end search: embedder, HNSW scan and graph lookup
+        steps.append(("search", lambda memory: memory.search("warmup", user_id="__warmup__", limit=1)))
+    return steps
+
 
-logging.info("mem0 Memory instance initialized successfully")
+SEARCH_CACHE = SearchResultCache(max_entries=SEARCH_CACHE_SIZE, ttl_seconds=SEARCH_CACHE_TTL)
+CACHE_BUS = (
+    CacheInvalidationBus(PG_CONNINFO, on_invalidate=SEARCH_CACHE.invalidate, channel=CACHE_BUS_CHANNEL)
+    if CACHE_BUS_ENABLED
+    else None
+)
+
+
+def invalidate_search_cache(user_id: Optional[str]) -> None:
+    """Drop cached searches for user_id here and in every other worker (None clears all)"""
+    SEARCH_CACHE.invalidate(user_id)
+    if CACHE_BUS is not None:
+        CACHE_BUS.publish(user_id)
+
+
+def process_ingest_job(payload: Dict[str, Any]) -> Any:
+    """Ingest queue worker: the same Memory.add call as POST /memories, on the same write pool"""
+    try:
+        return MEMORY_EXECUTOR.call_write(
+            MEMORY_BOOTSTRAP.get().add,
+            payload["messages"],
+            user_id=payload.get("user_id"),
+            agent_id=payload.get("agent_id"),
+            run_id=payload.get("run_id"),
+            metadata=payload.get("metadata"),
+            infer=payload.get("infer", True),
+        )
+    finally:
+        invalidate_search_cache(payload.get("user_id"))
+
+
+# Keyset pages and NDJSON exports read the pgvector table directly
+MEMORY_PAGER = MemoryPager(PG_CONNINFO, POSTGRES_COLLECTION_NAME)
+
+INGEST_QUEUE = IngestQueue(
+    INGEST_QUEUE_PATH,
+    handler=process_ingest_job,
+    workers=INGEST_WORKERS,
+    max_attempts=INGEST_MAX_ATTEMPTS,
+    retry_backoff=INGEST_RETRY_BACKOFF,
+    max_retry_backoff=INGEST_MAX_RETRY_BACKOFF,
+)
+
+# Ingest workers only start once Memory is ready; /memories/async accepts jobs before that
+MEMORY_BOOTSTRAP = MemoryBootstrap(
+    factory=create_memory,
+    warmup=build_warmup_steps(),
+    on_ready=[INGEST_QUEUE.start],
+    retry_interval=INIT_RETRY_INTERVAL,
+    max_retry_interval=INIT_MAX_RETRY_INTERVAL,
+)
+
+MEMORY_EXECUTOR = MemoryExecutor(
+    read_workers=READ_WORKERS,
+    write_workers=WRITE_WORKERS,
+    max_queue=EXECUTOR_MAX_QUEUE,
+)
 
 # =============================================================================
 # FASTAPI APPLICATION
@@ -167,6 +437,96 @@ app = FastAPI(
 )
 
 
+@app.middleware("http")
+async def stage_timing_middleware(request: Request, call_next):
+    """Per-request stage breakdown as a Server-Timing header, plus route latency histograms"""
+    if not STAGE_TIMING_ENABLED:
+        return await call_next(request)
+    recorder, token = start_request()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        end_request(token)
+        # Route template, not the raw path, to keep memory ids out of the labels
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_DURATION.observe((request.method, route, str(status)), elapsed)
+    response.headers["Server-Timing"] = recorder.server_timing(elapsed)
+    return response
+
+
+@app.on_event("startup")
+async def start_background_services():
+    if CACHE_BUS is not None:
+        CACHE_BUS.start()
+    MEMORY_BOOTSTRAP.start()
+    if MODEL_RESIDENCY is not None:
+        MODEL_RESIDENCY.start()
+    MEMORY_PAGER.open()
+    # Index creation can take a while on a large table; don't hold up startup
+    threading.Thread(target=MEMORY_PAGER.ensure_indexes, name="mem0-pager-index", daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    MEMORY_BOOTSTRAP.stop()
+    if MODEL_RESIDENCY is not None:
+        MODEL_RESIDENCY.stop()
+    if CACHE_BUS is not None:
+        CACHE_BUS.stop()
+    INGEST_QUEUE.stop()
+    MEMORY_PAGER.close()
+    MEMORY_EXECUTOR.shutdown()
+    close_balancer()
+    close_gateways()
+
+
+def memory_instance() -> Memory:
+    """The Memory instance, or 503 while it is still initializing/warming up"""
+    try:
+        return MEMORY_BOOTSTRAP.get()
+    except MemoryNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+
+def circuit_open_response(e: CircuitOpenError) -> HTTPException:
+    """503 with Retry-After while Ollama's circuit breaker is open"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+
+async def run_read(fn, *args, **kwargs):
+    """Run a blocking read-path mem0 call on the read pool"""
+    try:
+        return await MEMORY_EXECUTOR.run_read(fn, *args, **kwargs)
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except CircuitOpenError as e:
+        raise circuit_open_response(e)
+
+
+async def run_write(fn, *args, **kwargs):
+    """Run a blocking write-path mem0 call on the write pool"""
+    try:
+        return await MEMORY_EXECUTOR.run_write(fn, *args, **kwargs)
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except CircuitOpenError as e:
+        raise circuit_open_response(e)
+
+
+async def memory_owner(memory_id: str) -> Optional[str]:
+    """user_id of a stored memory, used to scope search cache invalidation"""
+    memory = memory_instance()
+    try:
+        existing = await run_read(memory.get, memory_id)
+    except Exception:
+        return None
+    return existing.get("user_id") if isinstance(existing, dict) else None
+
+
 # =============================================================================
 # PYDANTIC MODELS
 # =============================================================================
@@ -181,6 +541,14 @@ class MemoryCreate(BaseModel):
     agent_id: Optional[str] = None
     run_id: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
+    infer: bool = Field(True, description="Extract facts with the LLM (False stores messages as-is).")
+
+
+class MemoryBatchCreate(BaseModel):
+    items: List[MemoryCreate] = Field(..., description="Memories to store, one entry per add request.")
+    max_concurrency: Optional[int] = Field(
+        None, ge=1, description="Items processed in parallel (capped by MEM0_BATCH_CONCURRENCY)."
+    )
 
 
 class SearchQuery(BaseModel):
@@ -188,13 +556,31 @@ class SearchQuery(BaseModel):
     user_id: Optional[str] = None
     agent_id: Optional[str] = None
     run_id: Optional[str] = None
-    limit: int = 10
+    limit: int = Field(10, ge=1, le=SEARCH_MAX_LIMIT)
+
+
+class SearchBatchQuery(BaseModel):
+    queries: List[SearchQuery] = Field(..., description="Searches to run; results keep this order.")
 
 
 class MemoryUpdate(BaseModel):
     data: str
 
 
+class LLMQuery(BaseModel):
+    query: str = Field(..., description="Prompt to route to a local or external model.")
+    system_prompt: Optional[str] = None
+    query_type: Optional[QueryType] = Field(None, description="Skip classification and route as this type.")
+    force_local: bool = False
+    deadline_ms: Optional[int] = Field(
+        None, gt=0, description="Latency budget; a local model predicted to miss it is swapped for a faster one."
+    )
+    priority: Priority = Field(
+        Priority.NORMAL, description="Queue priority on busy local models: interactive, normal or background."
+    )
+    stream: bool = Field(True, description="Stream tokens as Server-Sent Events (False returns one JSON body).")
+
+
 # =============================================================================
 # API ENDPOINTS
 # =============================================================================
@@ -205,16 +591,28 @@ async def redirect_to_docs():
 
 @app.get("/health")
 async def health():
-    """Health check endpoint with provider information"""
+    """Liveness check with provider information - healthy while Memory is still starting"""
+    circuits = circuit_states()
     return {
-        "status": "healthy",
+        # Still 200: the process is alive, only calls needing Ollama fail fast
+        "status": "degraded" if any(state != "closed" for state in circuits.values()) else "healthy",
+        "ready": MEMORY_BOOTSTRAP.ready,
+        "worker_pid": os.getpid(),
         "llm_provider": LLM_PROVIDER,
         "embedder_provider": EMBEDDER_PROVIDER,
         "llm_model": LLM_MODEL if LLM_PROVIDER.lower() == "ollama" else OPENAI_LLM_MODEL,
-        "embedder_model": EMBEDDER_MODEL if EMBEDDER_PROVIDER.lower() == "ollama" else OPENAI_EMBEDDER_MODEL,
+        "embedder_model": active_embedder_model(),
+        "ollama_circuit": circuits,
     }
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness check - 200 once Memory is initialized and warmed up, 503 before"""
+    status = MEMORY_BOOTSTRAP.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
 @app.get("/config")
 async def get_config():
     """Get current configuration (without sensitive values)"""
@@ -222,28 +620,300 @@ async def get_config():
         "llm_provider": LLM_PROVIDER,
         "llm_model": LLM_MODEL if LLM_PROVIDER.lower() == "ollama" else OPENAI_LLM_MODEL,
         "embedder_provider": EMBEDDER_PROVIDER,
-        "embedder_model": EMBEDDER_MODEL if EMBEDDER_PROVIDER.lower() == "ollama" else OPENAI_EMBEDDER_MODEL,
+        "embedder_model": active_embedder_model(),
         "ollama_url": OLLAMA_URL if LLM_PROVIDER.lower() == "ollama" else None,
+        "ollama_urls": OLLAMA_URLS if LLM_PROVIDER.lower() == "ollama" else None,
         "vector_store": "pgvector",
+        # Configured mode; "active" is what search uses once mem0 is ready (off until the index exists)
+        "vector_quantization": {
+            "configured": VECTOR_QUANTIZATION,
+            "active": getattr(MEMORY_BOOTSTRAP.get().vector_store, "_quant_mode", "off")
+            if MEMORY_BOOTSTRAP.ready else None,
+        },
         "graph_store": "neo4j",
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus histograms for request and stage latency (this worker process)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats/executor")
+async def executor_stats():
+    """Queue depth and timing for the read/write mem0 pools"""
+    return MEMORY_EXECUTOR.get_metrics()
+
+
+@app.get("/stats/embedding-cache")
+async def embedding_cache_stats():
+    """Hit/miss counters and size of the query embedding cache, plus Ollama batching counters"""
+    stats = EMBEDDING_CACHE.stats()
+    if MEMORY_BOOTSTRAP.ready:
+        client = getattr(MEMORY_BOOTSTRAP.get().embedding_model, "client", None)
+        if callable(getattr(client, "embed_stats", None)):
+            stats["batching"] = client.embed_stats()
+    return stats
+
+
+@app.delete("/stats/embedding-cache")
+async def clear_embedding_cache():
+    EMBEDDING_CACHE.clear()
+    return {"status": "cleared"}
+
+
+@app.get("/stats/ollama")
+async def ollama_stats():
+    """Concurrency limits and queue wait per Ollama host and endpoint class, host balancing and model residency"""
+    return {
+        "worker_pid": os.getpid(),
+        "gateways": gateway_stats(),
+        "balancer": balancer_stats(),
+        "residency": MODEL_RESIDENCY.stats() if MODEL_RESIDENCY is not None else None,
+    }
+
+
+@app.post("/stats/ollama/residency/check")
+async def check_model_residency():
+    """Poll /api/ps now (and re-load models if inside the ping window)"""
+    if MODEL_RESIDENCY is None:
+        raise HTTPException(status_code=404, detail="No models are served by Ollama")
+    try:
+        await asyncio.to_thread(MODEL_RESIDENCY.check)
+        return MODEL_RESIDENCY.stats()
+    except Exception as e:
+        logging.error(f"Error checking model residency: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/stats/llm-router")
+async def llm_router_stats():
+    """Local/external split, cost, classification memo and token counters of the /llm/query router"""
+    return {"worker_pid": os.getpid(), **get_router().get_metrics()}
+
+
+@app.delete("/stats/llm-router/response-cache")
+async def clear_llm_response_cache():
+    return {"status": "cleared", "dropped": get_router().response_cache.clear()}
+
+
+@app.get("/stats/search-cache")
+async def search_cache_stats():
+    """Hit/miss counters, partitions and invalidations of the search result cache"""
+    return SEARCH_CACHE.stats()
+
+
+@app.get("/stats/cache-bus")
+async def cache_bus_stats():
+    """Cross-worker invalidation traffic; stats endpoints report on the worker that serves them"""
+    if CACHE_BUS is None:
+        return {"enabled": False, "worker_pid": os.getpid()}
+    return {"enabled": True, "worker_pid": os.getpid(), **CACHE_BUS.stats()}
+
+
+@app.delete("/stats/search-cache")
+async def clear_search_cache():
+    invalidate_search_cache(None)
+    return {"status": "cleared"}
+
+
 @app.post("/memories")
 async def add_memory(memory: MemoryCreate):
     try:
         messages = [{"role": m.role, "content": m.content} for m in memory.messages]
-        result = MEMORY_INSTANCE.add(
+        result = await run_write(
+            memory_instance().add,
             messages,
             user_id=memory.user_id,
             agent_id=memory.agent_id,
             run_id=memory.run_id,
             metadata=memory.metadata,
+            infer=memory.infer,
         )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error adding memory: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        invalidate_search_cache(memory.user_id)
+
+
+async def progress_stream(channel: ProgressChannel, work: "asyncio.Future", started: Dict[str, Any]) -> AsyncIterator[str]:
+    """SSE body: progress events from the channel while `work` runs, then its result or error"""
+    yield format_sse("started", started)
+    while True:
+        getter = asyncio.ensure_future(channel.queue.get())
+        done, _ = await asyncio.wait(
+            {getter, work}, timeout=SSE_KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED
+        )
+        if getter in done:
+            event, data = getter.result()
+            yield format_sse(event, data)
+            continue
+        getter.cancel()
+        if work not in done:
+            yield ": keepalive\n\n"
+            continue
+        break
+    # Events emitted just before the work finished
+    while not channel.queue.empty():
+        event, data = channel.queue.get_nowait()
+        yield format_sse(event, data)
+    try:
+        yield format_sse("result", work.result())
+    except HTTPException as e:
+        yield format_sse("error", {"status": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logging.error(f"Error in streamed request: {str(e)}")
+        yield format_sse("error", {"status": 500, "detail": str(e)})
+
+
+def sse_response(body: AsyncIterator[str]) -> StreamingResponse:
+    # X-Accel-Buffering stops nginx from holding events back
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/memories/stream")
+async def add_memory_stream(memory: MemoryCreate):
+    """
+    Add a memory, streaming progress as Server-Sent Events.
+
+    Events: `started`, `progress` (each LLM call starting and finishing),
+    `fact` (each extracted fact as soon as the LLM has produced it), then
+    `result` with the same body POST /memories returns, or `error`.
+    """
+    instance = memory_instance()
+    messages = [{"role": m.role, "content": m.content} for m in memory.messages]
+    channel, token = open_channel(asyncio.get_running_loop())
+    try:
+        # The task copies the current context, channel included, into the write pool
+        work = asyncio.ensure_future(run_write(
+            instance.add,
+            messages,
+            user_id=memory.user_id,
+            agent_id=memory.agent_id,
+            run_id=memory.run_id,
+            metadata=memory.metadata,
+            infer=memory.infer,
+        ))
+    finally:
+        close_channel(token)
+
+    def finished(task: "asyncio.Future") -> None:
+        # Runs even if the client disconnected mid-stream
+        invalidate_search_cache(memory.user_id)
+        if not task.cancelled():
+            task.exception()
+
+    work.add_done_callback(finished)
+    return sse_response(progress_stream(channel, work, {"user_id": memory.user_id, "infer": memory.infer}))
+
+
+@app.post("/memories/async", status_code=202)
+async def add_memory_async(memory: MemoryCreate):
+    """
+    Queue a memory for background ingestion.
+
+    The request is persisted to the ingest queue and acknowledged right away;
+    fact extraction, graph update and pgvector insert happen on the ingest
+    workers. Poll GET /jobs/{job_id} for progress.
+    """
+    try:
+        job_id = await run_write(INGEST_QUEUE.enqueue, memory.dict())
+        return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error queueing memory: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await run_read(INGEST_QUEUE.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/stats/ingest-queue")
+async def ingest_queue_stats():
+    """Jobs per status and age of the oldest queued job"""
+    return await run_read(INGEST_QUEUE.stats)
+
+
+@app.post("/memories/batch")
+async def add_memories_batch(batch: MemoryBatchCreate):
+    """
+    Store many memories in one request.
+
+    Items are processed with bounded parallelism on the write pool and one
+    result is returned per item, in request order. Messages of items with
+    infer=False are embedded together up front instead of one call per item.
+    """
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(batch.items)} items exceeds limit of {BATCH_MAX_ITEMS}",
+        )
+    embedder = memory_instance().embedding_model
+
+    concurrency = min(batch.max_concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    # infer=False stores message contents verbatim, so their vectors are known now
+    raw_texts = [
+        m.content
+        for item in batch.items
+        if not item.infer
+        for m in item.messages
+        if m.role != "system" and m.content
+    ]
+    primed: List[str] = []
+    if raw_texts:
+        try:
+            vectors = await run_write(embedder.embed_many, raw_texts, "add")
+            embedder.prime(raw_texts, vectors)
+            primed = raw_texts
+        except Exception as e:
+            # Fall back to per-item embedding inside mem0
+            logging.warning(f"Batch pre-embedding failed, embedding per item: {str(e)}")
+
+    async def add_one(index: int, item: MemoryCreate) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                result = await run_write(
+                    memory_instance().add,
+                    [{"role": m.role, "content": m.content} for m in item.messages],
+                    user_id=item.user_id,
+                    agent_id=item.agent_id,
+                    run_id=item.run_id,
+                    metadata=item.metadata,
+                    infer=item.infer,
+                )
+                return {"index": index, "status": "ok", "result": result}
+            except HTTPException as e:
+                return {"index": index, "status": "error", "error": e.detail}
+            except Exception as e:
+                logging.error(f"Error adding batch item {index}: {str(e)}")
+                return {"index": index, "status": "error", "error": str(e)}
+
+    try:
+        results = await asyncio.gather(*(add_one(i, item) for i, item in enumerate(batch.items)))
+    finally:
+        embedder.release(primed)
+        for user_id in {item.user_id for item in batch.items}:
+            invalidate_search_cache(user_id)
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}
 
 
 @app.get("/memories")
@@ -251,19 +921,74 @@ async def get_memories(
     user_id: Optional[str] = None,
     agent_id: Optional[str] = None,
     run_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MEMORIES_MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor."),
+    output_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
 ):
+    """
+    List memories.
+
+    - `limit`/`after`: cursor pagination; follow `next_cursor` until it is null
+    - `format=ndjson`: stream every matching memory, one JSON object per line
+    - neither: the full list from Memory.get_all (original behaviour)
+    """
+    if after is not None:
+        try:
+            decode_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {after}")
+
     try:
-        result = MEMORY_INSTANCE.get_all(user_id=user_id, agent_id=agent_id, run_id=run_id)
+        if output_format == "ndjson":
+            return StreamingResponse(
+                MEMORY_PAGER.iter_ndjson(
+                    batch_size=MEMORIES_EXPORT_BATCH, user_id=user_id, agent_id=agent_id, run_id=run_id
+                ),
+                media_type="application/x-ndjson",
+            )
+
+        if limit is not None or after is not None:
+            items, next_cursor = await run_read(
+                MEMORY_PAGER.page,
+                user_id=user_id,
+                agent_id=agent_id,
+                run_id=run_id,
+                limit=limit or MEMORIES_DEFAULT_PAGE_SIZE,
+                after=after,
+            )
+            return {"memories": items, "next_cursor": next_cursor}
+
+        result = await run_read(
+            memory_instance().get_all, user_id=user_id, agent_id=agent_id, run_id=run_id
+        )
         return {"memories": result}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting memories: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/memories/count")
+async def count_memories(
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+):
+    try:
+        count = await run_read(MEMORY_PAGER.count, user_id=user_id, agent_id=agent_id, run_id=run_id)
+        return {"count": count}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error counting memories: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/memories/{memory_id}")
 async def get_memory(memory_id: str):
     try:
-        result = MEMORY_INSTANCE.get(memory_id)
+        result = await run_read(memory_instance().get, memory_id)
         if result is None:
             raise HTTPException(status_code=404, detail="Memory not found")
         return result
@@ -276,40 +1001,114 @@ async def get_memory(memory_id: str):
 
 @app.put("/memories/{memory_id}")
 async def update_memory(memory_id: str, memory: MemoryUpdate):
+    owner = await memory_owner(memory_id)
     try:
-        result = MEMORY_INSTANCE.update(memory_id, memory.data)
+        result = await run_write(memory_instance().update, memory_id, memory.data)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error updating memory: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        invalidate_search_cache(owner)
 
 
 @app.delete("/memories/{memory_id}")
 async def delete_memory(memory_id: str):
+    owner = await memory_owner(memory_id)
     try:
-        MEMORY_INSTANCE.delete(memory_id)
+        await run_write(memory_instance().delete, memory_id)
         return {"status": "deleted", "memory_id": memory_id}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error deleting memory: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        invalidate_search_cache(owner)
+
+
+async def cached_search(query: SearchQuery) -> Any:
+    """Memory.search through the result cache"""
+    cached = SEARCH_CACHE.get(query.query, query.user_id, query.agent_id, query.run_id, query.limit)
+    if cached is not None:
+        return cached
+    token = SEARCH_CACHE.generation(query.user_id)
+    result = await run_read(
+        memory_instance().search,
+        query.query,
+        user_id=query.user_id,
+        agent_id=query.agent_id,
+        run_id=query.run_id,
+        limit=query.limit,
+    )
+    SEARCH_CACHE.put(query.query, query.user_id, query.agent_id, query.run_id, query.limit, result, token)
+    return result
 
 
 @app.post("/search")
 async def search_memories(query: SearchQuery):
     try:
-        result = MEMORY_INSTANCE.search(
-            query.query,
-            user_id=query.user_id,
-            agent_id=query.agent_id,
-            run_id=query.run_id,
-            limit=query.limit,
-        )
+        result = await cached_search(query)
         return {"results": result}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error searching memories: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/search/batch")
+async def search_memories_batch(batch: SearchBatchQuery):
+    """
+    Run several searches in one request.
+
+    All query texts are embedded in a single embedder pass, then the vector
+    lookups run concurrently on the read pool. Results are returned in the
+    same order as the queries.
+    """
+    if len(batch.queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(batch.queries)} queries exceeds limit of {SEARCH_BATCH_MAX_QUERIES}",
+        )
+    embedder = memory_instance().embedding_model
+
+    # Only queries that miss the result cache need an embedding
+    texts = [
+        q.query
+        for q in batch.queries
+        if not SEARCH_CACHE.contains(q.query, q.user_id, q.agent_id, q.run_id, q.limit)
+    ]
+    primed: List[str] = []
+    if texts:
+        try:
+            vectors = await run_read(embedder.embed_many, texts, "search")
+            embedder.prime(texts, vectors)
+            primed = texts
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.warning(f"Batch query embedding failed, embedding per query: {str(e)}")
+
+    async def search_one(index: int, query: SearchQuery) -> Dict[str, Any]:
+        try:
+            result = await cached_search(query)
+            return {"index": index, "status": "ok", "results": result}
+        except HTTPException as e:
+            return {"index": index, "status": "error", "error": e.detail}
+        except Exception as e:
+            logging.error(f"Error in batch search {index}: {str(e)}")
+            return {"index": index, "status": "error", "error": str(e)}
+
+    try:
+        results = await asyncio.gather(*(search_one(i, q) for i, q in enumerate(batch.queries)))
+    finally:
+        embedder.release(primed)
+    return {"results": results}
+
+
 @app.delete("/memories")
 async def delete_all_memories(
     user_id: Optional[str] = None,
@@ -317,18 +1116,73 @@ async def delete_all_memories(
     run_id: Optional[str] = None,
 ):
     try:
-        MEMORY_INSTANCE.delete_all(user_id=user_id, agent_id=agent_id, run_id=run_id)
+        await run_write(
+            memory_instance().delete_all, user_id=user_id, agent_id=agent_id, run_id=run_id
+        )
         return {"status": "deleted"}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error deleting memories: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        invalidate_search_cache(user_id)
+
+
+async def llm_events(query: LLMQuery) -> AsyncIterator[str]:
+    try:
+        async for event in get_router().stream_query(
+            query.query,
+            query_type=query.query_type,
+            system_prompt=query.system_prompt,
+            force_local=query.force_local,
+            deadline=query.deadline_ms / 1000 if query.deadline_ms else None,
+            priority=query.priority,
+        ):
+            yield format_sse(event.pop("type"), event)
+    except ModelQueueTimeout as e:
+        yield format_sse("error", {"status": 503, "detail": str(e)})
+    except Exception as e:
+        logging.error(f"Error streaming LLM query: {str(e)}")
+        yield format_sse("error", {"status": 500, "detail": str(e)})
+
+
+@app.post("/llm/query")
+async def llm_query(query: LLMQuery):
+    """
+    Run a prompt through Mem0LLMRouter.
+
+    Streams Server-Sent Events by default: `routing` (provider, model and
+    reason), `token` per chunk, then `done` with model, tokens, cost and
+    latency, or `error`.
+    """
+    if query.stream:
+        return sse_response(llm_events(query))
+    try:
+        return await get_router().execute_query(
+            query.query,
+            query_type=query.query_type,
+            system_prompt=query.system_prompt,
+            force_local=query.force_local,
+            deadline=query.deadline_ms / 1000 if query.deadline_ms else None,
+            priority=query.priority,
+        )
+    except ModelQueueTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error running LLM query: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/reset")
 async def reset():
     try:
-        MEMORY_INSTANCE.reset()
+        await run_write(memory_instance().reset)
         return {"status": "reset"}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error resetting memory: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        invalidate_search_cache(None)
@@ -20,6 +20,10 @@ def patch_neo4j_graph():
         # Import Neo4jGraph
         from mem0.memory.graph_memory import Neo4jGraph
 
+        # Already patched in this process (start script, then main in each worker)
+        if getattr(Neo4jGraph.query, "_gds_patched", False):
+            return True
+
         # Store original query method
         original_query = Neo4jGraph.query
 
@@ -35,6 +39,7 @@ def patch_neo4j_graph():
             return original_query(self, cypher, params)
 
         # Apply patch
+        patched_query._gds_patched = True
         Neo4jGraph.query = patched_query
 
         print("✅ Neo4jGraph.query() patched successfully")
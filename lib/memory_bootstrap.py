@@ -0,0 +1,184 @@
+"""
+Memory Bootstrap - Background initialization and warmup of the mem0 Memory instance
+Location: /Volumes/Data/ai_projects/mem0-system/lib/memory_bootstrap.py
+Purpose: Let uvicorn bind immediately while Postgres, Neo4j and Ollama come up
+Scope: Retrying Memory.from_config in a background thread, readiness state, optional warmup steps
+
+Memory.from_config connects to every backend, so running it at import time
+means a slow dependency keeps the port closed and the container restarts in
+a loop. The bootstrap thread retries with backoff instead; /health stays up
+as a liveness signal while /ready reports when requests can be served.
+
+Warmup steps run after initialization and before the instance is published:
+loading the Ollama models into memory (ollama_residency.py) and reading the pgvector table and
+index pages into shared buffers, so the first real requests don't pay for
+cold caches. Warmup is best effort - a failed step is recorded, not fatal.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+STATE_STARTING = "starting"
+STATE_INITIALIZING = "initializing"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_STOPPED = "stopped"
+
+WarmupStep = Tuple[str, Callable[[Any], None]]
+
+
+class MemoryNotReadyError(RuntimeError):
+    """Raised by MemoryBootstrap.get() until initialization and warmup finish"""
+
+
+class MemoryBootstrap:
+    """
+    Usage:
+        bootstrap = MemoryBootstrap(
+            factory=lambda: Memory.from_config(config),
+            warmup=[("ollama", preload), ("search", dummy_search)],
+            on_ready=[ingest_queue.start],
+        )
+        bootstrap.start()           # returns immediately
+        memory = bootstrap.get()    # MemoryNotReadyError until ready
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        warmup: Sequence[WarmupStep] = (),
+        on_ready: Sequence[Callable[[], None]] = (),
+        retry_interval: float = 5.0,
+        max_retry_interval: float = 60.0,
+    ):
+        self.factory = factory
+        self.warmup = list(warmup)
+        self.on_ready = list(on_ready)
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._instance: Any = None
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.state = STATE_STARTING
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.started_at = time.time()
+        self.init_seconds: Optional[float] = None
+        self.warmup_results: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="mem0-bootstrap", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if not self.ready:
+            self.state = STATE_STOPPED
+
+    def get(self) -> Any:
+        if not self._ready.is_set():
+            detail = f"mem0 is {self.state}"
+            if self.last_error:
+                detail += f" (last error: {self.last_error})"
+            raise MemoryNotReadyError(detail)
+        return self._instance
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "seconds_since_start": round(time.time() - self.started_at, 1),
+            "init_seconds": self.init_seconds,
+            "warmup": self.warmup_results,
+        }
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        delay = self.retry_interval
+        instance = None
+        while not self._stopping.is_set():
+            self.state = STATE_INITIALIZING
+            self.attempts += 1
+            try:
+                instance = self.factory()
+                break
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(
+                    f"mem0 initialization attempt {self.attempts} failed: {e} - retrying in {delay:.0f}s"
+                )
+                self._stopping.wait(delay)
+                delay = min(delay * 2, self.max_retry_interval)
+        if instance is None:
+            return
+
+        self.last_error = None
+        self.state = STATE_WARMING
+        for name, step in self.warmup:
+            if self._stopping.is_set():
+                return
+            step_started = time.perf_counter()
+            try:
+                step(instance)
+                result = {"status": "ok"}
+            except Exception as e:
+                logger.warning(f"Warmup step '{name}' failed: {e}")
+                result = {"status": "error", "error": str(e)}
+            result["seconds"] = round(time.perf_counter() - step_started, 2)
+            self.warmup_results[name] = result
+            logger.info(f"Warmup step '{name}': {result['status']} in {result['seconds']}s")
+
+        self._instance = instance
+        self.init_seconds = round(time.perf_counter() - started, 2)
+        self.state = STATE_READY
+        self._ready.set()
+        logger.info(f"mem0 ready after {self.init_seconds}s ({self.attempts} attempt(s))")
+
+        for callback in self.on_ready:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"on_ready callback {getattr(callback, '__name__', callback)} failed: {e}")
+
+
+# =============================================================================
+# Warmup steps
+# =============================================================================
+def prewarm_pgvector(conninfo: str, table: str) -> None:
+    """
+    Read the memories table and its indexes (HNSW included) into shared buffers.
+
+    Uses the pg_prewarm extension; creating it needs CREATE privilege on the
+    database, so this raises if the extension is unavailable.
+    """
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS pg_prewarm")
+        relations = [table] + [
+            row[0]
+            for row in conn.execute(
+                "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass",
+                (table,),
+            ).fetchall()
+        ]
+        for relation in relations:
+            conn.execute("SELECT pg_prewarm(%s::regclass)", (relation,))
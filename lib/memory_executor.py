@@ -0,0 +1,168 @@
+"""
+Memory Executor - Bounded thread pools for blocking mem0 calls
+Location: /Volumes/Data/ai_projects/mem0-system/lib/memory_executor.py
+Purpose: Keep the FastAPI event loop free while mem0 talks to Ollama, pgvector and Neo4j
+Scope: Separate read (search/get) and write (add/update/delete) pools with queue-depth metrics
+
+mem0's Memory API is synchronous. Calling it directly from an `async def`
+endpoint blocks the event loop, so one slow fact extraction stalls every
+other request. Running reads and writes on separate pools means searches
+keep being served while ingestion is busy.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a pool already has `max_queue` calls waiting"""
+
+
+class _BoundedPool:
+    """Thread pool with admission control and queue/latency accounting"""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"mem0-{name}",
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+        self._max_queue_seen = 0
+
+    def _admit(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturatedError(
+                    f"{self.name} pool saturated ({self._queued} calls queued)"
+                )
+            self._queued += 1
+            self._max_queue_seen = max(self._max_queue_seen, self._queued)
+        return {"enqueued_at": time.perf_counter(), "queued": True}
+
+    async def submit(self, fn: Callable, *args, **kwargs) -> Any:
+        ticket = self._admit()
+        # Carry request-scoped context vars into the worker thread
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, self._run, fn, ticket, args, kwargs)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, call)
+        except BaseException:
+            # Cancelled before a worker picked it up
+            self._dequeue(ticket)
+            raise
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """submit() for plain threads: run fn on the pool and block until it returns"""
+        ticket = self._admit()
+        ctx = contextvars.copy_context()
+        future = self._executor.submit(ctx.run, self._run, fn, ticket, args, kwargs)
+        return future.result()
+
+    def _dequeue(self, ticket: Dict[str, Any]) -> bool:
+        with self._lock:
+            if not ticket["queued"]:
+                return False
+            ticket["queued"] = False
+            self._queued -= 1
+            return True
+
+    def _run(self, fn: Callable, ticket: Dict[str, Any], args, kwargs) -> Any:
+        started_at = time.perf_counter()
+        self._dequeue(ticket)
+        with self._lock:
+            self._active += 1
+            self._total_wait += started_at - ticket["enqueued_at"]
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._total_run += time.perf_counter() - started_at
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = max(self._completed + self._failed, 1)
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "max_queue_seen": self._max_queue_seen,
+                "avg_wait_ms": round(self._total_wait / finished * 1000, 2),
+                "avg_run_ms": round(self._total_run / finished * 1000, 2),
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class MemoryExecutor:
+    """
+    Dispatches blocking mem0 calls onto dedicated read/write pools.
+
+    Usage:
+        executor = MemoryExecutor(read_workers=8, write_workers=2)
+        results = await executor.run_read(memory.search, query, user_id=uid)
+        added = await executor.run_write(memory.add, messages, user_id=uid)
+    """
+
+    def __init__(self, read_workers: int = 8, write_workers: int = 2, max_queue: int = 256):
+        self.read_pool = _BoundedPool("read", read_workers, max_queue)
+        self.write_pool = _BoundedPool("write", write_workers, max_queue)
+        logger.info(
+            f"MemoryExecutor initialized - read workers: {read_workers}, "
+            f"write workers: {write_workers}, max queue: {max_queue}"
+        )
+
+    async def run_read(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a read-path call (search, get, get_all) off the event loop"""
+        return await self.read_pool.submit(fn, *args, **kwargs)
+
+    async def run_write(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a write-path call (add, update, delete, reset) off the event loop"""
+        return await self.write_pool.submit(fn, *args, **kwargs)
+
+    def call_write(self, fn: Callable, *args, **kwargs) -> Any:
+        """run_write() for background threads (ingest workers): same pool, blocks the caller"""
+        return self.write_pool.call(fn, *args, **kwargs)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth, concurrency and timing per pool"""
+        return {
+            "read": self.read_pool.stats(),
+            "write": self.write_pool.stats(),
+        }
+
+    def shutdown(self) -> None:
+        self.read_pool.shutdown()
+        self.write_pool.shutdown()
@@ -0,0 +1,216 @@
+"""
+Memory Pages - Keyset pagination and streaming export over the pgvector table
+Location: /Volumes/Data/ai_projects/mem0-system/lib/memory_pages.py
+Purpose: List memories without loading a whole namespace into memory
+Scope: Cursor pages (limit/after), NDJSON export iterator and counts for GET /memories
+
+Memory.get_all() materializes every row for a user before returning. These
+queries read the same table mem0 writes (id UUID, vector, payload JSONB)
+directly, newest first by (created_at, id), so each page costs one indexed
+range scan and memory use stays constant no matter how large a namespace
+grows.
+
+created_at is mem0's ISO-8601 string and is compared as text (a cast to
+timestamptz is not immutable, so it cannot be indexed). Rows written on
+either side of a UTC offset change can therefore sort up to the offset
+apart; within one offset the order is exact. The id breaks ties, and the
+cursor carries both values, so pages stay stable under concurrent writes.
+"""
+
+import base64
+import json
+import logging
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import psycopg
+from psycopg import sql
+from psycopg_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Payload keys mem0 promotes to top-level fields in get_all() results
+_PROMOTED_KEYS = ("user_id", "agent_id", "run_id", "actor_id", "role")
+_CORE_KEYS = {"data", "hash", "created_at", "updated_at", "id", *_PROMOTED_KEYS}
+
+_FILTER_KEYS = ("user_id", "agent_id", "run_id")
+
+# Sort key; a missing created_at sorts as '' (oldest)
+_CREATED_AT = sql.SQL("COALESCE(payload->>'created_at', '')")
+
+
+def encode_cursor(created_at: Optional[str], memory_id: Any) -> str:
+    """Opaque next_cursor for the last row of a page"""
+    raw = json.dumps([created_at or "", str(memory_id)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(created_at, id) from encode_cursor(); raises ValueError on anything else"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, memory_id = json.loads(raw)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(created_at, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return created_at, str(uuid.UUID(memory_id))
+
+
+def format_memory(memory_id: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a row like mem0's get_all() items"""
+    item = {
+        "id": str(memory_id),
+        "memory": payload.get("data"),
+        "hash": payload.get("hash"),
+        "created_at": payload.get("created_at"),
+        "updated_at": payload.get("updated_at"),
+    }
+    for key in _PROMOTED_KEYS:
+        if key in payload:
+            item[key] = payload[key]
+    metadata = {k: v for k, v in payload.items() if k not in _CORE_KEYS}
+    if metadata:
+        item["metadata"] = metadata
+    return item
+
+
+class MemoryPager:
+    """
+    Usage:
+        pager = MemoryPager(conninfo, "memories_ollama")
+        items, cursor = pager.page(user_id="mark_carey/sap", limit=10)
+        items, cursor = pager.page(user_id="mark_carey/sap", limit=10, after=cursor)
+        for item in pager.iter_all(user_id="mark_carey/sap"):
+            ...
+    """
+
+    def __init__(self, conninfo: str, collection: str, max_connections: int = 4):
+        self.conninfo = conninfo
+        self.collection = collection
+        self.pool = ConnectionPool(
+            conninfo,
+            min_size=1,
+            max_size=max_connections,
+            open=False,
+            name="mem0-pager",
+        )
+        self._indexes_checked = False
+
+    def open(self) -> None:
+        self.pool.open()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def ensure_indexes(self) -> None:
+        """
+        Expression index matching the page order, so user-scoped pages
+        don't scan or sort the whole table.
+
+        Built with CREATE INDEX CONCURRENTLY on its own autocommit connection
+        (it cannot run inside a transaction), so mem0 keeps writing during the
+        build. An advisory lock leaves the build to one worker process, and an
+        invalid index left by an interrupted build is dropped and rebuilt.
+        """
+        if self._indexes_checked:
+            return
+        self._indexes_checked = True
+        index = f"{self.collection}_user_created_idx"
+        try:
+            with psycopg.connect(self.conninfo, autocommit=True) as conn:
+                if not conn.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (index,)).fetchone()[0]:
+                    logger.info(f"Pagination index {index} is being built by another worker")
+                    return
+                try:
+                    row = conn.execute(
+                        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                        "WHERE c.relname = %s",
+                        (index,),
+                    ).fetchone()
+                    if row is None or not row[0]:
+                        if row is not None:
+                            logger.warning(f"Pagination index {index} is invalid (interrupted build) - rebuilding")
+                            conn.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(index)))
+                        logger.info(f"Building pagination index {index} (concurrently)")
+                        conn.execute(
+                            sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} ((payload->>'user_id'), {}, id)").format(
+                                sql.Identifier(index),
+                                sql.Identifier(self.collection),
+                                _CREATED_AT,
+                            )
+                        )
+                finally:
+                    conn.execute("SELECT pg_advisory_unlock(hashtext(%s))", (index,))
+        except Exception as e:
+            logger.warning(f"Could not create pagination index on {self.collection}: {e}")
+
+    def _where(self, filters: Dict[str, Optional[str]], after: Optional[str]) -> Tuple[sql.Composable, List[Any]]:
+        clauses: List[sql.Composable] = []
+        params: List[Any] = []
+        for key in _FILTER_KEYS:
+            value = filters.get(key)
+            if value is not None:
+                clauses.append(sql.SQL("payload->>{} = %s").format(sql.Literal(key)))
+                params.append(value)
+        if after:
+            clauses.append(sql.SQL("({}, id) < (%s, %s::uuid)").format(_CREATED_AT))
+            params.extend(decode_cursor(after))
+        if not clauses:
+            return sql.SQL(""), params
+        return sql.SQL(" WHERE ") + sql.SQL(" AND ").join(clauses), params
+
+    def page(
+        self,
+        user_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        limit: int = 50,
+        after: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of memories, newest first, after the cursor; returns (items, next_cursor)"""
+        self.ensure_indexes()
+        where, params = self._where({"user_id": user_id, "agent_id": agent_id, "run_id": run_id}, after)
+        # Fetch one extra row to know whether another page exists
+        query = sql.SQL("SELECT id, payload FROM {}{} ORDER BY {} DESC, id DESC LIMIT %s").format(
+            sql.Identifier(self.collection), where, _CREATED_AT
+        )
+        with self.pool.connection() as conn:
+            rows = conn.execute(query, [*params, limit + 1]).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = [format_memory(row[0], row[1]) for row in rows]
+        next_cursor = encode_cursor(rows[-1][1].get("created_at"), rows[-1][0]) if has_more and rows else None
+        return items, next_cursor
+
+    def iter_all(
+        self,
+        user_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        batch_size: int = 500,
+    ) -> Iterator[Dict[str, Any]]:
+        """Every matching memory, fetched one keyset page at a time"""
+        cursor = None
+        while True:
+            items, cursor = self.page(user_id, agent_id, run_id, limit=batch_size, after=cursor)
+            yield from items
+            if cursor is None:
+                return
+
+    def iter_ndjson(self, batch_size: int = 500, **filters: Optional[str]) -> Iterator[bytes]:
+        """iter_all() encoded as newline-delimited JSON for StreamingResponse"""
+        for item in self.iter_all(batch_size=batch_size, **filters):
+            yield (json.dumps(item, default=str) + "\n").encode("utf-8")
+
+    def count(
+        self,
+        user_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+    ) -> int:
+        self.ensure_indexes()
+        where, params = self._where({"user_id": user_id, "agent_id": agent_id, "run_id": run_id}, None)
+        query = sql.SQL("SELECT COUNT(*) FROM {}{}").format(sql.Identifier(self.collection), where)
+        with self.pool.connection() as conn:
+            return conn.execute(query, params).fetchone()[0]
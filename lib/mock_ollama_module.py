@@ -9,104 +9,290 @@ Purpose: Fix mem0 restart loop by replacing ollama package dependency with httpx
 
 import sys
 import os
+import threading
+import time
 import httpx
-from typing import List, Dict, Any, Optional, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterator, Sequence, Union
 import json
 
+from embedding_store import EmbeddingStore
+from ollama_balancer import OllamaBalancer, configured_urls, get_balancer
+from ollama_client import OllamaGateway
+from progress_events import ProgressChannel, current_channel
+
+# /api/embed inputs per HTTP request; larger lists are split automatically
+EMBED_BATCH_SIZE = int(os.getenv('OLLAMA_EMBED_BATCH_SIZE', '32'))
+# How long embeddings() waits for concurrent single-text calls to share one request (0 = off)
+EMBED_BATCH_WINDOW_MS = float(os.getenv('OLLAMA_EMBED_BATCH_WINDOW_MS', '5'))
+# Coalesced /api/embed batches in flight at once (defaults to the gateway's embed limit)
+EMBED_BATCH_CONCURRENCY = int(os.getenv('OLLAMA_EMBED_BATCH_CONCURRENCY', os.getenv('OLLAMA_MAX_CONCURRENT_EMBED', '8')))
+# Persistent (model, text) -> vector store consulted before calling Ollama (unset = off)
+EMBED_STORE_PATH = os.getenv('OLLAMA_EMBED_STORE_PATH', '')
+EMBED_STORE_MAX_ENTRIES = int(os.getenv('OLLAMA_EMBED_STORE_MAX_ENTRIES', '100000'))
+# keep_alive sent with every generate/chat/embed request so models stay loaded between calls (empty = Ollama default)
+KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+
+_shared_store: Optional[EmbeddingStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_embedding_store() -> Optional[EmbeddingStore]:
+    """Process-wide EmbeddingStore from OLLAMA_EMBED_STORE_PATH (mem0 creates several clients)"""
+    global _shared_store
+    if not EMBED_STORE_PATH:
+        return None
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = EmbeddingStore(EMBED_STORE_PATH, max_entries=EMBED_STORE_MAX_ENTRIES)
+        return _shared_store
+
+
+class _EmbedBatcher:
+    """
+    Coalesces concurrent single-text embedding calls into /api/embed batches.
+
+    mem0 embeds one text per call, from several threads at once (request
+    pools plus mem0's own vector/graph fan-out). Each caller parks on a
+    Future; a flusher thread waits up to the batch window for more texts of
+    the same model and hands each batch to a small pool, so up to
+    max_in_flight requests run at once. While every slot is busy the flusher
+    waits, and texts arriving meanwhile join the next batch.
+    """
+
+    def __init__(self, client: "MockOllamaClient", window_ms: float, batch_size: int, max_in_flight: int = 8):
+        self.client = client
+        self.window = window_ms / 1000.0
+        self.batch_size = batch_size
+        self.max_in_flight = max(1, max_in_flight)
+        self._pending: Dict[str, List[tuple]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._slots = threading.Semaphore(self.max_in_flight)
+        self._pool = ThreadPoolExecutor(self.max_in_flight, thread_name_prefix="ollama-embed-flush")
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+        self.duplicates = 0
+
+    def submit(self, model: str, text: str) -> List[float]:
+        future: Future = Future()
+        with self._cond:
+            self._pending.setdefault(model, []).append((text, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ollama-embed-batcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future.result()
+
+    def _run(self):
+        while True:
+            self._slots.acquire()
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Give concurrent callers a moment to join the batch
+                deadline = time.monotonic() + self.window
+                while max(len(v) for v in self._pending.values()) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batches = self._pending
+                self._pending = {}
+            first = True
+            for model, items in batches.items():
+                for start in range(0, len(items), self.batch_size):
+                    if not first:
+                        self._slots.acquire()
+                    first = False
+                    self._pool.submit(self._flush_in_slot, model, items[start:start + self.batch_size])
+
+    def _flush_in_slot(self, model: str, items: List[tuple]):
+        try:
+            self._flush(model, items)
+        finally:
+            self._slots.release()
+
+    def _flush(self, model: str, items: List[tuple]):
+        # Callers embedding the same text in one window share a single input
+        texts = list(dict.fromkeys(text for text, _ in items))
+        try:
+            vectors = dict(zip(texts, self.client._fetch_embeddings(model, texts)))
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+        with self._stats_lock:
+            self.requests += 1
+            self.texts += len(texts)
+            self.duplicates += len(items) - len(texts)
+        for text, future in items:
+            future.set_result(list(vectors[text]))
+
 
 class MockOllamaClient:
     """
     HTTP-based Ollama client using httpx
     Replaces ollama Python package with direct HTTP API calls to host-metal Ollama
+
+    Request/response calls go through the process-wide OllamaGateway, so every
+    client mem0 creates shares one connection pool, one set of concurrency
+    limits and single-flight coalescing of identical requests; only model
+    pulls use the local httpx.Client.
     """
     
-    def __init__(self, host: str = None, **kwargs):
+    def __init__(self, host: str = None, embed_batch_size: int = None, embed_batch_window_ms: float = None,
+                 embedding_store: Optional[EmbeddingStore] = None,
+                 gateway: Optional[Union[OllamaGateway, OllamaBalancer]] = None,
+                 keep_alive: Optional[str] = None, **kwargs):
         """Initialize with Ollama HTTP URL"""
-        self.host = host or os.getenv('OLLAMA_URL', 'http://host.docker.internal:11434')
+        self.host = host or configured_urls()[0]
         if not self.host.startswith('http'):
             self.host = f"http://{self.host}"
         # Remove trailing slash
         self.host = self.host.rstrip('/')
         self.client = httpx.Client(timeout=httpx.Timeout(300.0, connect=10.0))
+        # Balances over OLLAMA_URLS when several hosts are configured
+        self.gateway = gateway or get_balancer(self.host)
+        self.keep_alive = KEEP_ALIVE if keep_alive is None else keep_alive
+        self.embed_batch_size = max(1, embed_batch_size or EMBED_BATCH_SIZE)
+        window_ms = EMBED_BATCH_WINDOW_MS if embed_batch_window_ms is None else embed_batch_window_ms
+        self._batcher = (
+            _EmbedBatcher(self, window_ms, self.embed_batch_size, EMBED_BATCH_CONCURRENCY) if window_ms > 0 else None
+        )
+        self.store = embedding_store if embedding_store is not None else get_shared_embedding_store()
         print(f"   ✅ HTTP Ollama client initialized: {self.host}")
     
-    def embeddings(self, model: str, prompt: str) -> List[float]:
-        """Generate embeddings via HTTP API"""
-        try:
-            response = self.client.post(
-                f"{self.host}/api/embeddings",
-                json={"model": model, "prompt": prompt},
-                timeout=30.0
+    def embeddings(self, model: str, prompt: str, **kwargs) -> Dict[str, Any]:
+        """
+        Single-text embedding, same response shape as ollama.Client.embeddings
+
+        Stored vectors are returned without calling Ollama; concurrent misses
+        are coalesced into /api/embed batches by the batcher.
+        """
+        if self.store is not None:
+            vector = self.store.get(model, prompt)
+            if vector is not None:
+                return {"embedding": vector}
+        if self._batcher is not None:
+            return {"embedding": self._batcher.submit(model, prompt)}
+        return {"embedding": self._fetch_embeddings(model, [prompt])[0]}
+    
+    def embed(self, model: str, input: Union[str, Sequence[str]], **kwargs) -> Dict[str, Any]:
+        """
+        Batch embedding via /api/embed, same response shape as ollama.Client.embed
+
+        A single text without extra options goes through the batcher like
+        embeddings(), so it is coalesced with concurrent calls.
+        """
+        texts = [input] if isinstance(input, str) else list(input)
+        if len(texts) == 1 and not kwargs and self._batcher is not None:
+            return {"model": model, "embeddings": [self.embeddings(model, texts[0])["embedding"]]}
+        return {"model": model, "embeddings": self.embed_texts(model, texts, **kwargs)}
+    
+    def embed_texts(self, model: str, texts: Sequence[str], **kwargs) -> List[List[float]]:
+        """Embed texts, answering from the embedding store first and sending only misses to Ollama"""
+        found = self.store.get_many(model, texts) if self.store is not None else {}
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            found.update(zip(missing, self._fetch_embeddings(model, missing, **kwargs)))
+        return [found[text] for text in texts]
+    
+    def _fetch_embeddings(self, model: str, texts: Sequence[str], **kwargs) -> List[List[float]]:
+        """/api/embed in chunks of embed_batch_size; results are written to the embedding store"""
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            chunk = list(texts[start:start + self.embed_batch_size])
+            data = self.gateway.post(
+                "/api/embed",
+                self._with_keep_alive({"model": model, "input": chunk, **kwargs}),
+                timeout=60.0 + 2.0 * len(chunk)
             )
-            response.raise_for_status()
-            data = response.json()
-            embedding = data.get("embedding", [])
-            if not embedding:
-                raise ValueError(f"No embedding returned from Ollama API: {data}")
-            return embedding
-        except httpx.HTTPStatusError as e:
-            raise RuntimeError(f"Ollama HTTP API error ({e.response.status_code}): {e.response.text}")
-        except Exception as e:
-            raise RuntimeError(f"Ollama HTTP API error: {e}")
+            embeddings = data.get("embeddings") or []
+            if len(embeddings) != len(chunk):
+                raise RuntimeError(
+                    f"Ollama returned {len(embeddings)} embeddings for {len(chunk)} inputs: {data.get('error', '')}"
+                )
+            vectors.extend(embeddings)
+        if self.store is not None:
+            try:
+                self.store.put_many(model, zip(texts, vectors))
+            except Exception as e:
+                # A full disk or locked file must not fail the embedding itself
+                print(f"   ⚠️  Embedding store write failed: {e}")
+        return vectors
+    
+    def _with_keep_alive(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the client's keep_alive unless the caller set one"""
+        if self.keep_alive and "keep_alive" not in payload:
+            payload = {**payload, "keep_alive": self.keep_alive}
+        return payload
+    
+    def embed_stats(self) -> Dict[str, Any]:
+        """Requests sent by the coalescing batcher and texts they carried, plus embedding store stats"""
+        stats: Dict[str, Any] = {"batching": False, "batch_size": self.embed_batch_size}
+        if self._batcher is not None:
+            requests = self._batcher.requests
+            stats.update({
+                "batching": True,
+                "window_ms": self._batcher.window * 1000,
+                "max_in_flight": self._batcher.max_in_flight,
+                "requests": requests,
+                "texts": self._batcher.texts,
+                "duplicates": self._batcher.duplicates,
+                "avg_batch": round(self._batcher.texts / requests, 2) if requests else 0.0,
+            })
+        stats["store"] = self.store.stats() if self.store is not None else None
+        return stats
     
     def generate(self, model: str, prompt: str, stream: bool = False, **kwargs) -> Any:
-        """Generate text via HTTP API (for LLM)"""
-        try:
-            payload = {
-                "model": model,
-                "prompt": prompt,
-                "stream": stream,
-                **kwargs
-            }
-            
-            if stream:
-                # Streaming response
-                with self.client.stream(
-                    "POST",
-                    f"{self.host}/api/generate",
-                    json=payload,
-                    timeout=httpx.Timeout(300.0, connect=10.0)
-                ) as response:
-                    response.raise_for_status()
-                    for line in response.iter_lines():
-                        if line:
-                            try:
-                                yield json.loads(line)
-                            except json.JSONDecodeError:
-                                continue
-            else:
-                # Non-streaming response
-                response = self.client.post(
-                    f"{self.host}/api/generate",
-                    json=payload,
-                    timeout=httpx.Timeout(300.0, connect=10.0)
-                )
-                response.raise_for_status()
-                return response.json()
-        except httpx.HTTPStatusError as e:
-            raise RuntimeError(f"Ollama HTTP API error ({e.response.status_code}): {e.response.text}")
-        except Exception as e:
-            raise RuntimeError(f"Ollama HTTP API error: {e}")
+        """Generate text via HTTP API (for LLM); returns an iterator of chunks when stream=True"""
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            **kwargs
+        }
+        payload = self._with_keep_alive(payload)
+        if stream:
+            return self._stream_generate(payload)
+        return self.gateway.post("/api/generate", payload, timeout=300.0)
+    
+    def _stream_generate(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        # Streams are admitted by the gateway under the same generate limit
+        yield from self.gateway.stream("/api/generate", payload, timeout=300.0)
     
     def chat(self, model: str, messages: List[Dict], **kwargs) -> Any:
         """Chat completion via HTTP API"""
-        try:
-            payload = {
-                "model": model,
-                "messages": messages,
-                **kwargs
-            }
-            response = self.client.post(
-                f"{self.host}/api/chat",
-                json=payload,
-                timeout=httpx.Timeout(300.0, connect=10.0)
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise RuntimeError(f"Ollama HTTP API error ({e.response.status_code}): {e.response.text}")
-        except Exception as e:
-            raise RuntimeError(f"Ollama HTTP API error: {e}")
+        # /api/chat streams by default; callers (mem0) expect one JSON response
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            **kwargs
+        }
+        payload = self._with_keep_alive(payload)
+        channel = current_channel()
+        if channel is not None and not payload.get("tools"):
+            return self._chat_with_progress(channel, payload)
+        return self.gateway.post("/api/chat", payload, timeout=300.0)
+    
+    def _chat_with_progress(self, channel: ProgressChannel, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Stream the completion, reporting progress and facts, and return the usual single response"""
+        call = channel.llm_started(payload["model"])
+        parser = channel.fact_parser()
+        started = time.perf_counter()
+        content = ""
+        last: Dict[str, Any] = {}
+        for chunk in self.gateway.stream("/api/chat", {**payload, "stream": True}, timeout=300.0):
+            piece = (chunk.get("message") or {}).get("content", "")
+            if piece:
+                content += piece
+                parser.feed(content)
+            last = chunk
+        channel.llm_finished(call, time.perf_counter() - started, parser.count)
+        return {**last, "message": {"role": "assistant", "content": content}}
     
     def pull(self, model: str, **kwargs) -> Dict[str, Any]:
         """Pull/download a model via HTTP API (streaming response)"""
@@ -136,20 +322,10 @@ class MockOllamaClient:
     
     def list(self) -> Dict[str, Any]:
         """List available models via HTTP API"""
-        try:
-            response = self.client.get(
-                f"{self.host}/api/tags",
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise RuntimeError(f"Ollama HTTP API error ({e.response.status_code}): {e.response.text}")
-        except Exception as e:
-            raise RuntimeError(f"Ollama HTTP API error: {e}")
+        return self.gateway.get("/api/tags", timeout=10.0)
     
     def close(self):
-        """Close HTTP client"""
+        """Close HTTP client (the shared gateway stays open for other clients)"""
         if self.client:
             self.client.close()
     
@@ -207,44 +383,3 @@ def install_mock_ollama_module():
 if __name__ == "__main__":
     success = install_mock_ollama_module()
     sys.exit(0 if success else 1)
-
-
-    def Client(self, host: str = None, **kwargs):
-        """Factory function for creating Client instances"""
-        return MockOllamaClient(host, **kwargs)
-
-
-def install_mock_ollama_module():
-    """
-    Install mock ollama module BEFORE mem0 tries to import it
-    This must be called BEFORE any mem0 imports happen
-    """
-    print("=" * 70)
-    print("🔧 INSTALLING MOCK OLLAMA MODULE (HTTP API)")
-    print("=" * 70)
-    
-    # Create mock module
-    mock_module = MockOllamaModule()
-    
-    # Install it in sys.modules BEFORE mem0 imports it
-    sys.modules['ollama'] = mock_module
-    
-    # Also install as ollama.Client for compatibility
-    import types
-    ollama_module = types.ModuleType('ollama')
-    ollama_module.Client = MockOllamaClient
-    ollama_module.OllamaClient = MockOllamaClient
-    sys.modules['ollama'] = ollama_module
-    
-    print("✅ Mock ollama module installed")
-    print(f"   📡 Uses HTTP API: {os.getenv('OLLAMA_URL', 'http://host.docker.internal:11434')}")
-    print("   🚫 No ollama Python package required")
-    print("=" * 70)
-    
-    return True
-
-
-if __name__ == "__main__":
-    success = install_mock_ollama_module()
-    sys.exit(0 if success else 1)
-
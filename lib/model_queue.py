@@ -0,0 +1,217 @@
+"""
+Model Queue - Per-model priority admission for router LLM calls
+Location: /Volumes/Data/ai_projects/mem0-system/lib/model_queue.py
+Purpose: Keep interactive calls from waiting behind batch summarization inside Ollama
+Scope: Priority levels, max in flight per model, queue timeouts, depth/wait metrics
+
+Ollama runs a model's requests a few at a time and queues the rest in
+arrival order, so an interactive query that arrives behind twenty
+background summaries waits for all of them. The router now admits at most
+max_in_flight calls per model to Ollama and holds the rest here. When a
+slot frees up it goes to the waiter with the best effective priority:
+its level minus one for every `aging_seconds` it has waited, so background
+work still progresses under constant interactive load. Ties go to the
+earliest arrival.
+
+A waiter that gets no slot within the queue timeout fails with
+ModelQueueTimeout. The queues are process-wide (get_model_queue) and, like
+the gateway's limits, only touched from the event loop.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from stage_timing import LLM_QUEUE_WAIT, register_collector
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(str, Enum):
+    """Router call priority (lower rank is served first)"""
+    INTERACTIVE = "interactive"   # A user is waiting (search rewriting, chat)
+    NORMAL = "normal"             # Default
+    BACKGROUND = "background"     # Batch summarization, re-extraction
+
+
+_RANK = {Priority.INTERACTIVE: 0, Priority.NORMAL: 1, Priority.BACKGROUND: 2}
+
+
+class ModelQueueTimeout(Exception):
+    """No slot for the model within the queue timeout"""
+
+    def __init__(self, model: str, priority: Priority, waited: float, depth: int):
+        super().__init__(
+            f"{model} queue timeout: no slot after {waited:.1f}s ({priority.value}, {depth} waiting)"
+        )
+        self.model = model
+        self.priority = priority
+        self.waited = waited
+
+
+class ModelQueue:
+    """
+    Usage:
+        queue = get_model_queue("codellama:13b")
+        async with queue.slot(Priority.BACKGROUND):
+            await gateway.apost("/api/generate", payload)
+    """
+
+    def __init__(self, model: str, max_in_flight: int = 2, timeout: float = 60.0, aging_seconds: float = 30.0):
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.aging_seconds = aging_seconds
+        self.in_flight = 0
+        self._waiters: List[List[Any]] = []  # [rank, arrival seq, enqueued at, future]
+        self._seq = itertools.count()
+        self.max_depth = 0
+        self.served = {p: 0 for p in Priority}
+        self.timeouts = {p: 0 for p in Priority}
+        self.waits = {p: deque(maxlen=200) for p in Priority}
+
+    def _admitted(self, priority: Priority, waited: float) -> float:
+        self.served[priority] += 1
+        self.waits[priority].append(waited)
+        LLM_QUEUE_WAIT.observe((self.model, priority.value), waited)
+        return waited
+
+    async def acquire(self, priority: Priority = Priority.NORMAL, timeout: Optional[float] = None) -> float:
+        """Wait for a slot; returns the seconds waited"""
+        if self.max_in_flight <= 0 or (self.in_flight < self.max_in_flight and not self._waiters):
+            self.in_flight += 1
+            return self._admitted(priority, 0.0)
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        entry = [_RANK[priority], next(self._seq), started, future]
+        self._waiters.append(entry)
+        self.max_depth = max(self.max_depth, len(self._waiters))
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(future, timeout if timeout > 0 else None)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts[priority] += 1
+                raise ModelQueueTimeout(self.model, priority, time.monotonic() - started, len(self._waiters)) from None
+            raise
+        return self._admitted(priority, time.monotonic() - started)
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the best waiter if there is one"""
+        now = time.monotonic()
+        while self._waiters:
+            best = min(
+                self._waiters,
+                key=lambda w: (w[0] - (now - w[2]) / self.aging_seconds if self.aging_seconds > 0 else w[0], w[1]),
+            )
+            self._waiters.remove(best)
+            if not best[3].done():
+                best[3].set_result(None)  # in_flight is unchanged: the slot changes hands
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.NORMAL, timeout: Optional[float] = None) -> AsyncIterator[float]:
+        waited = await self.acquire(priority, timeout)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def depth(self) -> Dict[str, int]:
+        by_rank = {rank: p.value for p, rank in _RANK.items()}
+        depth = {p.value: 0 for p in Priority}
+        for waiter in self._waiters:
+            depth[by_rank[waiter[0]]] += 1
+        return depth
+
+    def stats(self) -> Dict[str, Any]:
+        waits = {}
+        for p, samples in self.waits.items():
+            ordered = sorted(samples)
+            waits[p.value] = {
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2) if ordered else None,
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2) if ordered else None,
+                "max_ms": round(ordered[-1] * 1000, 2) if ordered else None,
+            }
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "served": {p.value: n for p, n in self.served.items()},
+            "timeouts": {p.value: n for p, n in self.timeouts.items()},
+            "wait": waits,
+        }
+
+
+# =============================================================================
+# Process-wide queues
+# =============================================================================
+_queues: Dict[str, ModelQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def _max_in_flight(model: str) -> int:
+    """LLM_MAX_IN_FLIGHT_PER_MODEL ('codellama:13b=1,mistral:7b=4') else LLM_MAX_IN_FLIGHT"""
+    for entry in os.getenv("LLM_MAX_IN_FLIGHT_PER_MODEL", "").split(","):
+        if "=" in entry:
+            name, limit = entry.rsplit("=", 1)
+            if name.strip() == model:
+                return int(limit)
+    return int(os.getenv("LLM_MAX_IN_FLIGHT", "2"))
+
+
+def get_model_queue(model: str) -> ModelQueue:
+    with _queues_lock:
+        queue = _queues.get(model)
+        if queue is None:
+            queue = _queues[model] = ModelQueue(
+                model,
+                max_in_flight=_max_in_flight(model),
+                timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "60")),
+                aging_seconds=float(os.getenv("LLM_QUEUE_AGING_SECONDS", "30")),
+            )
+            logger.info(f"Router queue for {model}: {queue.max_in_flight} in flight, {queue.timeout:.0f}s timeout")
+        return queue
+
+
+def model_queue_stats() -> Dict[str, Dict[str, Any]]:
+    with _queues_lock:
+        return {model: queue.stats() for model, queue in _queues.items()}
+
+
+def render_queue_metrics() -> List[str]:
+    """Prometheus gauges for queue depth and in-flight calls"""
+    lines = [
+        "# HELP mem0_llm_queue_depth Router calls waiting for a model slot.",
+        "# TYPE mem0_llm_queue_depth gauge",
+    ]
+    with _queues_lock:
+        queues = sorted(_queues.items())
+    for model, queue in queues:
+        for priority, depth in queue.depth().items():
+            lines.append(f'mem0_llm_queue_depth{{model="{model}",priority="{priority}"}} {depth}')
+    lines += [
+        "# HELP mem0_llm_in_flight Router calls running on a model.",
+        "# TYPE mem0_llm_in_flight gauge",
+    ]
+    for model, queue in queues:
+        lines.append(f'mem0_llm_in_flight{{model="{model}"}} {queue.in_flight}')
+    return lines
+
+
+register_collector(render_queue_metrics)
@@ -0,0 +1,328 @@
+"""
+Ollama Balancer - Spread Ollama calls over several hosts
+Location: /Volumes/Data/ai_projects/mem0-system/lib/ollama_balancer.py
+Purpose: Scale inference horizontally by adding Ollama machines instead of waiting on one
+Scope: OLLAMA_URLS parsing, least-outstanding-requests selection, model inventories, ejection, affinity
+
+Each host keeps its own OllamaGateway (connection pool, concurrency limits,
+circuit breaker). The balancer sits in front of them with the same call
+interface, so mem0's shim and the router use it unchanged. For every call it:
+
+1. drops hosts whose circuit is not closed (ejection - the gateway's own
+   half-open probe brings them back),
+2. keeps hosts whose /api/tags inventory has the requested model,
+3. narrows to the hosts pinned for the model or endpoint class, if any of
+   them is still eligible (affinity is a preference, not a hard rule),
+4. picks the host with the fewest outstanding requests from this process.
+
+A non-streaming call that fails on a host (unreachable, 5xx, open circuit,
+model missing) is retried once on each remaining eligible host. A generation
+that timed out or broke off after connecting is not: the host may still be
+working on it, and a second host would repeat the whole generation.
+
+With a single URL, get_balancer() returns that host's plain gateway.
+"""
+
+import itertools
+import logging
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Union
+
+import httpx
+
+from ollama_client import CLOSED, GENERATE, OllamaError, OllamaGateway, endpoint_class, get_gateway, model_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OLLAMA_URL = "http://host.docker.internal:11434"
+
+
+def normalize_url(url: str) -> str:
+    url = url.strip().rstrip("/")
+    return url if url.startswith("http") else f"http://{url}"
+
+
+def configured_urls(default: str = DEFAULT_OLLAMA_URL) -> List[str]:
+    """OLLAMA_URLS (comma separated) if set, else OLLAMA_URL; the first entry is the primary host"""
+    spec = os.getenv("OLLAMA_URLS", "").strip() or os.getenv("OLLAMA_URL", "").strip() or default
+    urls: List[str] = []
+    for part in spec.split(","):
+        if part.strip() and normalize_url(part) not in urls:
+            urls.append(normalize_url(part))
+    return urls
+
+
+def parse_affinity(spec: str) -> Dict[str, List[str]]:
+    """
+    'embed=http://gpu2:11434;nomic-embed-text=http://gpu2:11434,http://gpu3:11434'
+    -> {endpoint class or model: [preferred hosts]}
+    """
+    affinity: Dict[str, List[str]] = {}
+    for entry in spec.split(";"):
+        if "=" not in entry:
+            continue
+        key, urls = entry.split("=", 1)
+        key = key.strip()
+        if key not in ("generate", "embed", "other"):
+            key = model_key(key)
+        affinity[key] = [normalize_url(url) for url in urls.split(",") if url.strip()]
+    return affinity
+
+
+class OllamaBalancer:
+    """
+    Usage:
+        balancer = OllamaBalancer(
+            [get_gateway("http://gpu1:11434"), get_gateway("http://gpu2:11434")],
+            affinity={"embed": ["http://gpu2:11434"]},
+        )
+        balancer.start()                        # /api/tags inventory refresh
+        data = balancer.post("/api/embed", {"model": "nomic-embed-text", "input": ["..."]})
+    """
+
+    def __init__(
+        self,
+        gateways: Sequence[OllamaGateway],
+        affinity: Optional[Dict[str, List[str]]] = None,
+        inventory_interval: float = 60.0,
+    ):
+        self.nodes = list(gateways)
+        self.base_url = self.nodes[0].base_url
+        self.affinity = affinity or {}
+        self.inventory_interval = inventory_interval
+        # None until the first /api/tags answer: assume the host has every model
+        self.inventory: Dict[str, Optional[Set[str]]] = {node.base_url: None for node in self.nodes}
+        self.outstanding = {node.base_url: 0 for node in self.nodes}
+        self.dispatched = {node.base_url: 0 for node in self.nodes}
+        self.failovers = 0
+        self._lock = threading.Lock()
+        self._ties = itertools.count()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        for key, urls in self.affinity.items():
+            unknown = [url for url in urls if url not in self.inventory]
+            if unknown:
+                logger.warning(f"Ollama affinity for {key} names hosts not in OLLAMA_URLS: {', '.join(unknown)}")
+
+    # ------------------------------------------------------------------
+    # Selection
+    # ------------------------------------------------------------------
+    def _has_model(self, node: OllamaGateway, model: Optional[str]) -> bool:
+        models = self.inventory[node.base_url]
+        return model is None or models is None or model_key(model) in models
+
+    def _pinned(self, path: str, model: Optional[str]) -> List[str]:
+        if model and model_key(model) in self.affinity:
+            return self.affinity[model_key(model)]
+        return self.affinity.get(endpoint_class(path), [])
+
+    def eligible(self, path: str, model: Optional[str], exclude: Sequence[str] = ()) -> List[OllamaGateway]:
+        """Hosts that may serve this call, best candidates only"""
+        nodes = [node for node in self.nodes if node.base_url not in exclude]
+        # With every circuit open, let the breakers answer (fail fast or half-open probe)
+        nodes = [node for node in nodes if node.breaker.state == CLOSED] or nodes
+        nodes = [node for node in nodes if self._has_model(node, model)] or nodes
+        pinned = self._pinned(path, model)
+        return [node for node in nodes if node.base_url in pinned] or nodes
+
+    def nodes_serving(self, path: str, model: str) -> List[OllamaGateway]:
+        """Every host that would take this model's calls (ignoring health), e.g. for preloading"""
+        nodes = [node for node in self.nodes if self._has_model(node, model)] or self.nodes
+        pinned = self._pinned(path, model)
+        return [node for node in nodes if node.base_url in pinned] or nodes
+
+    def _acquire(self, path: str, payload: Optional[Dict[str, Any]], exclude: Sequence[str]) -> OllamaGateway:
+        model = payload.get("model") if isinstance(payload, dict) else None
+        with self._lock:
+            nodes = self.eligible(path, model, exclude)
+            fewest = min(self.outstanding[node.base_url] for node in nodes)
+            ties = [node for node in nodes if self.outstanding[node.base_url] == fewest]
+            node = ties[next(self._ties) % len(ties)]
+            self.outstanding[node.base_url] += 1
+            self.dispatched[node.base_url] += 1
+            return node
+
+    def _release(self, node: OllamaGateway) -> None:
+        with self._lock:
+            self.outstanding[node.base_url] -= 1
+
+    def _retry_elsewhere(
+        self, node: OllamaGateway, path: str, error: OllamaError, payload: Any, tried: List[str]
+    ) -> bool:
+        """Record a failed attempt; True if another host should get the call"""
+        status = error.status_code
+        if status is None and endpoint_class(path) == GENERATE and not isinstance(
+            error.__cause__, (httpx.ConnectError, httpx.ConnectTimeout)
+        ):
+            # Read timeout or dropped connection mid-generation: not a dead host
+            return False
+        if status == 404 and isinstance(payload, dict) and payload.get("model"):
+            # Stale inventory: the host does not have the model (any more)
+            with self._lock:
+                models = self.inventory.get(node.base_url)
+                if models is not None:
+                    models.discard(model_key(payload["model"]))
+        elif status is not None and status < 500:
+            return False
+        tried.append(node.base_url)
+        if len(tried) >= len(self.nodes):
+            return False
+        self.failovers += 1
+        logger.warning(f"Ollama call failed on {node.base_url} ({error}) - retrying on another host")
+        return True
+
+    # ------------------------------------------------------------------
+    # Callers (same interface as OllamaGateway)
+    # ------------------------------------------------------------------
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                timeout: Optional[float] = None) -> Any:
+        tried: List[str] = []
+        while True:
+            node = self._acquire(path, payload, tried)
+            try:
+                return node.request(method, path, payload, timeout)
+            except OllamaError as e:
+                if not self._retry_elsewhere(node, path, e, payload, tried):
+                    raise
+            finally:
+                self._release(node)
+
+    async def arequest(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                       timeout: Optional[float] = None) -> Any:
+        tried: List[str] = []
+        while True:
+            node = self._acquire(path, payload, tried)
+            try:
+                return await node.arequest(method, path, payload, timeout)
+            except OllamaError as e:
+                if not self._retry_elsewhere(node, path, e, payload, tried):
+                    raise
+            finally:
+                self._release(node)
+
+    def post(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        return self.request("POST", path, payload, timeout)
+
+    async def apost(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        return await self.arequest("POST", path, payload, timeout)
+
+    def get(self, path: str, timeout: Optional[float] = None) -> Any:
+        return self.request("GET", path, None, timeout)
+
+    async def aget(self, path: str, timeout: Optional[float] = None) -> Any:
+        return await self.arequest("GET", path, None, timeout)
+
+    def stream(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Any]:
+        """Streams stay on the chosen host (no failover once tokens may have been yielded)"""
+        node = self._acquire(path, payload, ())
+        try:
+            yield from node.stream(path, payload, timeout)
+        finally:
+            self._release(node)
+
+    async def astream(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> AsyncIterator[Any]:
+        node = self._acquire(path, payload, ())
+        try:
+            async for item in node.astream(path, payload, timeout):
+                yield item
+        finally:
+            self._release(node)
+
+    # ------------------------------------------------------------------
+    # Inventory
+    # ------------------------------------------------------------------
+    def refresh_inventory(self) -> Dict[str, Optional[Set[str]]]:
+        """Re-read /api/tags on every host; an unreachable host keeps its last inventory"""
+        for node in self.nodes:
+            try:
+                data = node.get("/api/tags", timeout=10.0)
+            except OllamaError as e:
+                logger.warning(f"Ollama inventory refresh failed for {node.base_url}: {e}")
+                continue
+            models = {model_key(m.get("name") or m.get("model", "")) for m in data.get("models", [])}
+            with self._lock:
+                self.inventory[node.base_url] = models
+        return self.inventory
+
+    def _run(self) -> None:
+        while True:
+            self.refresh_inventory()
+            if self._stopping.wait(self.inventory_interval):
+                return
+
+    def start(self) -> None:
+        if self._thread is not None or self.inventory_interval <= 0:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="ollama-inventory", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "nodes": {
+                    node.base_url: {
+                        "circuit": node.breaker.state,
+                        "outstanding": self.outstanding[node.base_url],
+                        "dispatched": self.dispatched[node.base_url],
+                        "models": sorted(self.inventory[node.base_url] or []),
+                        "inventory_known": self.inventory[node.base_url] is not None,
+                    }
+                    for node in self.nodes
+                },
+                "affinity": self.affinity,
+                "failovers": self.failovers,
+            }
+
+
+# =============================================================================
+# Process-wide balancer
+# =============================================================================
+_balancer: Optional[OllamaBalancer] = None
+_balancer_lock = threading.Lock()
+
+
+def get_balancer(base_url: Optional[str] = None) -> Union[OllamaBalancer, OllamaGateway]:
+    """
+    Shared balancer over OLLAMA_URLS (affinity from OLLAMA_AFFINITY).
+
+    Returns a plain gateway when only one host is configured, or when
+    base_url names a host outside OLLAMA_URLS.
+    """
+    urls = configured_urls()
+    if base_url is not None and normalize_url(base_url) not in urls:
+        return get_gateway(base_url)
+    if len(urls) == 1:
+        return get_gateway(urls[0])
+    global _balancer
+    with _balancer_lock:
+        if _balancer is None:
+            _balancer = OllamaBalancer(
+                [get_gateway(url) for url in urls],
+                affinity=parse_affinity(os.getenv("OLLAMA_AFFINITY", "")),
+                inventory_interval=float(os.getenv("OLLAMA_INVENTORY_INTERVAL", "60")),
+            )
+            _balancer.start()
+            logger.info(f"Ollama balancer over {len(urls)} hosts: {', '.join(urls)}")
+        return _balancer
+
+
+def balancer_stats() -> Optional[Dict[str, Any]]:
+    with _balancer_lock:
+        return _balancer.stats() if _balancer is not None else None
+
+
+def close_balancer() -> None:
+    global _balancer
+    with _balancer_lock:
+        balancer, _balancer = _balancer, None
+    if balancer is not None:
+        balancer.stop()
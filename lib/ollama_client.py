@@ -0,0 +1,580 @@
+"""
+Ollama Gateway - Shared async Ollama client with pooled connections and concurrency limits
+Location: /Volumes/Data/ai_projects/mem0-system/lib/ollama_client.py
+Purpose: One place where every Ollama call is admitted, so load spikes queue here instead of thrashing Ollama
+Scope: Keep-alive connection pool, per-endpoint semaphores, queue-wait metrics, sync bridge for mem0's shim
+
+mem0's provider shim (mock_ollama_module.MockOllamaClient) is synchronous and
+is called from many threads; Mem0LLMRouter is async. Both go through the same
+OllamaGateway, which owns an httpx.AsyncClient on a dedicated event loop
+thread. Requests are grouped into endpoint classes - generate (/api/generate,
+/api/chat), embed (/api/embed, /api/embeddings) and other - and each class
+has its own semaphore, so a burst of fact extractions cannot starve
+embeddings and neither can exceed what Ollama serves in parallel.
+
+Identical requests (same method, endpoint and payload - which includes the
+model) that are in flight at the same time share one upstream call: the bot
+and an agent searching for the same thing after a shared event cost Ollama
+one embedding, not two. Followers get a copy of the leader's response.
+Streaming calls are admitted under the same limits but never coalesced.
+
+A circuit breaker per gateway stops a stalled Ollama from tying up worker
+threads: after consecutive failures (connection errors, timeouts, 5xx) calls
+fail fast with CircuitOpenError until a half-open probe succeeds. Timeouts
+adapt to observed latency - a multiple of the recent p99 per endpoint class,
+never above the caller's ceiling - so a hung request is abandoned in seconds
+rather than after the 300s worst case.
+"""
+
+import asyncio
+import collections
+import contextlib
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+GENERATE = "generate"
+EMBED = "embed"
+OTHER = "other"
+
+_ENDPOINT_CLASSES = {
+    "/api/generate": GENERATE,
+    "/api/chat": GENERATE,
+    "/api/embed": EMBED,
+    "/api/embeddings": EMBED,
+}
+
+
+def endpoint_class(path: str) -> str:
+    return _ENDPOINT_CLASSES.get(path, OTHER)
+
+
+def model_key(name: str) -> str:
+    """Ollama reports untagged models as name:latest"""
+    return name if ":" in name else f"{name}:latest"
+
+
+class OllamaError(RuntimeError):
+    """Ollama answered with an error status (status_code) or could not be reached (status_code None)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(OllamaError):
+    """Raised without calling Ollama while its circuit breaker is open"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message, status_code=503)
+        self.retry_after = retry_after
+
+
+# Lower bound for adaptive timeouts per endpoint class (seconds): model loads and
+# long extractions must still fit even when recent calls were all fast
+TIMEOUT_FLOORS = {GENERATE: 60.0, EMBED: 10.0, OTHER: 5.0}
+# Recorded calls needed before the p99 is trusted
+MIN_LATENCY_SAMPLES = 20
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half_open once `reset_timeout` has passed;
+    half_open lets one probe through: success closes, failure re-opens.
+
+    Used only from the gateway loop, so no locking.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        on_open: Optional[Callable[[], None]] = None,
+    ):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.on_open = on_open
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+        self.failures = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def check(self) -> None:
+        """Fail fast if no call may go through right now (no state is claimed)"""
+        if self.state == OPEN and self.retry_after() <= 0:
+            self.state = HALF_OPEN
+            self._probing = False
+            logger.info(f"Ollama circuit {self.name} half-open - probing")
+        if self.state == OPEN or (self.state == HALF_OPEN and self._probing):
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"Ollama circuit open for {self.name} after {self.consecutive_failures} failures",
+                retry_after=max(self.retry_after(), 1.0),
+            )
+
+    def before_call(self) -> None:
+        """check(), then claim the half-open probe slot if there is one"""
+        self.check()
+        if self.state == HALF_OPEN:
+            self._probing = True
+
+    def on_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"Ollama circuit {self.name} closed")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._probing = False
+
+    def on_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or (
+            self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+            self.opened += 1
+            logger.warning(
+                f"Ollama circuit {self.name} open after {self.consecutive_failures} consecutive failures - "
+                f"failing fast for {self.reset_timeout:.0f}s"
+            )
+            if self.on_open is not None:
+                self.on_open()
+
+    def on_cancel(self) -> None:
+        # A cancelled probe proves nothing; free the slot for the next one
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "retry_after": round(self.retry_after(), 1) if self.state == OPEN else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "failures": self.failures,
+        }
+
+
+class _EndpointLimit:
+    """Semaphore plus queue/latency counters for one endpoint class (touched only on the gateway loop)"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_latency = 0.0
+        self.timeouts = 0
+        # Recent request/response latencies, for adaptive timeouts; a timed-out
+        # call counts at its timeout so the p99 cannot drift below what Ollama needs
+        self.latencies: "collections.deque[float]" = collections.deque(maxlen=200)
+
+    def p99(self) -> Optional[float]:
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def stats(self) -> Dict[str, Any]:
+        finished = max(self.requests, 1)
+        p99 = self.p99()
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "avg_wait_ms": round(self.total_wait / finished * 1000, 2),
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "avg_latency_ms": round(self.total_latency / finished * 1000, 2),
+            "p99_latency_ms": round(p99 * 1000, 2) if p99 is not None else None,
+            "timeouts": self.timeouts,
+        }
+
+
+class OllamaGateway:
+    """
+    Usage:
+        gateway = get_gateway("http://host.docker.internal:11434")
+        data = gateway.post("/api/embed", {"model": m, "input": texts})          # from a thread
+        data = await gateway.apost("/api/generate", {"model": m, "prompt": p})   # from any event loop
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_generate: int = 2,
+        max_embed: int = 8,
+        max_other: int = 4,
+        max_connections: int = 32,
+        timeout: float = 300.0,
+        connect_timeout: float = 10.0,
+        coalesce: bool = True,
+        breaker_failures: int = 5,
+        breaker_reset: float = 30.0,
+        adaptive_timeouts: bool = True,
+        timeout_multiplier: float = 3.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.coalesce = coalesce
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.adaptive_timeouts = adaptive_timeouts
+        self.timeout_multiplier = timeout_multiplier
+        self.breaker = CircuitBreaker(
+            self.base_url, breaker_failures, breaker_reset, on_open=self._schedule_probe
+        )
+        self.limits = {
+            GENERATE: _EndpointLimit(GENERATE, max_generate),
+            EMBED: _EndpointLimit(EMBED, max_embed),
+            OTHER: _EndpointLimit(OTHER, max_other),
+        }
+        self._client: Optional[httpx.AsyncClient] = None
+        # (method, path, canonical payload) -> task of the leading request
+        self._inflight: Dict[Tuple[str, str, str], "asyncio.Task"] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ollama-gateway", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+        logger.info(
+            f"OllamaGateway initialized - {self.base_url}, generate: {max_generate}, "
+            f"embed: {max_embed}, other: {max_other}, connections: {max_connections}, coalesce: {coalesce}"
+        )
+
+    async def _setup(self) -> None:
+        # Client and semaphores are created on the loop that will use them
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=60.0,
+            ),
+        )
+        for limit in self.limits.values():
+            limit.semaphore = asyncio.Semaphore(max(limit.limit, 1))
+
+    # ------------------------------------------------------------------
+    # Core request (runs on the gateway loop)
+    # ------------------------------------------------------------------
+    @contextlib.asynccontextmanager
+    async def _admitted(self, path: str):
+        """Hold the endpoint class semaphore, recording queue wait, latency and errors"""
+        limit = self.limits[endpoint_class(path)]
+        # Fail fast instead of queueing behind a dead Ollama
+        self.breaker.check()
+        queued_at = time.perf_counter()
+        limit.waiting += 1
+        limit.max_waiting = max(limit.max_waiting, limit.waiting)
+        try:
+            await limit.semaphore.acquire()
+        finally:
+            limit.waiting -= 1
+        started = time.perf_counter()
+        wait = started - queued_at
+        limit.total_wait += wait
+        limit.max_wait = max(limit.max_wait, wait)
+        limit.in_flight += 1
+        try:
+            # The breaker may have opened while we queued
+            self.breaker.before_call()
+            yield limit
+            self.breaker.on_success()
+        except asyncio.CancelledError:
+            self.breaker.on_cancel()
+            raise
+        except CircuitOpenError:
+            raise
+        except OllamaError:
+            # Error line in a stream: Ollama itself is responding
+            limit.errors += 1
+            self.breaker.on_success()
+            raise
+        except httpx.HTTPStatusError as e:
+            limit.errors += 1
+            # 4xx (unknown model, bad request) says nothing about Ollama's health
+            if e.response.status_code >= 500:
+                self.breaker.on_failure()
+            else:
+                self.breaker.on_success()
+            raise OllamaError(
+                f"Ollama HTTP API error ({e.response.status_code}): {e.response.text}",
+                status_code=e.response.status_code,
+            ) from e
+        except httpx.TimeoutException as e:
+            limit.errors += 1
+            limit.timeouts += 1
+            self.breaker.on_failure()
+            raise OllamaError(f"Ollama HTTP API timeout ({path}): {e!r}") from e
+        except Exception as e:
+            limit.errors += 1
+            self.breaker.on_failure()
+            raise OllamaError(f"Ollama HTTP API error: {e}") from e
+        finally:
+            limit.in_flight -= 1
+            limit.requests += 1
+            limit.total_latency += time.perf_counter() - started
+            limit.semaphore.release()
+
+    def _timeout_for(self, path: str, requested: Optional[float]) -> float:
+        """Multiple of the recent p99 for the endpoint class, within [floor, caller's ceiling]"""
+        ceiling = requested or self.timeout
+        if not self.adaptive_timeouts:
+            return ceiling
+        limit = self.limits[endpoint_class(path)]
+        p99 = limit.p99()
+        if p99 is None:
+            return ceiling
+        return min(ceiling, max(TIMEOUT_FLOORS[limit.name], p99 * self.timeout_multiplier))
+
+    def _schedule_probe(self) -> None:
+        # Recover without waiting for user traffic: probe once the breaker turns half-open
+        self._loop.call_later(self.breaker.reset_timeout + 0.1, lambda: asyncio.ensure_future(self._probe()))
+
+    async def _probe(self) -> None:
+        try:
+            await self._request("GET", "/api/version", None, 5.0)
+        except OllamaError:
+            pass
+
+    def _request_kwargs(self, payload: Optional[Dict[str, Any]], timeout: Optional[float]) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {}
+        if timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(timeout, connect=self.connect_timeout)
+        if payload is not None:
+            kwargs["json"] = payload
+        return kwargs
+
+    async def _request(
+        self, method: str, path: str, payload: Optional[Dict[str, Any]], timeout: Optional[float]
+    ) -> Any:
+        async with self._admitted(path) as limit:
+            started = time.perf_counter()
+            effective = self._timeout_for(path, timeout)
+            try:
+                response = await self._client.request(method, path, **self._request_kwargs(payload, effective))
+            except httpx.TimeoutException:
+                limit.latencies.append(effective)
+                raise
+            response.raise_for_status()
+            data = response.json()
+            limit.latencies.append(time.perf_counter() - started)
+            return data
+
+    async def _stream(
+        self,
+        method: str,
+        path: str,
+        payload: Optional[Dict[str, Any]],
+        timeout: Optional[float],
+        emit: Callable[[Tuple[str, Any]], None],
+    ) -> None:
+        """Emit ("line", obj) per NDJSON line, then ("end", None) or ("error", exc)"""
+        try:
+            async with self._admitted(path):
+                async with self._client.stream(method, path, **self._request_kwargs(payload, timeout)) as response:
+                    if response.is_error:
+                        await response.aread()
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        try:
+                            item = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if isinstance(item, dict) and item.get("error"):
+                            # Ollama reports failures mid-stream as an error line
+                            raise OllamaError(f"Ollama HTTP API error: {item['error']}")
+                        emit(("line", item))
+            emit(("end", None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            emit(("error", e))
+
+    async def _single_flight(
+        self, method: str, path: str, payload: Optional[Dict[str, Any]], timeout: Optional[float]
+    ) -> Any:
+        """Join an identical in-flight request if there is one, otherwise lead a new one"""
+        if not self.coalesce:
+            return await self._request(method, path, payload, timeout)
+        key = (method, path, json.dumps(payload, sort_keys=True, separators=(",", ":")))
+        task = self._inflight.get(key)
+        if task is not None:
+            self.limits[endpoint_class(path)].coalesced += 1
+            # shield: a follower giving up must not cancel the call others wait on
+            return copy.deepcopy(await asyncio.shield(task))
+        task = asyncio.ensure_future(self._request(method, path, payload, timeout))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    # ------------------------------------------------------------------
+    # Callers
+    # ------------------------------------------------------------------
+    def _submit(self, coro) -> "asyncio.Future":
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                timeout: Optional[float] = None) -> Any:
+        """Blocking call for threads (mem0 shim); must not be called on the gateway loop"""
+        return self._submit(self._single_flight(method, path, payload, timeout)).result()
+
+    async def arequest(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                       timeout: Optional[float] = None) -> Any:
+        """Awaitable from any event loop (router, FastAPI endpoints)"""
+        return await asyncio.wrap_future(self._submit(self._single_flight(method, path, payload, timeout)))
+
+    def post(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        return self.request("POST", path, payload, timeout)
+
+    async def apost(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        return await self.arequest("POST", path, payload, timeout)
+
+    def get(self, path: str, timeout: Optional[float] = None) -> Any:
+        return self.request("GET", path, None, timeout)
+
+    async def aget(self, path: str, timeout: Optional[float] = None) -> Any:
+        return await self.arequest("GET", path, None, timeout)
+
+    def stream(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Any]:
+        """Blocking iterator over a streaming endpoint's NDJSON lines (not coalesced)"""
+        lines: "queue.SimpleQueue[Tuple[str, Any]]" = queue.SimpleQueue()
+        future = self._submit(self._stream("POST", path, payload, timeout, lines.put))
+        try:
+            while True:
+                kind, value = lines.get()
+                if kind == "line":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            # Consumer stopped early: release the connection and the semaphore
+            future.cancel()
+
+    async def astream(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> AsyncIterator[Any]:
+        """Async iterator over a streaming endpoint's NDJSON lines, usable from any event loop"""
+        loop = asyncio.get_running_loop()
+        lines: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+        future = self._submit(
+            self._stream("POST", path, payload, timeout, lambda item: loop.call_soon_threadsafe(lines.put_nowait, item))
+        )
+        try:
+            while True:
+                kind, value = await lines.get()
+                if kind == "line":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "max_connections": self.max_connections,
+            "coalesce": self.coalesce,
+            "adaptive_timeouts": self.adaptive_timeouts,
+            "circuit": self.breaker.stats(),
+            **{name: limit.stats() for name, limit in self.limits.items()},
+        }
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        if self._client is not None:
+            self._submit(self._client.aclose()).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+
+# =============================================================================
+# Process-wide gateways
+# =============================================================================
+_gateways: Dict[str, OllamaGateway] = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(base_url: Optional[str] = None) -> OllamaGateway:
+    """Shared gateway for base_url (default OLLAMA_URL), limits from OLLAMA_MAX_CONCURRENT_* env vars"""
+    base_url = (base_url or os.getenv("OLLAMA_URL", "http://host.docker.internal:11434")).rstrip("/")
+    if not base_url.startswith("http"):
+        base_url = f"http://{base_url}"
+    with _gateways_lock:
+        gateway = _gateways.get(base_url)
+        if gateway is None:
+            gateway = _gateways[base_url] = OllamaGateway(
+                base_url,
+                max_generate=int(os.getenv("OLLAMA_MAX_CONCURRENT_GENERATE", "2")),
+                max_embed=int(os.getenv("OLLAMA_MAX_CONCURRENT_EMBED", "8")),
+                max_other=int(os.getenv("OLLAMA_MAX_CONCURRENT_OTHER", "4")),
+                max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32")),
+                coalesce=os.getenv("OLLAMA_COALESCE_REQUESTS", "true").lower() == "true",
+                breaker_failures=int(os.getenv("OLLAMA_BREAKER_FAILURES", "5")),
+                breaker_reset=float(os.getenv("OLLAMA_BREAKER_RESET_SECONDS", "30")),
+                adaptive_timeouts=os.getenv("OLLAMA_ADAPTIVE_TIMEOUTS", "true").lower() == "true",
+                timeout_multiplier=float(os.getenv("OLLAMA_TIMEOUT_P99_MULTIPLIER", "3")),
+            )
+        return gateway
+
+
+def gateway_stats() -> Dict[str, Any]:
+    with _gateways_lock:
+        return {url: gateway.stats() for url, gateway in _gateways.items()}
+
+
+def circuit_states() -> Dict[str, str]:
+    """Breaker state per Ollama endpoint, for /health"""
+    with _gateways_lock:
+        return {url: gateway.breaker.state for url, gateway in _gateways.items()}
+
+
+def close_gateways() -> None:
+    with _gateways_lock:
+        gateways = list(_gateways.values())
+        _gateways.clear()
+    for gateway in gateways:
+        gateway.close()
@@ -0,0 +1,267 @@
+"""
+Ollama Residency - Keep mem0's models loaded in Ollama
+Location: /Volumes/Data/ai_projects/mem0-system/lib/ollama_residency.py
+Purpose: Avoid the 10-30s model load on the first /memories call after an idle period
+Scope: Startup preload, keep_alive policy, /api/ps monitoring, optional working-hours pings
+
+Ollama unloads a model keep_alive after its last request (5 minutes by
+default). On a CPU-only host, reloading mistral:7b-instruct from disk takes
+10-30s, and that lands on whichever user request comes first. The residency
+manager preloads the configured models, the HTTP client sends keep_alive on
+every request, and a monitor thread polls /api/ps. During the configured
+working hours, a model that is unloaded - or close to expiring - is pinged
+back in; outside them the monitor only records what is resident.
+
+With several hosts behind an OllamaBalancer, each model is loaded and
+monitored on every host that would serve it (per inventory and affinity).
+"""
+
+import datetime
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from ollama_balancer import OllamaBalancer
+from ollama_client import OllamaGateway, model_key
+
+logger = logging.getLogger(__name__)
+
+LLM = "llm"
+EMBEDDER = "embedder"
+
+_DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def parse_days(spec: str) -> Set[int]:
+    """'mon-fri' / 'mon,wed,sat' / 'sat-sun' -> weekday numbers (Monday = 0)"""
+    days: Set[int] = set()
+    for part in spec.lower().replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (_DAYS.index(day[:3]) for day in part.split("-", 1))
+            day = start
+            while True:
+                days.add(day)
+                if day == end:
+                    break
+                day = (day + 1) % 7
+        else:
+            days.add(_DAYS.index(part[:3]))
+    return days
+
+
+def parse_hours(spec: str) -> Optional[Tuple[datetime.time, datetime.time]]:
+    """'08:00-19:00' -> (start, end); empty means no working-hours window"""
+    if not spec.strip():
+        return None
+    start, end = spec.replace(" ", "").split("-", 1)
+    return datetime.time.fromisoformat(start), datetime.time.fromisoformat(end)
+
+
+def _parse_expires(value: str) -> Optional[float]:
+    """/api/ps expires_at (RFC 3339, nanosecond fraction) -> epoch seconds"""
+    if not value:
+        return None
+    # fromisoformat before 3.11 takes at most 6 fractional digits and no 'Z'
+    value = re.sub(r"(\.\d{6})\d+", r"\1", value).replace("Z", "+00:00")
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+class ModelResidencyManager:
+    """
+    Usage:
+        residency = ModelResidencyManager(
+            get_gateway(OLLAMA_URL),
+            models=[("mistral:7b-instruct-q5_K_M", LLM), ("nomic-embed-text:latest", EMBEDDER)],
+            keep_alive="30m",
+            ping_hours="08:00-19:00",
+        )
+        residency.preload()     # blocking, e.g. as a warmup step
+        residency.start()       # /api/ps monitor + working-hours pings
+    """
+
+    def __init__(
+        self,
+        gateway: Union[OllamaGateway, OllamaBalancer],
+        models: Sequence[Tuple[str, str]],
+        keep_alive: str = "30m",
+        check_interval: float = 60.0,
+        ping_hours: str = "",
+        ping_days: str = "mon-fri",
+        refresh_margin: float = 300.0,
+    ):
+        self.gateway = gateway
+        self.models = [(model_key(name), kind) for name, kind in models]
+        self.keep_alive = keep_alive
+        self.check_interval = check_interval
+        self.ping_hours = parse_hours(ping_hours)
+        self.ping_days = parse_days(ping_days)
+        self.refresh_margin = refresh_margin
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # host -> model -> /api/ps details
+        self.resident: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.last_check: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checks = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.unloaded_seen = 0
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    @property
+    def hosts(self) -> List[OllamaGateway]:
+        if isinstance(self.gateway, OllamaBalancer):
+            return self.gateway.nodes
+        return [self.gateway]
+
+    def hosts_for(self, name: str, kind: str) -> List[OllamaGateway]:
+        """Hosts that serve this model's calls"""
+        if isinstance(self.gateway, OllamaBalancer):
+            return self.gateway.nodes_serving("/api/embed" if kind == EMBEDDER else "/api/generate", name)
+        return [self.gateway]
+
+    def load(self, name: str, kind: str, host: Optional[OllamaGateway] = None) -> float:
+        """Load one model with keep_alive (on one host, default: every host serving it); returns seconds taken"""
+        started = time.perf_counter()
+        for target in [host] if host is not None else self.hosts_for(name, kind):
+            if kind == EMBEDDER:
+                target.post("/api/embed", {"model": name, "input": "warmup", "keep_alive": self.keep_alive})
+            else:
+                # An empty prompt loads the model without generating tokens
+                target.post(
+                    "/api/generate",
+                    {"model": name, "prompt": "", "keep_alive": self.keep_alive, "stream": False},
+                )
+            self.loads += 1
+        return time.perf_counter() - started
+
+    def preload(self) -> None:
+        """Load every configured model; raises with all failures after trying each one"""
+        errors: List[str] = []
+        for name, kind in self.models:
+            try:
+                seconds = self.load(name, kind)
+                logger.info(f"Ollama model {name} loaded in {seconds:.1f}s (keep_alive {self.keep_alive})")
+            except Exception as e:
+                self.load_errors += 1
+                errors.append(f"{name}: {e}")
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    # ------------------------------------------------------------------
+    # Monitoring
+    # ------------------------------------------------------------------
+    def in_working_hours(self, now: Optional[datetime.datetime] = None) -> bool:
+        if self.ping_hours is None:
+            return False
+        now = now or datetime.datetime.now()
+        if now.weekday() not in self.ping_days:
+            return False
+        start, end = self.ping_hours
+        if start <= end:
+            return start <= now.time() < end
+        # Window crossing midnight, e.g. 22:00-06:00
+        return now.time() >= start or now.time() < end
+
+    def check(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Poll /api/ps and re-load configured models that are missing or about to expire.
+        A host that cannot be polled is skipped; the failures are raised after the others are handled.
+        """
+        now = time.time()
+        resident = {}
+        errors: List[str] = []
+        for host in self.hosts:
+            try:
+                data = host.get("/api/ps", timeout=10.0)
+            except Exception as e:
+                errors.append(f"{host.base_url}: {e}")
+                continue
+            models = resident[host.base_url] = {}
+            for entry in data.get("models", []):
+                expires = _parse_expires(entry.get("expires_at", ""))
+                models[model_key(entry.get("name") or entry.get("model", ""))] = {
+                    "size": entry.get("size"),
+                    "size_vram": entry.get("size_vram"),
+                    "expires_in_seconds": round(expires - now) if expires else None,
+                }
+        self.resident = resident
+        self.last_check = now
+        self.checks += 1
+
+        ping = self.in_working_hours()
+        for name, kind in self.models:
+            for host in self.hosts_for(name, kind):
+                if host.base_url not in resident:
+                    continue
+                state = resident[host.base_url].get(name)
+                if state is None:
+                    self.unloaded_seen += 1
+                expires_in = state["expires_in_seconds"] if state else None
+                expiring = expires_in is not None and 0 <= expires_in < self.refresh_margin
+                if ping and (state is None or expiring):
+                    try:
+                        seconds = self.load(name, kind, host)
+                        logger.info(f"Residency ping re-loaded {name} on {host.base_url} in {seconds:.1f}s")
+                    except Exception as e:
+                        self.load_errors += 1
+                        logger.warning(f"Residency ping for {name} on {host.base_url} failed: {e}")
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return resident
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.check_interval):
+            try:
+                self.check()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Ollama residency check failed: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None or self.check_interval <= 0:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="ollama-residency", daemon=True)
+        self._thread.start()
+        window = "off" if self.ping_hours is None else f"{self.ping_hours[0]}-{self.ping_hours[1]}"
+        logger.info(
+            f"Ollama residency monitor started - every {self.check_interval:.0f}s, "
+            f"keep_alive {self.keep_alive}, pings {window}"
+        )
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _model_stats(self, name: str, kind: str) -> Dict[str, Any]:
+        hosts = {host.base_url: self.resident.get(host.base_url, {}).get(name) for host in self.hosts_for(name, kind)}
+        return {"kind": kind, "resident": all(state is not None for state in hosts.values()), "hosts": hosts}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keep_alive": self.keep_alive,
+            "check_interval": self.check_interval,
+            "ping_hours": None if self.ping_hours is None else [str(t) for t in self.ping_hours],
+            "ping_days": [_DAYS[d] for d in sorted(self.ping_days)],
+            "in_working_hours": self.in_working_hours(),
+            "models": {name: self._model_stats(name, kind) for name, kind in self.models},
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "checks": self.checks,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "unloaded_seen": self.unloaded_seen,
+        }
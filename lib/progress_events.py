@@ -0,0 +1,111 @@
+"""
+Progress Events - Request-scoped progress reporting for streaming endpoints
+Location: /Volumes/Data/ai_projects/mem0-system/lib/progress_events.py
+Purpose: Let /memories/stream show extraction progress and facts while mem0 is still working
+Scope: Progress channel in a context variable, incremental fact parser, SSE formatting
+
+The streaming endpoint opens a ProgressChannel and runs Memory.add as usual.
+The channel travels with the request context into the executor and into
+mem0's own worker threads (see stage_timing.bind_context). The Ollama HTTP
+client checks for a channel on each chat call: when there is one, it streams
+the completion, reports LLM call progress and emits each extracted fact as
+soon as its JSON string is complete.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import json
+import logging
+import re
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# mem0's fact extraction answers {"facts": ["...", ...]}
+_FACTS_START = re.compile(r'"facts"\s*:\s*\[')
+_DECODER = json.JSONDecoder()
+
+
+class FactStreamParser:
+    """
+    Usage:
+        parser = FactStreamParser(on_fact=print)
+        for text_so_far in partial_completions:
+            parser.feed(text_so_far)    # calls on_fact once per completed array item
+    """
+
+    def __init__(self, on_fact: Callable[[Any], None]):
+        self.on_fact = on_fact
+        self._pos: Optional[int] = None
+        self.count = 0
+
+    def feed(self, text: str) -> None:
+        if self._pos is None:
+            match = _FACTS_START.search(text)
+            if match is None:
+                return
+            self._pos = match.end()
+        while True:
+            i = self._pos
+            while i < len(text) and text[i] in " \t\r\n,":
+                i += 1
+            if i >= len(text) or text[i] == "]":
+                return
+            try:
+                value, end = _DECODER.raw_decode(text, i)
+            except ValueError:
+                # Item not complete yet
+                return
+            self._pos = end
+            self.count += 1
+            self.on_fact(value)
+
+
+class ProgressChannel:
+    """Thread-safe event sink feeding an asyncio.Queue on the request's event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+        self._calls = itertools.count(1)
+
+    def emit(self, event: str, data: Any) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+
+    def llm_started(self, model: str) -> int:
+        call = next(self._calls)
+        self.emit("progress", {"stage": "llm", "status": "started", "call": call, "model": model})
+        return call
+
+    def llm_finished(self, call: int, seconds: float, facts: int) -> None:
+        self.emit(
+            "progress",
+            {"stage": "llm", "status": "finished", "call": call, "seconds": round(seconds, 3), "facts": facts},
+        )
+
+    def fact_parser(self) -> FactStreamParser:
+        return FactStreamParser(lambda fact: self.emit("fact", {"fact": fact}))
+
+
+_CURRENT: contextvars.ContextVar[Optional[ProgressChannel]] = contextvars.ContextVar(
+    "mem0_progress_channel", default=None
+)
+
+
+def current_channel() -> Optional[ProgressChannel]:
+    return _CURRENT.get()
+
+
+def open_channel(loop: asyncio.AbstractEventLoop) -> Tuple[ProgressChannel, contextvars.Token]:
+    channel = ProgressChannel(loop)
+    return channel, _CURRENT.set(channel)
+
+
+def close_channel(token: contextvars.Token) -> None:
+    _CURRENT.reset(token)
+
+
+def format_sse(event: str, data: Any) -> str:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
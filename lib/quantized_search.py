@@ -0,0 +1,210 @@
+"""
+Quantized Search - Reduced-precision ANN index with exact rescoring for pgvector
+Location: /Volumes/Data/ai_projects/mem0-system/lib/quantized_search.py
+Purpose: Keep the HNSW index small enough for shared_buffers without losing result quality
+Scope: Expression indexes on halfvec/binary-quantized vectors, two-stage search for mem0's PGVector
+
+The memories table keeps its full-precision vector(768) column. Instead of
+indexing that column, an HNSW index is built over an expression:
+
+- halfvec: vector::halfvec(768), 2 bytes per dimension - half the index size
+- binary:  binary_quantize(vector)::bit(768), 1 bit per dimension - 1/32 the size
+
+Search reads oversample x limit candidates from the compact index and
+re-ranks them by exact cosine distance on the stored float32 vectors, so
+the returned distances are the same as before and recall stays close to
+the full-precision index. pgvector has no int8 vector type; binary
+quantization is its most compact option and needs more oversampling.
+
+Migration is done with scripts/quantize_vectors.py (index build, recall and
+latency report, optional removal of the full-precision index).
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_HALFVEC = "halfvec"
+MODE_BINARY = "binary"
+MODES = (MODE_HALFVEC, MODE_BINARY)
+
+# Candidates per requested result when no oversample factor is configured
+DEFAULT_OVERSAMPLE = {MODE_HALFVEC: 4, MODE_BINARY: 10}
+
+# pgvector rejects hnsw.ef_search above 1000, and one HNSW scan returns at most ef_search rows
+MAX_EF_SEARCH = 1000
+
+
+def index_name(table: str, mode: str) -> str:
+    return f"{table}_{mode}_hnsw_idx"
+
+
+def index_expression(mode: str, dims: int) -> Tuple[str, str]:
+    """(indexed expression, operator class) for a quantization mode"""
+    if mode == MODE_HALFVEC:
+        return f"(vector::halfvec({dims}))", "halfvec_cosine_ops"
+    if mode == MODE_BINARY:
+        return f"(binary_quantize(vector)::bit({dims}))", "bit_hamming_ops"
+    raise ValueError(f"Unknown quantization mode '{mode}' (expected one of {', '.join(MODES)})")
+
+
+def approximate_order(mode: str, dims: int) -> str:
+    """ORDER BY expression that the quantized index can serve; takes the query vector as one parameter"""
+    if mode == MODE_HALFVEC:
+        return f"vector::halfvec({dims}) <=> %s::vector::halfvec({dims})"
+    if mode == MODE_BINARY:
+        return f"binary_quantize(vector)::bit({dims}) <~> binary_quantize(%s::vector)::bit({dims})"
+    raise ValueError(f"Unknown quantization mode '{mode}'")
+
+
+def vector_dims(cur, table: str) -> int:
+    """Declared dimensions of table.vector, e.g. 768 for vector(768)"""
+    cur.execute(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = %s::regclass AND attname = 'vector'",
+        (table,),
+    )
+    row = cur.fetchone()
+    match = re.match(r"vector\((\d+)\)", row[0]) if row else None
+    if match is None:
+        raise RuntimeError(f"{table}.vector has no declared dimensions ({row[0] if row else 'missing'})")
+    return int(match.group(1))
+
+
+def index_exists(cur, name: str) -> bool:
+    cur.execute("SELECT 1 FROM pg_class WHERE relname = %s AND relkind = 'i'", (name,))
+    return cur.fetchone() is not None
+
+
+def quantized_index_present(conninfo: str, table: str, mode: str) -> bool:
+    """
+    Whether quantized search will be used for `mode`, checked before mem0 is built.
+
+    mem0's PGVector creates the full-precision HNSW index on startup unless
+    told not to. Skipping that is only safe once the quantized index exists;
+    until then search falls back to full precision and needs it. Any doubt
+    (mode off, index missing, database unreachable) answers False.
+    """
+    if mode not in MODES:
+        return False
+    try:
+        with psycopg.connect(conninfo, connect_timeout=10) as conn:
+            return index_exists(conn.cursor(), index_name(table, mode))
+    except Exception as e:
+        logger.warning(f"Could not check for {index_name(table, mode)}: {e}")
+        return False
+
+
+def full_precision_indexes(cur, table: str) -> List[str]:
+    """HNSW/IVFFlat indexes on the raw vector column (what quantization replaces)"""
+    cur.execute(
+        "SELECT indexname FROM pg_indexes WHERE tablename = %s "
+        "AND indexdef ~ 'USING (hnsw|ivfflat) \\(vector vector_'",
+        (table,),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def candidate_count(limit: int, oversample: int) -> int:
+    """Rows to read from the quantized index: oversample x limit, capped at MAX_EF_SEARCH"""
+    return min(max(limit * oversample, limit), MAX_EF_SEARCH)
+
+
+def ef_search_setting(candidates: int) -> str:
+    """SET LOCAL so one HNSW scan can return every candidate (40 is pgvector's default)"""
+    return f"SET LOCAL hnsw.ef_search = {min(max(40, candidates), MAX_EF_SEARCH)}"
+
+
+def filter_clause(filters: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """WHERE clause on payload fields, same semantics as mem0's PGVector.search"""
+    conditions, params = [], []
+    for key, value in (filters or {}).items():
+        conditions.append("payload->>%s = %s")
+        params.extend([key, str(value)])
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def rescored_query(table: str, mode: str, dims: int, where: str) -> str:
+    """
+    Two-stage search: the CTE walks the quantized index, the outer query
+    ranks its candidates by exact cosine distance on the float32 vectors.
+
+    Parameters: (*filter_params, query_vector, candidates, query_vector, limit)
+    """
+    return f"""
+        WITH candidates AS MATERIALIZED (
+            SELECT id, vector, payload
+            FROM {table}
+            {where}
+            ORDER BY {approximate_order(mode, dims)}
+            LIMIT %s
+        )
+        SELECT id, vector <=> %s::vector AS distance, payload
+        FROM candidates
+        ORDER BY distance
+        LIMIT %s
+    """
+
+
+class QuantizedSearchMixin:
+    """search() for mem0's PGVector that goes through the quantized index and rescores exactly"""
+
+    _quant_mode: str
+    _quant_dims: int
+    _quant_oversample: int
+
+    def search(self, query: str, vectors: List[float], limit: Optional[int] = 5, filters: Optional[dict] = None):
+        limit = limit or 5
+        candidates = candidate_count(limit, self._quant_oversample)
+        where, params = filter_clause(filters)
+        sql = rescored_query(self.collection_name, self._quant_mode, self._quant_dims, where)
+        with self._get_cursor() as cur:
+            cur.execute(ef_search_setting(candidates))
+            cur.execute(sql, (*params, vectors, candidates, vectors, limit))
+            rows = cur.fetchall()
+        output = type(self)._quant_output
+        return [output(id=str(r[0]), score=float(r[1]), payload=r[2]) for r in rows]
+
+
+def install_quantized_search(vector_store: Any, mode: str, oversample: Optional[int] = None) -> bool:
+    """
+    Switch a PGVector instance to quantized search if its index exists.
+
+    Returns False (and leaves the store untouched) when the mode is off or
+    the index has not been built yet - searching the expression without its
+    index would be a sequential scan.
+    """
+    if mode in ("", MODE_OFF):
+        return False
+    if mode not in MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}' (expected off, {', '.join(MODES)})")
+    table = vector_store.collection_name
+    with vector_store._get_cursor() as cur:
+        dims = vector_dims(cur, table)
+        present = index_exists(cur, index_name(table, mode))
+    if not present:
+        logger.warning(
+            f"Quantized search '{mode}' requested but {index_name(table, mode)} does not exist - "
+            f"using full-precision search (run scripts/quantize_vectors.py --mode {mode})"
+        )
+        return False
+
+    from mem0.vector_stores.pgvector import OutputData
+
+    cls = type(vector_store)
+    vector_store.__class__ = type(
+        cls.__name__, (QuantizedSearchMixin, cls), {"__module__": cls.__module__, "_quant_output": OutputData}
+    )
+    vector_store._quant_mode = mode
+    vector_store._quant_dims = dims
+    vector_store._quant_oversample = oversample or DEFAULT_OVERSAMPLE[mode]
+    logger.info(
+        f"Quantized search enabled - {mode}({dims}) on {table}, "
+        f"oversample {vector_store._quant_oversample}x with exact rescoring"
+    )
+    return True
@@ -0,0 +1,188 @@
+"""
+Response Cache - Exact and semantic cache for LLM router completions
+Location: /Volumes/Data/ai_projects/mem0-system/lib/response_cache.py
+Purpose: Answer repeated summarization/extraction prompts without another Ollama or OpenAI call
+Scope: LRU+TTL exact-match level, optional embedding-similarity level for deterministic calls, hit rates
+
+Level 1 is keyed by (model, temperature, sha256 of system prompt and
+prompt) and serves any call that repeats byte for byte.
+
+Level 2 is optional (semantic_threshold > 0). It keeps the prompt embedding
+of temperature-0 calls and answers a new temperature-0 call with the same
+model and system prompt when the cosine similarity reaches the threshold.
+Sampled calls (temperature > 0) never take a neighbour's answer. Keep the
+threshold high: two extraction prompts that differ in one fact can embed
+at 0.95 and need different answers.
+
+The cache only stores and compares; the router computes embeddings.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, float, bytes]
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+
+
+def _unit(vector: Sequence[float]) -> Optional[List[float]]:
+    norm = math.sqrt(math.fsum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else None
+
+
+class ResponseCache:
+    """
+    Usage:
+        cache = ResponseCache(max_entries=512, ttl_seconds=3600, semantic_threshold=0.97)
+        hit = cache.get(model, system_prompt, prompt, temperature)
+        if hit is None and cache.wants_vector(temperature):
+            vector = embed(prompt)
+            hit = cache.get_similar(model, system_prompt, vector)
+        if hit is None:
+            result = call_llm(...)
+            cache.put(model, system_prompt, prompt, temperature, result, vector)
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600.0,
+                 semantic_threshold: float = 0.0, semantic_entries: int = 256):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self.semantic_entries = semantic_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Exact key -> (stored at, (model, system digest), unit vector); scanned linearly
+        self._vectors: "OrderedDict[CacheKey, Tuple[float, Tuple[str, bytes], List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def wants_vector(self, temperature: float) -> bool:
+        """Whether the semantic level applies to a call (enabled, deterministic)"""
+        return self.enabled and self.semantic_threshold > 0 and self.semantic_entries > 0 and temperature == 0
+
+    @staticmethod
+    def _key(model: str, system_prompt: Optional[str], prompt: str, temperature: float) -> CacheKey:
+        # NUL-separated so the system/prompt boundary is unambiguous
+        return (model, float(temperature), _digest(f"{system_prompt or ''}\0{prompt}"))
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl_seconds <= 0 or time.monotonic() - stored_at <= self.ttl_seconds
+
+    def get(self, model: str, system_prompt: Optional[str], prompt: str,
+            temperature: float) -> Optional[Dict[str, Any]]:
+        """Exact-match lookup; a miss is only counted by miss() once every level has been tried"""
+        if not self.enabled:
+            return None
+        key = self._key(model, system_prompt, prompt, temperature)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, result = entry
+            if not self._fresh(stored_at):
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return result
+
+    def get_similar(self, model: str, system_prompt: Optional[str],
+                    vector: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """Best temperature-0 answer for the same model and system prompt at or above the threshold"""
+        unit = _unit(vector)
+        if unit is None:
+            return None
+        scope = (model, _digest(system_prompt or ""))
+        best_key, best_score = None, self.semantic_threshold
+        with self._lock:
+            expired = []
+            for key, (stored_at, entry_scope, entry_unit) in self._vectors.items():
+                if entry_scope != scope or len(entry_unit) != len(unit):
+                    continue
+                if not self._fresh(stored_at):
+                    expired.append(key)
+                    continue
+                score = sum(a * b for a, b in zip(unit, entry_unit))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            for key in expired:
+                self._remove(key)
+                self.expirations += 1
+            if best_key is None or best_key not in self._entries:
+                return None
+            self._entries.move_to_end(best_key)
+            self._vectors.move_to_end(best_key)
+            self.semantic_hits += 1
+            return {**self._entries[best_key][1], "similarity": round(best_score, 4)}
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def put(self, model: str, system_prompt: Optional[str], prompt: str, temperature: float,
+            result: Dict[str, Any], vector: Optional[Sequence[float]] = None) -> None:
+        if not self.enabled or not result.get("response"):
+            return
+        key = self._key(model, system_prompt, prompt, temperature)
+        unit = _unit(vector) if vector is not None and self.wants_vector(temperature) else None
+        with self._lock:
+            now = time.monotonic()
+            self._entries[key] = (now, result)
+            self._entries.move_to_end(key)
+            if unit is not None:
+                self._vectors[key] = (now, (model, _digest(system_prompt or "")), unit)
+                self._vectors.move_to_end(key)
+                while len(self._vectors) > self.semantic_entries:
+                    self._vectors.popitem(last=False)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+        self._vectors.pop(key, None)
+
+    def clear(self) -> int:
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._vectors.clear()
+            return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "semantic_entries": len(self._vectors),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "semantic_threshold": self.semantic_threshold,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "exact_hit_rate": round(self.exact_hits / lookups, 4) if lookups else 0.0,
+                "semantic_hit_rate": round(self.semantic_hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,174 @@
+"""
+Search Result Cache - Namespace-partitioned cache for /search responses
+Location: /Volumes/Data/ai_projects/mem0-system/lib/search_cache.py
+Purpose: Serve repeated recalls (Telegram bot, agents) without embedding or pgvector work
+Scope: LRU+TTL cache keyed by (query, user_id, agent_id, run_id, limit), invalidated on writes
+
+Entries are partitioned by user_id. Namespaced user_ids such as
+'mark_carey/sap' (NamespaceContext.format_user_id) make each namespace its
+own partition, so a write to one namespace only drops that namespace's
+cached searches.
+
+Every partition has a generation counter. A search records the generation
+before it runs and its result is only stored if no write to that partition
+completed in the meantime, so a slow search cannot re-cache stale results.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Partition for searches without a user_id (agent/run scoped only)
+_NO_USER = ""
+
+CacheKey = Tuple[str, str, Optional[str], Optional[str], int]
+
+
+class SearchResultCache:
+    """
+    Usage:
+        token = cache.generation(user_id)
+        result = cache.get(query, user_id, agent_id, run_id, limit)
+        if result is None:
+            result = memory.search(...)
+            cache.put(query, user_id, agent_id, run_id, limit, result, token)
+
+        # after any add/update/delete touching user_id
+        cache.invalidate(user_id)
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._partitions: Dict[str, Set[CacheKey]] = {}
+        self._generations: Dict[str, int] = {}
+        self._global_generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def _key(query: str, user_id: Optional[str], agent_id: Optional[str],
+             run_id: Optional[str], limit: int) -> CacheKey:
+        return (" ".join(query.split()), user_id or _NO_USER, agent_id, run_id, limit)
+
+    def generation(self, user_id: Optional[str]) -> Tuple[int, int]:
+        """Snapshot to pass to put() - taken before the search runs"""
+        with self._lock:
+            return self._global_generation, self._generations.get(user_id or _NO_USER, 0)
+
+    def get(self, query: str, user_id: Optional[str], agent_id: Optional[str],
+            run_id: Optional[str], limit: int) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        key = self._key(query, user_id, agent_id, run_id, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, result = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def contains(self, query: str, user_id: Optional[str], agent_id: Optional[str],
+                 run_id: Optional[str], limit: int) -> bool:
+        """Whether a fresh entry exists, without touching LRU order or stats"""
+        if not self.enabled:
+            return False
+        key = self._key(query, user_id, agent_id, run_id, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            return self.ttl_seconds <= 0 or time.monotonic() - entry[0] <= self.ttl_seconds
+
+    def put(self, query: str, user_id: Optional[str], agent_id: Optional[str],
+            run_id: Optional[str], limit: int, result: Any, token: Tuple[int, int]) -> bool:
+        if not self.enabled:
+            return False
+        key = self._key(query, user_id, agent_id, run_id, limit)
+        partition = key[1]
+        with self._lock:
+            current = (self._global_generation, self._generations.get(partition, 0))
+            if current != token:
+                # A write landed while this search was running
+                self.stale_puts += 1
+                return False
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            self._partitions.setdefault(partition, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+            return True
+
+    def invalidate(self, user_id: Optional[str]) -> int:
+        """
+        Drop cached searches affected by a write.
+
+        A write scoped to a user_id only touches that partition, plus the
+        searches made without a user_id (they can match any user's memories).
+        Writes without a user_id (agent/run scoped, or unknown owner) clear
+        everything.
+        """
+        if not user_id:
+            return self.clear()
+        dropped = 0
+        with self._lock:
+            for partition in (user_id, _NO_USER):
+                self._generations[partition] = self._generations.get(partition, 0) + 1
+                keys = self._partitions.pop(partition, set())
+                for key in keys:
+                    self._entries.pop(key, None)
+                dropped += len(keys)
+            self.invalidations += 1
+            return dropped
+
+    def clear(self) -> int:
+        with self._lock:
+            dropped = len(self._entries)
+            self._global_generation += 1
+            self._entries.clear()
+            self._partitions.clear()
+            self.invalidations += 1
+            return dropped
+
+    def _remove(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+        keys = self._partitions.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._partitions[key[1]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "partitions": len(self._partitions),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "stale_puts": self.stale_puts,
+            }
@@ -0,0 +1,221 @@
+"""
+Stage Timing - Per-stage latency breakdown for mem0 requests
+Location: /Volumes/Data/ai_projects/mem0-system/lib/stage_timing.py
+Purpose: Show where a slow /memories or /search spent its time without attaching a profiler
+Scope: Stage recorder per request, method instrumentation, Server-Timing header, Prometheus histograms
+
+Each request gets a StageRecorder in a context variable. Instrumented
+components (embedder, pgvector, Neo4j graph, LLM, history DB) add their
+call durations to it, and the totals are returned as a Server-Timing header.
+Every call is also observed into process-wide histograms served at /metrics.
+
+mem0 fans work out to its own ThreadPoolExecutor (vector store and graph run
+in parallel), and those threads do not inherit context variables. So
+instrumented methods are exposed through properties: the caller's context
+(recorder included) is captured when mem0 fetches the method, still on the
+calling thread, and carried into whichever thread ends up running it.
+"""
+
+import contextvars
+import functools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; +Inf is implicit
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class StageRecorder:
+    """Stage -> (total seconds, calls) for one request"""
+
+    def __init__(self):
+        self._stages: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def snapshot(self) -> Dict[str, Tuple[float, int]]:
+        with self._lock:
+            return {stage: (total, int(calls)) for stage, (total, calls) in self._stages.items()}
+
+    def server_timing(self, total_seconds: Optional[float] = None) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        parts = []
+        for stage, (seconds, calls) in self.snapshot().items():
+            entry = f"{stage};dur={seconds * 1000:.1f}"
+            if calls > 1:
+                entry += f';desc="{calls} calls"'
+            parts.append(entry)
+        if total_seconds is not None:
+            parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_CURRENT: contextvars.ContextVar[Optional[StageRecorder]] = contextvars.ContextVar(
+    "mem0_stage_recorder", default=None
+)
+
+
+def current_recorder() -> Optional[StageRecorder]:
+    return _CURRENT.get()
+
+
+def start_request() -> Tuple[StageRecorder, contextvars.Token]:
+    recorder = StageRecorder()
+    return recorder, _CURRENT.set(recorder)
+
+
+def end_request(token: contextvars.Token) -> None:
+    _CURRENT.reset(token)
+
+
+# =============================================================================
+# Histograms
+# =============================================================================
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: Tuple[str, ...], seconds: float) -> None:
+        with self._lock:
+            # [bucket counts..., +Inf count, sum]
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += seconds
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            for label_values, series in items:
+                base = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+                sep = "," if base else ""
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+                count = series[len(self.buckets)]
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "mem0_stage_duration_seconds",
+    "Duration of instrumented mem0 stage calls (embed, pgvector, graph, llm, history).",
+    ("stage", "op"),
+)
+REQUEST_DURATION = Histogram(
+    "mem0_request_duration_seconds",
+    "HTTP request duration by route template.",
+    ("method", "route", "status"),
+)
+LLM_QUEUE_WAIT = Histogram(
+    "mem0_llm_queue_wait_seconds",
+    "Time router LLM calls waited for a model slot (model_queue.py).",
+    ("model", "priority"),
+)
+
+# Extra exposition lines (gauges) from other modules, rendered after the histograms
+_COLLECTORS: List[Callable[[], List[str]]] = []
+
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    _COLLECTORS.append(collector)
+
+
+def record_stage(stage: str, op: str, seconds: float, recorder: Optional[StageRecorder] = None) -> None:
+    STAGE_DURATION.observe((stage, op), seconds)
+    recorder = recorder if recorder is not None else _CURRENT.get()
+    if recorder is not None:
+        recorder.add(stage, seconds)
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition of all histograms and registered collectors"""
+    lines = STAGE_DURATION.render() + REQUEST_DURATION.render() + LLM_QUEUE_WAIT.render()
+    for collector in _COLLECTORS:
+        lines += collector()
+    return "\n".join(lines) + "\n"
+
+
+# =============================================================================
+# Instrumentation
+# =============================================================================
+def _carrying(original: Callable, name: str, stage: Optional[str]) -> property:
+    """Property returning `original` bound to the instance, carrying the caller's context"""
+
+    def getter(instance):
+        bound = original.__get__(instance, type(instance))
+        # The whole request context travels: the recorder and other request-scoped
+        # variables such as the progress channel of a streaming request
+        context = contextvars.copy_context()
+        recorder = context.get(_CURRENT)
+
+        @functools.wraps(bound)
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                # A fresh copy per call, since a Context can't be entered twice at once
+                return context.copy().run(bound, *args, **kwargs)
+            finally:
+                if stage is not None:
+                    record_stage(stage, name, time.perf_counter() - started, recorder)
+
+        return call
+
+    return property(getter)
+
+
+def _install(obj: Any, methods: Iterable[str], stage: Optional[str]) -> Any:
+    cls = type(obj)
+    overrides = {}
+    for name in methods:
+        original = getattr(cls, name, None)
+        if callable(original) and not isinstance(original, property):
+            overrides[name] = _carrying(original, name, stage)
+    if not overrides:
+        return obj
+    # A per-instance subclass keeps the properties off the library's own classes
+    obj.__class__ = type(cls.__name__, (cls,), {"__module__": cls.__module__, **overrides})
+    return obj
+
+
+def instrument(obj: Any, stage: str, methods: Iterable[str]) -> Any:
+    """Time `methods` of obj under `stage` (missing methods are skipped)"""
+    if obj is None:
+        return obj
+    try:
+        return _install(obj, methods, stage)
+    except TypeError as e:
+        # e.g. classes with __slots__ or a C layout that doesn't allow __class__ assignment
+        logger.warning(f"Could not instrument {type(obj).__name__} for stage '{stage}': {e}")
+        return obj
+
+
+def bind_context(obj: Any, methods: Iterable[str]) -> Any:
+    """Carry the request context into `methods` without timing them (for mem0's thread fan-out)"""
+    try:
+        return _install(obj, methods, None)
+    except TypeError as e:
+        logger.warning(f"Could not bind timing context on {type(obj).__name__}: {e}")
+        return obj
@@ -0,0 +1,152 @@
+"""
+Token Counter - Prompt length in model tokens for LLM routing
+Location: /Volumes/Data/ai_projects/mem0-system/lib/token_counter.py
+Purpose: Route and size LLM requests by what the model will see, not by whitespace-separated words
+Scope: Per-model tokenizer vocabularies (lazy, cached), fast byte-based fallback
+
+len(text.split()) undercounts exactly the prompts that overflow a context
+window: code (`self.gateway.apost("/api/generate",` is one "word" and a
+dozen tokens) and text without spaces between words. The router counts
+with a TokenCounter instead:
+
+- TokenizerCounter encodes with the model's own vocabulary from a
+  tokenizer.json (Hugging Face `tokenizers` library). The file is loaded on
+  the first count and kept for the process.
+- ApproximateCounter divides the UTF-8 length by 3.5 bytes per token: about
+  4 characters per token for English, 3 for code, one token per CJK
+  character. It costs one C-level pass and is used whenever no tokenizer is
+  configured, the library is missing or the file fails to load.
+
+Tokenizers are found per model family (the part of the Ollama model name
+before ':'), from MEM0_TOKENIZERS ("mistral=/path/tokenizer.json,
+codellama=hf-org/repo") or as <family>.json in MEM0_TOKENIZER_DIR.
+"""
+
+import logging
+import math
+import os
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+logger = logging.getLogger(__name__)
+
+# UTF-8 bytes per token for the fallback estimate
+APPROX_BYTES_PER_TOKEN = 3.5
+
+
+def model_family(model: str) -> str:
+    """'mistral:7b-instruct-q5_K_M' -> 'mistral', 'library/codellama:13b' -> 'codellama'"""
+    return model.split(":", 1)[0].rsplit("/", 1)[-1].lower()
+
+
+class ApproximateCounter:
+    """
+    Usage:
+        counter = ApproximateCounter()
+        counter.count("Über 2000 Zeilen Python-Code")
+    """
+
+    name = "approximate"
+
+    def __init__(self, bytes_per_token: float = APPROX_BYTES_PER_TOKEN):
+        self.bytes_per_token = bytes_per_token
+
+    def count(self, text: str) -> int:
+        # str.isascii() is O(1); only non-ASCII text pays for the encode
+        size = len(text) if text.isascii() else len(text.encode("utf-8", "surrogatepass"))
+        return math.ceil(size / self.bytes_per_token)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"counter": self.name, "bytes_per_token": self.bytes_per_token}
+
+
+class TokenizerCounter:
+    """
+    Usage:
+        counter = TokenizerCounter("mistral:7b", "/app/data/tokenizers/mistral.json")
+        counter.count(prompt)       # loads the tokenizer on first use
+    """
+
+    name = "tokenizer"
+
+    def __init__(self, model: str, source: str, fallback: Optional[ApproximateCounter] = None):
+        self.model = model
+        self.source = source
+        self.fallback = fallback or ApproximateCounter()
+        self._tokenizer = None
+        self._lock = threading.Lock()
+        self.error: Optional[str] = None
+
+    def _load(self):
+        with self._lock:
+            if self._tokenizer is not None or self.error is not None:
+                return self._tokenizer
+            try:
+                if Tokenizer is None:
+                    raise RuntimeError("the 'tokenizers' package is not installed")
+                if os.path.exists(self.source):
+                    self._tokenizer = Tokenizer.from_file(self.source)
+                else:
+                    # Hugging Face Hub id, downloaded once into the local cache
+                    self._tokenizer = Tokenizer.from_pretrained(self.source)
+                logger.info(f"Tokenizer for {self.model} loaded from {self.source}")
+            except Exception as e:
+                self.error = str(e)
+                logger.warning(f"Tokenizer for {self.model} unavailable ({e}) - using approximate token counts")
+            return self._tokenizer
+
+    def count(self, text: str) -> int:
+        tokenizer = self._tokenizer or self._load()
+        if tokenizer is None:
+            return self.fallback.count(text)
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "counter": self.name if self.error is None else self.fallback.name,
+            "source": self.source,
+            "loaded": self._tokenizer is not None,
+            "error": self.error,
+        }
+
+
+# =============================================================================
+# Process-wide counters
+# =============================================================================
+_counters: Dict[str, Any] = {}
+_counters_lock = threading.Lock()
+
+
+def _tokenizer_source(model: str) -> Optional[str]:
+    family = model_family(model)
+    for entry in os.getenv("MEM0_TOKENIZERS", "").split(","):
+        if "=" in entry:
+            name, source = entry.split("=", 1)
+            if name.strip().lower() == family and source.strip():
+                return source.strip()
+    path = os.path.join(os.getenv("MEM0_TOKENIZER_DIR", "/app/data/tokenizers"), f"{family}.json")
+    return path if os.path.exists(path) else None
+
+
+def get_token_counter(model: str):
+    """Shared counter for an Ollama model: its tokenizer if one is configured, else the approximation"""
+    with _counters_lock:
+        counter = _counters.get(model)
+        if counter is None:
+            source = _tokenizer_source(model)
+            counter = _counters[model] = TokenizerCounter(model, source) if source else ApproximateCounter()
+        return counter
+
+
+def count_tokens(text: str, model: str) -> int:
+    return get_token_counter(model).count(text)
+
+
+def token_counter_stats() -> Dict[str, Dict[str, Any]]:
+    with _counters_lock:
+        return {model: counter.stats() for model, counter in _counters.items()}
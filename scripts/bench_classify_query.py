@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for Mem0LLMRouter.classify_query
+Per-call cost at several prompt sizes for:
+  legacy    - the previous classify_query (duplicate scans, own word count)
+  regex     - one compiled alternation over every keyword (single pass)
+  current   - classify_text: keyword table, short-circuiting substring scans,
+              approximate token count instead of the word count
+  memo hit  - Mem0LLMRouter.classify_query answering from its LRU memo
+and a check that all of them classify random prompts the same way.
+
+  python3 scripts/bench_classify_query.py
+  python3 scripts/bench_classify_query.py --sizes 1024,10240,102400 --repeat 200
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+# Shared with the mem0 server: lib/ in the repo, /app inside the container
+sys.path.insert(0, "/app")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from llm_router import KEYWORD_GROUPS, Mem0LLMRouter, QueryType, classify_text
+
+WORDS = (
+    "the user said they prefer tea over coffee and moved to Amsterdam last year while "
+    "working on a new project with their team about memory retrieval and personal facts "
+    "extract find summary code compare analyze embedding brief function error tldr"
+).split()
+
+
+def legacy_classify(text, context_length=0):
+    """classify_query before the keyword table and memo (reference for timing and results)"""
+    text_lower = text.lower()
+    if context_length == 0:
+        context_length = len(text.split())
+    if "embedding" in text_lower or "encode" in text_lower:
+        return QueryType.EMBEDDING, 1
+    if any(kw in text_lower for kw in ["code", "function", "class", "python", "javascript", "debug", "error"]):
+        return QueryType.CODE, 3
+    if context_length < 500 and not any(kw in text_lower for kw in ["analyze", "complex", "reasoning", "explain why"]):
+        return QueryType.SIMPLE, 1
+    if any(kw in text_lower for kw in ["summarize", "summary", "tldr", "brief"]):
+        return QueryType.SUMMARIZATION, 2
+    if any(kw in text_lower for kw in ["extract", "find", "list", "identify"]):
+        return QueryType.EXTRACTION, 2
+    if any(kw in text_lower for kw in ["analyze", "reasoning", "complex", "explain why", "compare"]):
+        return QueryType.REASONING, 7 if context_length > 2000 else 5
+    if context_length < 1000:
+        return QueryType.SIMPLE, 2
+    return QueryType.SUMMARIZATION, 4
+
+
+_GROUP_OF = {keyword: group for group, keywords in KEYWORD_GROUPS.items() for keyword in keywords}
+# Lookahead so overlapping keywords ("findebug") are all seen, like separate `in` checks
+_PATTERN = re.compile("(?=(" + "|".join(re.escape(k) for k in sorted(_GROUP_OF, key=len, reverse=True)) + "))")
+
+
+def regex_classify(text, context_length=0):
+    """Single-pass alternative: one compiled pattern collects every keyword group"""
+    if context_length == 0:
+        context_length = len(text.split())
+    groups = {_GROUP_OF[m.group(1)] for m in _PATTERN.finditer(text.lower())}
+    if "embedding" in groups:
+        return QueryType.EMBEDDING, 1
+    if "code" in groups:
+        return QueryType.CODE, 3
+    if context_length < 500 and "complex" not in groups:
+        return QueryType.SIMPLE, 1
+    if "summarization" in groups:
+        return QueryType.SUMMARIZATION, 2
+    if "extraction" in groups:
+        return QueryType.EXTRACTION, 2
+    if "complex" in groups or "compare" in groups:
+        return QueryType.REASONING, 7 if context_length > 2000 else 5
+    if context_length < 1000:
+        return QueryType.SIMPLE, 2
+    return QueryType.SUMMARIZATION, 4
+
+
+def prompt(size, rng, vocabulary):
+    """Random text of about `size` characters"""
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(vocabulary)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def per_call_us(fn, text, repeat):
+    # A fresh but equal string per call, as prompts are rebuilt for every request
+    # (str caches its own hash, which would flatter the memo)
+    copies = [text[:1] + text[1:] for _ in range(repeat)]
+    started = time.perf_counter()
+    for copy in copies:
+        fn(copy)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def check_equivalence(samples, rng):
+    """Random prompts (with and without keywords) must classify exactly as before"""
+    plain = [w for w in WORDS if w not in ("extract", "find", "summary", "code", "compare", "analyze",
+                                           "embedding", "brief", "function", "error", "tldr")]
+    for i in range(samples):
+        vocabulary = WORDS if i % 2 else plain
+        text = prompt(rng.choice([40, 400, 3000, 8000, 20000]), rng, vocabulary)
+        if rng.random() < 0.3:
+            # Keywords glued to other words, e.g. "findebug"
+            text = text.replace(" ", "", rng.randint(1, 20))
+        if rng.random() < 0.3:
+            text = text.upper()
+        expected = legacy_classify(text)
+        # Same length measure as legacy (current counts tokens, not words)
+        current = classify_text(text, len(text.split()))[:2]
+        for name, actual in (("current", current), ("regex", regex_classify(text))):
+            if expected != actual:
+                raise AssertionError(f"{name} classification differs for {text[:80]!r}...: {expected} != {actual}")
+    print(f"Equivalence: {samples} random prompts classify identically")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1024,10240,102400", help="Prompt sizes in characters")
+    parser.add_argument("--repeat", type=int, default=100, help="Calls per measurement")
+    parser.add_argument("--samples", type=int, default=500, help="Random prompts for the equivalence check")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    check_equivalence(args.samples, rng)
+
+    router = Mem0LLMRouter()
+    print()
+    print(f"{'size':>8} {'legacy us':>12} {'regex us':>12} {'current us':>12} {'memo hit us':>12} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        # Worst case for the scans: no keyword, so every list is searched to the end
+        text = prompt(size, rng, ["tea", "coffee", "amsterdam", "memory", "user", "moved", "team", "year"])
+        legacy = per_call_us(legacy_classify, text, args.repeat)
+        regex = per_call_us(regex_classify, text, args.repeat)
+        current = per_call_us(classify_text, text, args.repeat)
+        router.classify_query(text)
+        cached = per_call_us(router.classify_query, text, args.repeat)
+        print(f"{size:>8} {legacy:>12.1f} {regex:>12.1f} {current:>12.1f} {cached:>12.1f} {legacy / cached:>7.1f}x")
+    print()
+    print(f"Classification cache: {router.get_metrics()['classification_cache']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,22 @@
 """
 Direct re-embedding script - bypasses mem0 API to preserve all memories
 Generates Ollama embeddings and inserts directly into PostgreSQL
+
+Drops the live memories table first; use scripts/reembed_pipeline.py to
+re-embed a table that is in use.
 """
 import psycopg
 import requests
 import json
+import os
 import sys
 from datetime import datetime
 
+# Shared with the mem0 server: lib/ in the repo, /app inside the container
+sys.path.insert(0, "/app")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from embedding_store import EmbeddingStore
+
 # Configuration
 POSTGRES_HOST = "postgres"  # Docker network name
 POSTGRES_PORT = 5432
@@ -19,21 +28,33 @@ POSTGRES_PASSWORD = "mem0PrdPassword2026SecureV2"  # From .env
 OLLAMA_URL = "http://host.docker.internal:11434"  # Host machine Ollama
 OLLAMA_MODEL = "nomic-embed-text:latest"
 
+# Vectors already computed (by an earlier run or by the server) are reused, so a
+# re-run after a crash only embeds what is left
+EMBED_STORE_PATH = os.environ.get("OLLAMA_EMBED_STORE_PATH", "/app/data/embeddings.db")
+
 def log(msg):
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
 
-def get_embedding(text):
-    """Get embedding from Ollama"""
+def get_embedding(store, text):
+    """Get embedding from the embedding store, falling back to Ollama"""
+    embedding = store.get(OLLAMA_MODEL, text)
+    if embedding is not None:
+        return embedding
     response = requests.post(
         f"{OLLAMA_URL}/api/embeddings",
         json={"model": OLLAMA_MODEL, "prompt": text}
     )
     response.raise_for_status()
-    return response.json()["embedding"]
+    embedding = response.json()["embedding"]
+    store.put(OLLAMA_MODEL, text, embedding)
+    return embedding
 
 def main():
     log("Starting direct re-embedding...")
 
+    store = EmbeddingStore(EMBED_STORE_PATH, max_entries=0)
+    log(f"Embedding store: {EMBED_STORE_PATH} ({store.stats()['entries']} vectors)")
+
     # Connect to database
     conn = psycopg.connect(
         host=POSTGRES_HOST,
@@ -85,7 +106,7 @@ def main():
                 continue
 
             # Generate embedding
-            embedding = get_embedding(content)
+            embedding = get_embedding(store, content)
 
             # Insert
             with conn.cursor() as cur:
@@ -104,6 +125,8 @@ def main():
             continue
 
     log(f"Re-embedding complete! Processed: {processed}, Failed: {failed}")
+    stats = store.stats()
+    log(f"Embedding store hits: {stats['hits']}, misses: {stats['misses']} (hit rate {stats['hit_rate']:.1%})")
 
     # Verify count
     with conn.cursor() as cur:
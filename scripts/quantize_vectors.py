@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Quantized vector index migration for the mem0 memories table
+Builds a halfvec or binary-quantized HNSW index next to the full-precision
+vectors, reports recall and latency against exact search, and optionally
+drops the full-precision index once the numbers look right.
+
+Migration path:
+  1. python3 scripts/quantize_vectors.py --mode halfvec --build --report
+  2. set MEM0_VECTOR_QUANTIZATION=halfvec and restart mem0
+  3. python3 scripts/quantize_vectors.py --mode halfvec --drop-full-index
+Rollback: MEM0_VECTOR_QUANTIZATION=off and restart; mem0 re-creates the
+full-precision HNSW index on startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import psycopg
+
+# Shared with the mem0 server: lib/ in the repo, /app inside the container
+sys.path.insert(0, "/app")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from quantized_search import (
+    DEFAULT_OVERSAMPLE,
+    MODES,
+    approximate_order,
+    candidate_count,
+    ef_search_setting,
+    full_precision_indexes,
+    index_exists,
+    index_expression,
+    index_name,
+    rescored_query,
+    vector_dims,
+)
+
+PG_CONNINFO = (
+    f"host={os.environ.get('POSTGRES_HOST', 'postgres')} "
+    f"port={os.environ.get('POSTGRES_PORT', '5432')} "
+    f"dbname={os.environ.get('POSTGRES_DB', 'mem0_prd')} "
+    f"user={os.environ.get('POSTGRES_USER', 'mem0_user_prd')} "
+    f"password={os.environ.get('POSTGRES_PASSWORD', '')}"
+)
+
+
+def log(msg):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
+
+
+def relation_size(conn, name):
+    row = conn.execute("SELECT pg_relation_size(%s::regclass)", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def build_index(conn, table, mode, dims, maintenance_work_mem):
+    name = index_name(table, mode)
+    expression, opclass = index_expression(mode, dims)
+    if index_exists(conn.cursor(), name):
+        log(f"{name} already exists")
+        return
+    log(f"Building {name} ({mode}, {dims} dims) - searches keep working meanwhile...")
+    started = time.perf_counter()
+    if maintenance_work_mem:
+        conn.execute(f"SET maintenance_work_mem = '{maintenance_work_mem}'")
+    conn.execute(f"CREATE INDEX CONCURRENTLY {name} ON {table} USING hnsw ({expression} {opclass})")
+    log(f"Built {name} in {time.perf_counter() - started:.1f}s ({relation_size(conn, name) / 1e6:.1f} MB)")
+
+
+def timed(conn, sql, params, settings=()):
+    """Run one query in its own transaction; returns (ids, seconds)"""
+    with conn.transaction():
+        for setting in settings:
+            conn.execute(setting)
+        started = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        return [str(r[0]) for r in rows], time.perf_counter() - started
+
+
+def summarize(name, recalls, latencies):
+    latencies = sorted(latencies)
+    return {
+        "method": name,
+        "recall": round(statistics.mean(recalls), 4) if recalls else None,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+    }
+
+
+def report(conn, table, mode, dims, queries, limit, oversample):
+    """Recall@limit and latency of full-precision HNSW, quantized-only and quantized+rescore vs exact"""
+    if not index_exists(conn.cursor(), index_name(table, mode)):
+        raise RuntimeError(f"{index_name(table, mode)} does not exist - run with --build first")
+    candidates = candidate_count(limit, oversample)
+    samples = conn.execute(
+        f"SELECT id, vector::text FROM {table} WHERE vector IS NOT NULL ORDER BY random() LIMIT %s", (queries,)
+    ).fetchall()
+    if not samples:
+        raise RuntimeError(f"{table} has no vectors to sample")
+    log(f"Comparing {len(samples)} queries, top {limit}, {oversample}x oversample ({candidates} candidates)")
+
+    # The query's own row is excluded everywhere, otherwise it is a guaranteed hit
+    where = "WHERE id <> %s"
+    exact_sql = f"SELECT id FROM {table} {where} ORDER BY vector <=> %s::vector LIMIT %s"
+    approx_sql = f"SELECT id FROM {table} {where} ORDER BY {approximate_order(mode, dims)} LIMIT %s"
+    rescored_sql = rescored_query(table, mode, dims, where)
+    exact_only = ("SET LOCAL enable_indexscan = off", "SET LOCAL enable_bitmapscan = off")
+    ef_search = (ef_search_setting(candidates),)
+    full_indexes = full_precision_indexes(conn.cursor(), table)
+
+    results = {"exact": [], "full_hnsw": [], "quantized": [], "quantized_rescored": []}
+    recalls = {key: [] for key in results}
+    for qid, qvec in samples:
+        truth, seconds = timed(conn, exact_sql, (qid, qvec, limit), exact_only)
+        results["exact"].append(seconds)
+        recalls["exact"].append(1.0)
+        truth = set(truth)
+        runs = [
+            ("quantized", approx_sql, (qid, qvec, limit), ef_search),
+            ("quantized_rescored", rescored_sql, (qid, qvec, candidates, qvec, limit), ef_search),
+        ]
+        if full_indexes:
+            runs.insert(0, ("full_hnsw", exact_sql, (qid, qvec, limit), ()))
+        for key, sql, params, settings in runs:
+            ids, seconds = timed(conn, sql, params, settings)
+            results[key].append(seconds)
+            recalls[key].append(len(truth.intersection(ids)) / max(len(truth), 1))
+
+    rows = [summarize(key, recalls[key], latencies) for key, latencies in results.items() if latencies]
+    sizes = {name: relation_size(conn, name) for name in full_indexes + [index_name(table, mode), table]}
+    return {
+        "table": table,
+        "mode": mode,
+        "dims": dims,
+        "queries": len(samples),
+        "limit": limit,
+        "oversample": oversample,
+        "results": rows,
+        "sizes_bytes": sizes,
+    }
+
+
+def print_report(data):
+    print()
+    print(f"Recall@{data['limit']} vs exact search - {data['queries']} queries, mode {data['mode']}, "
+          f"{data['oversample']}x oversample")
+    print(f"{'method':<20} {'recall':>8} {'p50 ms':>10} {'p95 ms':>10}")
+    for row in data["results"]:
+        recall = "-" if row["recall"] is None else f"{row['recall']:.4f}"
+        print(f"{row['method']:<20} {recall:>8} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f}")
+    print()
+    print("Relation sizes:")
+    for name, size in data["sizes_bytes"].items():
+        print(f"  {name:<40} {size / 1e6:>10.1f} MB")
+    print()
+
+
+def drop_full_indexes(conn, table, mode):
+    if not index_exists(conn.cursor(), index_name(table, mode)):
+        raise RuntimeError(f"{index_name(table, mode)} does not exist - build it before dropping the full index")
+    for name in full_precision_indexes(conn.cursor(), table):
+        log(f"Dropping full-precision index {name} ({relation_size(conn, name) / 1e6:.1f} MB)")
+        conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=MODES, required=True)
+    parser.add_argument("--table", default=os.environ.get("POSTGRES_COLLECTION_NAME", "memories"))
+    parser.add_argument("--build", action="store_true", help="Create the quantized HNSW index (CONCURRENTLY)")
+    parser.add_argument("--maintenance-work-mem", default="", help="e.g. 1GB - speeds up the index build")
+    parser.add_argument("--report", action="store_true", help="Compare recall and latency against exact search")
+    parser.add_argument("--queries", type=int, default=100, help="Sampled query vectors for --report")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query (recall@limit)")
+    parser.add_argument("--oversample", type=int, default=0, help="Candidates per result (default: per mode)")
+    parser.add_argument("--output", default="", help="Also write the report as JSON to this file")
+    parser.add_argument("--drop-full-index", action="store_true",
+                        help="Drop the full-precision HNSW index (after switching mem0 to the quantized mode)")
+    args = parser.parse_args()
+
+    if not (args.build or args.report or args.drop_full_index):
+        parser.error("nothing to do: pass --build, --report and/or --drop-full-index")
+
+    # Autocommit: CREATE/DROP INDEX CONCURRENTLY can't run inside a transaction
+    with psycopg.connect(PG_CONNINFO, autocommit=True) as conn:
+        dims = vector_dims(conn.cursor(), args.table)
+        if args.build:
+            build_index(conn, args.table, args.mode, dims, args.maintenance_work_mem)
+        if args.report:
+            data = report(conn, args.table, args.mode, dims, args.queries, args.limit,
+                          args.oversample or DEFAULT_OVERSAMPLE[args.mode])
+            print_report(data)
+            if args.output:
+                with open(args.output, "w") as f:
+                    json.dump(data, f, indent=2)
+                log(f"Report written to {args.output}")
+        if args.drop_full_index:
+            drop_full_indexes(conn, args.table, args.mode)
+    log("Done")
+
+
+if __name__ == "__main__":
+    main()
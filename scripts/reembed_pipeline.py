@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Zero-downtime re-embedding of the mem0 memories table
+Embeds every memory into a shadow table while mem0 keeps serving the live
+one, then swaps the tables in one transaction.
+
+Pipeline:
+  1. load     - read the live table in id order, embed batches concurrently
+                (through the shared Ollama gateway: limits, failover, embedding
+                store), COPY each batch into the shadow table in order and
+                record the checkpoint in the same transaction
+  2. catch-up - re-embed rows added or changed since they were copied, drop
+                rows deleted from the live table
+  3. indexes  - build the live table's indexes (HNSW, quantized, pager) on the
+                shadow table, now that it is fully loaded
+  4. swap     - (--swap) block writes, apply the last changes, rename the live
+                table to <table>_pre_<timestamp> and the shadow table into place
+
+Interrupted runs resume from the checkpoint. Without --swap the script stops
+after step 3; run it again with --swap when ready.
+
+  python3 scripts/reembed_pipeline.py --model nomic-embed-text:latest
+  python3 scripts/reembed_pipeline.py --model nomic-embed-text:latest --swap
+
+Switching to a different model: restart mem0 with MEM0_EMBEDDER_MODEL set to
+it right after the swap. Rollback: rename <table>_pre_<timestamp> back.
+
+The embedding store is keyed by model tag, so it cannot tell new weights
+pulled under the same tag from the old ones. When --model is the server's
+model (MEM0_EMBEDDER_MODEL) the store is refreshed by default: every text is
+embedded again and the stored vector replaced. For another model it is
+reused. --refresh / --reuse-store override the choice.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import psycopg
+
+# Shared with the mem0 server: lib/ in the repo, /app inside the container
+sys.path.insert(0, "/app")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from embedding_store import EmbeddingStore
+from mock_ollama_module import MockOllamaClient
+from quantized_search import vector_dims
+
+PG_CONNINFO = (
+    f"host={os.environ.get('POSTGRES_HOST', 'postgres')} "
+    f"port={os.environ.get('POSTGRES_PORT', '5432')} "
+    f"dbname={os.environ.get('POSTGRES_DB', 'mem0_prd')} "
+    f"user={os.environ.get('POSTGRES_USER', 'mem0_user_prd')} "
+    f"password={os.environ.get('POSTGRES_PASSWORD', '')}"
+)
+
+CHECKPOINTS = "reembed_checkpoints"
+
+
+def log(msg):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
+
+
+def vector_literal(vector):
+    return "[" + ",".join(repr(float(x)) for x in vector) + "]"
+
+
+class Progress:
+    """Rows per second and ETA over this run (resumed rows don't count towards the rate)"""
+
+    def __init__(self, total, done, every):
+        self.total = total
+        self.done = done
+        self.every = every
+        self.started = time.perf_counter()
+        self.start_done = done
+        self.last_report = 0.0
+
+    def add(self, rows, force=False):
+        self.done += rows
+        now = time.perf_counter()
+        if not force and now - self.last_report < self.every:
+            return
+        self.last_report = now
+        elapsed = now - self.started
+        rate = (self.done - self.start_done) / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.done, 0)
+        eta = f"{remaining / rate / 60:.1f} min" if rate > 0 else "-"
+        pct = self.done / self.total * 100 if self.total else 100.0
+        log(f"{self.done}/{self.total} rows ({pct:.1f}%) - {rate:.1f} rows/s, ETA {eta}")
+
+
+class Reembedder:
+    def __init__(self, args):
+        self.args = args
+        self.table = args.table
+        self.shadow = args.shadow or f"{args.table}_reembed"
+        self.model = args.model
+        self.store = EmbeddingStore(args.store, max_entries=0, refresh=args.refresh)
+        # Same client as the server: embedding store first, then /api/embed through the gateway
+        self.client = MockOllamaClient(
+            embedding_store=self.store, embed_batch_size=args.batch_size, embed_batch_window_ms=0
+        )
+        self.empty = 0
+
+    # ------------------------------------------------------------------
+    # Embedding
+    # ------------------------------------------------------------------
+    def embed_rows(self, rows):
+        """[(id, payload)] -> [(id, vector literal or None, payload json)]; retried before giving up"""
+        texts = [payload.get("data") or "" for _, payload in rows]
+        wanted = [text for text in texts if text]
+        for attempt in range(1, self.args.retries + 1):
+            try:
+                vectors = iter(self.client.embed_texts(self.model, wanted)) if wanted else iter(())
+                break
+            except Exception as e:
+                if attempt == self.args.retries:
+                    raise
+                log(f"Embedding batch failed ({e}) - retry {attempt}/{self.args.retries - 1}")
+                time.sleep(2 ** attempt)
+        # Memories without text are kept, with no vector, so the swap loses nothing
+        return [
+            (mem_id, vector_literal(next(vectors)) if text else None, json.dumps(payload))
+            for (mem_id, payload), text in zip(rows, texts)
+        ]
+
+    # ------------------------------------------------------------------
+    # Shadow table and checkpoint
+    # ------------------------------------------------------------------
+    def prepare(self, conn):
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {CHECKPOINTS} (shadow TEXT PRIMARY KEY, source TEXT NOT NULL, "
+            "model TEXT NOT NULL, last_id UUID, rows_done BIGINT NOT NULL DEFAULT 0, "
+            "updated_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+        if self.args.restart:
+            log(f"--restart: dropping {self.shadow} and its checkpoint")
+            conn.execute(f"DROP TABLE IF EXISTS {self.shadow}")
+            conn.execute(f"DELETE FROM {CHECKPOINTS} WHERE shadow = %s", (self.shadow,))
+        row = conn.execute(
+            f"SELECT source, model, last_id, rows_done FROM {CHECKPOINTS} WHERE shadow = %s", (self.shadow,)
+        ).fetchone()
+        if row is not None:
+            source, model, last_id, rows_done = row
+            if (source, model) != (self.table, self.model):
+                raise RuntimeError(
+                    f"{self.shadow} holds a re-embed of {source} with {model} - use --restart to start over"
+                )
+            log(f"Resuming after {rows_done} rows (last id {last_id})")
+            return last_id, rows_done
+
+        probe = self.client.embed_texts(self.model, ["dimension probe"])[0]
+        dims = len(probe)
+        log(f"Creating {self.shadow} with vector({dims}) for {self.model}")
+        conn.execute(f"DROP TABLE IF EXISTS {self.shadow}")
+        conn.execute(f"CREATE TABLE {self.shadow} (id UUID PRIMARY KEY, vector vector({dims}), payload JSONB)")
+        conn.execute(
+            f"INSERT INTO {CHECKPOINTS} (shadow, source, model) VALUES (%s, %s, %s)",
+            (self.shadow, self.table, self.model),
+        )
+        return None, 0
+
+    def write_batch(self, conn, rows):
+        """COPY one embedded batch and advance the checkpoint, atomically"""
+        with conn.transaction():
+            with conn.cursor() as cur:
+                with cur.copy(f"COPY {self.shadow} (id, vector, payload) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                cur.execute(
+                    f"UPDATE {CHECKPOINTS} SET last_id = %s, rows_done = rows_done + %s, updated_at = now() "
+                    "WHERE shadow = %s",
+                    (rows[-1][0], len(rows), self.shadow),
+                )
+
+    def batches(self, conn, last_id):
+        """Keyset pagination over the live table in id order"""
+        while True:
+            if last_id is None:
+                rows = conn.execute(
+                    f"SELECT id, payload FROM {self.table} ORDER BY id LIMIT %s", (self.args.batch_size,)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT id, payload FROM {self.table} WHERE id > %s ORDER BY id LIMIT %s",
+                    (last_id, self.args.batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    # ------------------------------------------------------------------
+    # Phases
+    # ------------------------------------------------------------------
+    def load(self, read_conn, write_conn, last_id, rows_done):
+        total = read_conn.execute(f"SELECT count(*) FROM {self.table}").fetchone()[0]
+        progress = Progress(total, rows_done, self.args.report_every)
+        log(f"Loading {self.shadow}: {total} rows in {self.table}, batches of {self.args.batch_size}, "
+            f"{self.args.concurrency} concurrent")
+        pending = []
+        with ThreadPoolExecutor(self.args.concurrency, thread_name_prefix="reembed") as pool:
+            for rows in self.batches(read_conn, last_id):
+                pending.append(pool.submit(self.embed_rows, rows))
+                # Bounded read-ahead; batches are written in id order so the checkpoint stays exact
+                while len(pending) > self.args.concurrency * 2:
+                    self._write_next(write_conn, pending, progress)
+            while pending:
+                self._write_next(write_conn, pending, progress)
+        progress.add(0, force=True)
+
+    def _write_next(self, conn, pending, progress):
+        rows = pending.pop(0).result()
+        self.write_batch(conn, rows)
+        self.empty += sum(1 for row in rows if row[1] is None)
+        progress.add(len(rows))
+
+    def catch_up(self, conn):
+        """Apply inserts, updates and deletes made to the live table since it was copied"""
+        changed = conn.execute(
+            f"SELECT s.id, s.payload FROM {self.table} s LEFT JOIN {self.shadow} t ON t.id = s.id "
+            "WHERE t.id IS NULL OR t.payload IS DISTINCT FROM s.payload"
+        ).fetchall()
+        for start in range(0, len(changed), self.args.batch_size):
+            rows = self.embed_rows(changed[start:start + self.args.batch_size])
+            with conn.cursor() as cur:
+                cur.executemany(
+                    f"INSERT INTO {self.shadow} (id, vector, payload) VALUES (%s, %s::vector, %s::jsonb) "
+                    "ON CONFLICT (id) DO UPDATE SET vector = EXCLUDED.vector, payload = EXCLUDED.payload",
+                    rows,
+                )
+        deleted = conn.execute(
+            f"DELETE FROM {self.shadow} t WHERE NOT EXISTS (SELECT 1 FROM {self.table} s WHERE s.id = t.id)"
+        ).rowcount
+        return len(changed), deleted
+
+    def live_indexes(self, conn):
+        """(name, definition) of the live table's indexes, except those backing constraints"""
+        return conn.execute(
+            "SELECT i.indexname, i.indexdef FROM pg_indexes i WHERE i.tablename = %s "
+            "AND i.schemaname = current_schema() AND NOT EXISTS "
+            "(SELECT 1 FROM pg_constraint c WHERE c.conindid = (quote_ident(i.indexname))::regclass) "
+            "ORDER BY i.indexname",
+            (self.table,),
+        ).fetchall()
+
+    def shadow_index_name(self, position):
+        return f"{self.shadow}_ix{position}"
+
+    def build_indexes(self, conn):
+        """Re-create the live table's indexes on the loaded shadow table"""
+        live_dims = vector_dims(conn.cursor(), self.table)
+        dims = vector_dims(conn.cursor(), self.shadow)
+        if self.args.maintenance_work_mem:
+            conn.execute(f"SET maintenance_work_mem = '{self.args.maintenance_work_mem}'")
+        indexes = self.live_indexes(conn)
+        if not any("(vector" in definition for _, definition in indexes):
+            # mem0 would create this on startup; build it now so the swap lands indexed
+            indexes.append((f"{self.table}_hnsw_idx",
+                            f"CREATE INDEX {self.table}_hnsw_idx ON {self.table} USING hnsw (vector vector_cosine_ops)"))
+        for position, (name, definition) in enumerate(indexes):
+            target = self.shadow_index_name(position)
+            statement = re.sub(
+                r"^CREATE (UNIQUE )?INDEX \S+ ON \S+ ",
+                lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS {target} ON {self.shadow} ",
+                definition,
+            )
+            if dims != live_dims:
+                # Quantized expression indexes name the dimensions, e.g. halfvec(768)
+                statement = re.sub(rf"\b(vector|halfvec|bit)\({live_dims}\)", rf"\g<1>({dims})", statement)
+            started = time.perf_counter()
+            conn.execute(statement)
+            log(f"Index for {name} ready on {self.shadow} in {time.perf_counter() - started:.1f}s")
+        return indexes
+
+    def swap(self, conn, indexes):
+        stamp = datetime.now().strftime("%Y%m%d%H%M")
+        old = f"{self.table}_pre_{stamp}"
+        with conn.transaction():
+            conn.execute(f"SET LOCAL lock_timeout = '{self.args.lock_timeout}s'")
+            # Writers wait from here; readers keep going until the renames
+            conn.execute(f"LOCK TABLE {self.table} IN SHARE MODE")
+            changed, deleted = self.catch_up(conn)
+            log(f"Final catch-up under lock: {changed} changed, {deleted} deleted")
+            existing = {name for name, _ in self.live_indexes(conn)}
+            conn.execute(f"ALTER TABLE {self.table} RENAME TO {old}")
+            conn.execute(f"ALTER TABLE {old} RENAME CONSTRAINT {self.table}_pkey TO {old}_pkey")
+            conn.execute(f"ALTER TABLE {self.shadow} RENAME TO {self.table}")
+            conn.execute(f"ALTER TABLE {self.table} RENAME CONSTRAINT {self.shadow}_pkey TO {self.table}_pkey")
+            for position, (name, _) in enumerate(indexes):
+                if name in existing:
+                    conn.execute(f"ALTER INDEX {name} RENAME TO {name[:45]}_pre_{stamp}")
+                conn.execute(f"ALTER INDEX {self.shadow_index_name(position)} RENAME TO {name}")
+            conn.execute(f"DELETE FROM {CHECKPOINTS} WHERE shadow = %s", (self.shadow,))
+        log(f"Swapped: {self.table} is the re-embedded table, the previous one is {old}")
+        if self.args.drop_old:
+            conn.execute(f"DROP TABLE {old}")
+            log(f"Dropped {old}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", default=os.environ.get("POSTGRES_COLLECTION_NAME", "memories"))
+    parser.add_argument("--shadow", default="", help="Shadow table name (default: <table>_reembed)")
+    parser.add_argument("--model", default=os.environ.get("MEM0_EMBEDDER_MODEL", "nomic-embed-text:latest"))
+    parser.add_argument("--batch-size", type=int, default=64, help="Rows per embedding request and COPY")
+    parser.add_argument("--concurrency", type=int, default=4, help="Embedding batches in flight")
+    parser.add_argument("--retries", type=int, default=3, help="Attempts per batch before the run stops")
+    parser.add_argument("--store", default=os.environ.get("OLLAMA_EMBED_STORE_PATH", "/app/data/embeddings.db"),
+                        help="Embedding store reused across runs and shared with the server")
+    store_mode = parser.add_mutually_exclusive_group()
+    store_mode.add_argument("--refresh", action="store_true", default=None,
+                            help="Ignore stored vectors and replace them (default when --model is the server's)")
+    store_mode.add_argument("--reuse-store", dest="refresh", action="store_false",
+                            help="Answer from stored vectors (default for any other model)")
+    parser.add_argument("--maintenance-work-mem", default="", help="e.g. 1GB - speeds up the index builds")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument("--swap", action="store_true", help="Swap the shadow table in when it is ready")
+    parser.add_argument("--lock-timeout", type=int, default=10, help="Seconds to wait for the swap's table lock")
+    parser.add_argument("--drop-old", action="store_true", help="Drop the previous table after the swap")
+    parser.add_argument("--restart", action="store_true", help="Discard the shadow table and checkpoint first")
+    args = parser.parse_args()
+    server_model = os.environ.get("MEM0_EMBEDDER_MODEL", "nomic-embed-text:latest")
+    if args.refresh is None:
+        # Same tag as the server: the point is usually new weights, which the store can't see
+        args.refresh = args.model == server_model
+
+    reembedder = Reembedder(args)
+    log(f"Embedding store: {args.store} ({reembedder.store.stats()['entries']} vectors, "
+        f"{'refreshing' if args.refresh else 'reused'})")
+    # Autocommit: every batch commits with its checkpoint, the swap runs in its own transaction
+    with psycopg.connect(PG_CONNINFO, autocommit=True) as read_conn, \
+            psycopg.connect(PG_CONNINFO, autocommit=True) as write_conn:
+        last_id, rows_done = reembedder.prepare(write_conn)
+        reembedder.load(read_conn, write_conn, last_id, rows_done)
+        changed, deleted = reembedder.catch_up(write_conn)
+        log(f"Catch-up: {changed} rows added or changed, {deleted} deleted since they were copied")
+        indexes = reembedder.build_indexes(write_conn)
+        if reembedder.empty:
+            log(f"{reembedder.empty} memories have no text and were copied without a vector")
+        if args.swap:
+            reembedder.swap(write_conn, indexes)
+        else:
+            log(f"{reembedder.shadow} is ready - run again with --swap to put it live")
+    stats = reembedder.store.stats()
+    log(f"Embedding store hits: {stats['hits']}, misses: {stats['misses']} (hit rate {stats['hit_rate']:.1%})")
+    log("Done")
+
+
+if __name__ == "__main__":
+    main()
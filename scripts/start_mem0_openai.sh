@@ -29,9 +29,11 @@ sys.path.insert(0, '/app')
 from mem0_gds_patch_v2 import patch_neo4j_graph
 patch_neo4j_graph()
 
-# Now start uvicorn
+# Now start uvicorn. With MEM0_WORKERS > 1 each worker process imports main
+# (and re-applies the patch) on its own, with its own Memory instance
 import uvicorn
 port = int(os.getenv('MEM0_PORT', '8888'))
-uvicorn.run('main:app', host='0.0.0.0', port=port, reload=False)
+workers = int(os.getenv('MEM0_WORKERS', '1'))
+uvicorn.run('main:app', host='0.0.0.0', port=port, reload=False, workers=workers)
 PYTHON
 
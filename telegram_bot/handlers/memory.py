@@ -2,12 +2,54 @@
 Memory operation handlers for Telegram bot
 Handles /remember and /recall commands
 """
+import asyncio
 from telegram import Update
 from telegram.ext import ContextTypes
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Follow-up on queued /remember jobs
+JOB_POLL_INTERVAL = 2      # seconds between GET /jobs/{id}
+JOB_POLL_TIMEOUT = 300     # stop following after this many seconds
+
+
+async def follow_job(status_msg, mem0, job_id: str, namespace: str, text: str):
+    """Poll a queued ingestion job and edit the acknowledgement with the outcome"""
+    waited = 0
+    while waited < JOB_POLL_TIMEOUT:
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+        waited += JOB_POLL_INTERVAL
+        try:
+            job = await asyncio.to_thread(mem0.get_job, job_id)
+        except Exception as e:
+            # Transient (server restarting); keep polling until the timeout
+            logger.warning(f"Polling job {job_id} failed: {e}")
+            continue
+
+        if job.get('status') == 'done':
+            results = (job.get('result') or {}).get('results', [])
+            await status_msg.edit_text(
+                f"✅ Remembered in '{namespace}':\n\n"
+                f"{text}\n\n"
+                f"{len(results)} memory change(s) - Job ID: {job_id}"
+            )
+            return
+        if job.get('status') == 'failed':
+            await status_msg.edit_text(
+                f"❌ Failed to store memory in '{namespace}':\n\n"
+                f"{text}\n\n"
+                f"Error: {job.get('error') or 'unknown'}\n"
+                f"Job ID: {job_id}"
+            )
+            return
+
+    await status_msg.edit_text(
+        f"⏳ Still processing in '{namespace}':\n\n"
+        f"{text}\n\n"
+        f"Job ID: {job_id} - check again later with /recall"
+    )
+
 async def remember_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle /remember command - store new memory
@@ -35,18 +77,23 @@ async def remember_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         full_user_id = config.get_full_user_id(namespace)
 
-        result = mem0.store_memory(
+        # Queued ingestion acknowledges immediately; LLM extraction runs server-side
+        result = mem0.queue_memory(
             user_id=full_user_id,
             content=text,
             metadata={'source': 'telegram', 'telegram_user_id': user_id}
         )
 
-        await update.message.reply_text(
-            f"✅ Remembered in '{namespace}':\n\n"
-            f"{text}\n\n"
-            f"Memory ID: {result.get('id', 'unknown')}"
+        job_id = result.get('job_id', 'unknown')
+        status_msg = await update.message.reply_text(
+            f"⏳ Queued in '{namespace}' (job {job_id}):\n\n"
+            f"{text}"
         )
-        logger.info(f"Stored memory for user {user_id} in namespace {namespace}")
+        logger.info(f"Queued memory for user {user_id} in namespace {namespace} (job {job_id})")
+
+        # Report success or failure once extraction has run, without holding up other updates
+        if result.get('job_id'):
+            context.application.create_task(follow_job(status_msg, mem0, job_id, namespace, text), update=update)
 
     except Exception as e:
         logger.error(f"Failed to store memory: {e}")
@@ -161,19 +208,17 @@ async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         full_user_id = config.get_full_user_id(namespace)
 
-        # Get all memories for namespace
-        memories = mem0.get_all_memories(full_user_id)
+        # Fetch only the page we show, plus the total for the footer
+        page = mem0.list_memories(full_user_id, limit=limit)
+        recent_memories = page.get('memories', [])
 
-        if not memories:
+        if not recent_memories:
             await update.message.reply_text(
                 f"📭 No memories found in '{namespace}'\n\n"
                 "Start storing memories with /remember"
             )
             return
 
-        # Take most recent (up to limit)
-        recent_memories = memories[:limit]
-
         response = f"📋 Recent {len(recent_memories)} memories in '{namespace}':\n\n"
 
         for i, mem in enumerate(recent_memories, 1):
@@ -190,8 +235,9 @@ async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
             response += f"{i}. {content}\n   ID: {mem_id}\n\n"
 
-        if len(memories) > limit:
-            response += f"\n... and {len(memories) - limit} more memories"
+        if page.get('next_cursor'):
+            total = mem0.count_memories(full_user_id)
+            response += f"\n... and {total - len(recent_memories)} more memories"
 
         await update.message.reply_text(response)
 
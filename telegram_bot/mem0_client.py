@@ -69,6 +69,55 @@ class Mem0Client:
             logger.error(f"Failed to store memory: {e}")
             raise Exception(f"Failed to store memory: {str(e)}")
 
+    def queue_memory(self, user_id: str, content: str, metadata: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Queue a memory for background ingestion (returns before LLM extraction runs)
+
+        Args:
+            user_id: Full user ID with namespace (e.g., "mark_carey/personal")
+            content: Memory content to store
+            metadata: Optional metadata to attach
+
+        Returns:
+            Job acknowledgement with job_id and status_url
+        """
+        try:
+            payload = {
+                "messages": [{"role": "user", "content": content}],
+                "user_id": user_id
+            }
+            if metadata:
+                payload['metadata'] = metadata
+
+            logger.info(f"Queueing memory for user_id: {user_id}")
+            response = requests.post(
+                f"{self.base_url}/memories/async",
+                json=payload,
+                headers=self.headers,
+                timeout=10
+            )
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"Memory queued: {result}")
+            return result
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to queue memory: {e}")
+            raise Exception(f"Failed to queue memory: {str(e)}")
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        """Get status of a queued ingestion job"""
+        try:
+            response = requests.get(
+                f"{self.base_url}/jobs/{job_id}",
+                headers=self.headers,
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to get job {job_id}: {e}")
+            raise Exception(f"Failed to get job: {str(e)}")
+
     def search_memories(self, user_id: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Search for memories matching a query
@@ -141,6 +190,49 @@ class Mem0Client:
             logger.error(f"Failed to get memories: {e}")
             raise Exception(f"Failed to get memories: {str(e)}")
 
+    def list_memories(self, user_id: str, limit: int = 10, after: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get one page of memories for a user_id (namespace)
+
+        Args:
+            user_id: Full user ID with namespace
+            limit: Page size
+            after: next_cursor from the previous page
+
+        Returns:
+            Dict with 'memories' and 'next_cursor' (None on the last page)
+        """
+        try:
+            params = {"user_id": user_id, "limit": limit}
+            if after:
+                params["after"] = after
+            response = requests.get(
+                f"{self.base_url}/memories",
+                params=params,
+                headers=self.headers,
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to list memories: {e}")
+            raise Exception(f"Failed to list memories: {str(e)}")
+
+    def count_memories(self, user_id: str) -> int:
+        """Number of memories for a user_id (namespace)"""
+        try:
+            response = requests.get(
+                f"{self.base_url}/memories/count",
+                params={"user_id": user_id},
+                headers=self.headers,
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json()["count"]
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to count memories: {e}")
+            raise Exception(f"Failed to count memories: {str(e)}")
+
     def delete_memory(self, memory_id: str) -> bool:
         """
         Delete a specific memory
@@ -176,9 +268,8 @@ class Mem0Client:
             Statistics dictionary
         """
         try:
-            memories = self.get_all_memories(user_id)
             return {
-                'total_memories': len(memories),
+                'total_memories': self.count_memories(user_id),
                 'namespace': user_id.split('/')[-1]
             }
         except Exception as e: